@@ -0,0 +1,242 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from .metrics import METRICS
+from .ratelimit import TokenBucket
+from .settings import env_float, get_settings
+
+METRICS.describe("markit_admission_rejected_total", "counter", "Requests shed before doing any work, by endpoint and reason.")
+METRICS.describe("markit_admission_wait_seconds", "histogram", "Time admitted requests spent queued for a slot.")
+
+# Per-endpoint defaults: (concurrency, queue size, max queue seconds). A brief fans out
+# into five GPT-5 calls, so far fewer of them run at once than chat turns.
+GATE_DEFAULTS: Dict[str, Tuple[int, int, float]] = {
+    "brief": (8, 32, 30.0),
+    "chat": (32, 64, 10.0),
+}
+# Per-endpoint, per-scope defaults: (requests per minute, burst)
+RATE_DEFAULTS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "brief": {"email": (6, 3), "ip": (30, 10)},
+    "chat": {"email": (30, 10), "ip": (120, 30)},
+}
+
+
+class Overloaded(Exception):
+    """Every slot is busy and the wait queue is full or too slow: answer 503."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: float) -> None:
+        super().__init__(f"{endpoint} is at capacity ({reason}); retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimited(Exception):
+    """One email or client address is sending faster than its bucket allows: answer 429."""
+
+    def __init__(self, endpoint: str, scope: str, retry_after: float) -> None:
+        super().__init__(f"Too many {endpoint} requests for this {scope}; retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class Gate:
+    """At most `limit` requests of one kind run at once; up to `queue_size` more wait, FIFO,
+    for at most `max_wait` seconds each.
+
+    Anything beyond that is rejected immediately instead of piling onto the upstreams, so
+    requests that do get in see the latency of a loaded system, not a collapsing one.
+    `limit` <= 0 disables the gate.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = max(0, queue_size)
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._service_s = 0.0
+
+    @classmethod
+    def from_env(cls, name: str) -> "Gate":
+        limit, queue_size, max_wait = GATE_DEFAULTS.get(name, (0, 0, 0.0))
+        prefix = f"ADMISSION_{name.upper()}"
+        return cls(
+            name,
+            limit=int(env_float(f"{prefix}_CONCURRENCY", limit)),
+            queue_size=int(env_float(f"{prefix}_QUEUE", queue_size)),
+            max_wait=env_float(f"{prefix}_QUEUE_SECONDS", max_wait),
+        )
+
+    def retry_after(self) -> float:
+        if self.limit <= 0:
+            return 1.0
+        # Time for everything ahead of a newcomer to drain through the slots
+        estimate = self._service_s * (len(self._waiters) + 1) / self.limit
+        return min(max(estimate, 1.0), max(self.max_wait, 1.0))
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.rejected += 1
+        METRICS.inc("markit_admission_rejected_total", endpoint=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after())
+
+    async def acquire(self) -> None:
+        if self.limit <= 0:
+            return
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout") from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as the caller went away: pass it on
+                self.release(held=0.0)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        METRICS.observe("markit_admission_wait_seconds", time.perf_counter() - t0, endpoint=self.name)
+
+    def release(self, held: Optional[float] = None) -> None:
+        if self.limit <= 0:
+            return
+        if held:
+            self._service_s = held if not self._service_s else 0.8 * self._service_s + 0.2 * held
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; `active` stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(held=time.perf_counter() - t0)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "max_wait_s": self.max_wait,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class KeyedLimiter:
+    """A token bucket per key (an email or a client address), keeping the `max_keys` most recent."""
+
+    def __init__(self, name: str, scope: str, per_minute: float, burst: float, max_keys: int = 10000) -> None:
+        self.name = name
+        self.scope = scope
+        self.per_minute = per_minute
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, name: str, scope: str) -> "KeyedLimiter":
+        per_minute, burst = RATE_DEFAULTS.get(name, {}).get(scope, (0, 1))
+        prefix = f"RATE_LIMIT_{name.upper()}_{scope.upper()}"
+        return cls(name, scope, env_float(f"{prefix}_PER_MIN", per_minute), env_float(f"{prefix}_BURST", burst))
+
+    def check(self, key: str) -> None:
+        """Take a token for `key` or raise `RateLimited`. A rate of 0 or an empty key is not limited."""
+        if self.per_minute <= 0 or not key:
+            return
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.per_minute / 60.0, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        if not bucket.try_acquire():
+            METRICS.inc("markit_admission_rejected_total", endpoint=self.name, reason=f"rate_{self.scope}")
+            raise RateLimited(self.name, self.scope, bucket.wait_time())
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy every request shares its address; only trust the header when told to
+    if get_settings().rate_limit_trust_forwarded:
+        forwarded = request.headers.get("x-forwarded-for", "")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return request.client.host if request.client else ""
+
+
+class Admission:
+    """Rate limits and a concurrency gate for one endpoint group ("brief", "chat")."""
+
+    def __init__(self, name: str, gate: Gate, limiters: Dict[str, KeyedLimiter]) -> None:
+        self.name = name
+        self.gate = gate
+        self.limiters = limiters
+
+    @classmethod
+    def from_env(cls, name: str) -> "Admission":
+        return cls(name, Gate.from_env(name), {scope: KeyedLimiter.from_env(name, scope) for scope in ("email", "ip")})
+
+    def check_rate(self, request: Request, email: str = "") -> None:
+        self.limiters["ip"].check(client_ip(request))
+        self.limiters["email"].check((email or "").strip().lower())
+
+    @asynccontextmanager
+    async def admit(self, request: Request, email: str = "") -> AsyncIterator[None]:
+        """Rate-limit, then hold a slot for the block. Raises `RateLimited` or `Overloaded`."""
+        self.check_rate(request, email)
+        async with self.gate.slot():
+            yield
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **self.gate.describe(),
+            "rate_limits": {s: {"per_minute": l.per_minute, "burst": l.burst} for s, l in self.limiters.items()},
+        }
+
+
+_ADMISSION: Dict[str, Admission] = {}
+
+
+def get_admission(name: str) -> Admission:
+    admission = _ADMISSION.get(name)
+    if admission is None:
+        admission = _ADMISSION[name] = Admission.from_env(name)
+    return admission
+
+
+def describe() -> Dict[str, Dict[str, Any]]:
+    return {name: get_admission(name).describe() for name in GATE_DEFAULTS}
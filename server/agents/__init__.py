@@ -1,4 +1,4 @@
-from .agent_base import call_gpt5_json
+from .agent_base import call_gpt5_json, call_grounded_json
 from .positioning import run as run_positioning
 from .landing_copy import run as run_landing_copy
 from .ads import run as run_ads
@@ -6,6 +6,7 @@ from .emails import run as run_emails
 
 __all__ = [
     "call_gpt5_json",
+    "call_grounded_json",
     "run_positioning",
     "run_landing_copy",
     "run_ads",
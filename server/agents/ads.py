@@ -1,11 +1,21 @@
-from .agent_base import call_gpt5_json
+from typing import Any, Dict, Optional
+from ..prompts import register
+from ..schemas import Ads
+from .agent_base import call_gpt5_json, call_grounded_json
 
-PROMPT = (
+PROMPT = register("ads", 1, (
     "You are the Paid Ads Agent. Using web search only, produce 3 ad variants for Meta/Google: \n"
     "{\"ads\": [{\"headline\": \"\", \"primary\": \"\", \"cta\": \"\"}], \"keywords\": [\"\"]}"
-)
+), output_type=Ads)
 
-def run(api_key: str, email: str) -> dict:
-    return call_gpt5_json(api_key, PROMPT, email)
+GROUNDED_PROMPT = register("ads_grounded", 1, (
+    "You are the Paid Ads Agent. Using only the research brief provided, produce 3 ad variants for Meta/Google: \n"
+    "{\"ads\": [{\"headline\": \"\", \"primary\": \"\", \"cta\": \"\"}], \"keywords\": [\"\"]}"
+), output_type=Ads)
+
+async def run(api_key: str, email: str, brief: Optional[Dict[str, Any]] = None, web_search: bool = False) -> dict:
+    if brief:
+        return await call_grounded_json(api_key, GROUNDED_PROMPT, email, brief, web_search=web_search)
+    return await call_gpt5_json(api_key, PROMPT, email)
 
 
@@ -1,26 +1,54 @@
 import json
 from typing import Any, Dict, Optional
-from openai import OpenAI
+from pydantic import ValidationError
+from ..clients import get_clients
+from ..metrics import span
+from ..prompts import Prompt, record_usage
+from ..resilience import call
+from ..routing import get_router
+from ..schemas import StructuredOutputError, parsed_output
 
-def call_gpt5_json(api_key: str, developer_text: str, user_text: str) -> Dict[str, Any]:
-    client = OpenAI(api_key=api_key)
-    resp = client.responses.create(
-        model="gpt-5",
-        input=[
-            {"role": "developer", "content": [{"type": "input_text", "text": developer_text}]},
-            {"role": "user", "content": [{"type": "input_text", "text": user_text}]},
-        ],
-        text={"format": {"type": "text"}, "verbosity": "medium"},
-        reasoning={"effort": "high", "summary": "detailed"},
-        tools=[{"type": "web_search_preview", "user_location": {"type": "approximate", "country": "US"}, "search_context_size": "medium"}],
-        store=True,
-    )
-    output_text = getattr(resp, "output_text", None)
-    try:
-        if isinstance(output_text, str):
-            return json.loads(output_text)
-    except Exception:
-        pass
-    return {"raw": output_text}
+WEB_SEARCH_TOOL = {"type": "web_search_preview", "user_location": {"type": "approximate", "country": "US"}, "search_context_size": "medium"}
+GROUNDED_SEARCH_NOTE = "You may use web search only to fill gaps the research brief does not cover."
 
+async def call_gpt5_json(api_key: str, prompt: Prompt, user_text: str, web_search: bool = True, effort: Optional[str] = None, developer_note: Optional[str] = None) -> Dict[str, Any]:
+    """Run `prompt` with its output held to `prompt.output_type` (strict JSON schema); returns the validated object as a dict."""
+    assert prompt.output_type is not None, f"{prompt.name} has no output schema"
+    output_type = prompt.output_type
+    client = get_clients().openai(api_key)
+    # Grounded agents get their routed effort; agents researching on their own stay at high
+    effort = effort or get_router().agent_effort_for(prompt.name)
+    # The template is the first developer part so it stays a cacheable prefix; notes go after it
+    developer_content = [{"type": "input_text", "text": prompt.text}]
+    if developer_note:
+        developer_content.append({"type": "input_text", "text": developer_note})
+    with span("openai.responses", prompt=prompt.name, effort=effort) as sp:
+        try:
+            resp = await call("openai", lambda: client.responses.parse(
+                model="gpt-5",
+                input=[
+                    {"role": "developer", "content": developer_content},
+                    {"role": "user", "content": [{"type": "input_text", "text": user_text}]},
+                ],
+                text_format=output_type,
+                text={"verbosity": "medium"},
+                reasoning={"effort": effort, "summary": "detailed"},
+                tools=[WEB_SEARCH_TOOL] if web_search else [],
+                store=True,
+                extra_body=prompt.cache_args(),
+            ))
+        except ValidationError as e:
+            # Strict mode only lets truncated (incomplete) output through unparseable
+            raise StructuredOutputError(prompt.name, f"invalid JSON ({e.error_count()} errors)") from e
+        if getattr(resp, "usage", None) is not None:
+            sp.usage(record_usage(prompt, resp.usage))
+    return parsed_output(resp, output_type, prompt.name).model_dump()
 
+async def call_grounded_json(api_key: str, prompt: Prompt, email: str, brief: Dict[str, Any], web_search: bool = False) -> Dict[str, Any]:
+    # Grounded mode: the research brief already holds the web facts, so the agent
+    # writes from it at a routed (lower) effort and only searches when explicitly opted in
+    user_text = "RESEARCH_BRIEF:\n" + json.dumps(brief) + "\nEMAIL: " + email
+    return await call_gpt5_json(
+        api_key, prompt, user_text, web_search=web_search,
+        developer_note=GROUNDED_SEARCH_NOTE if web_search else None,
+    )
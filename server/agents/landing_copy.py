@@ -1,11 +1,21 @@
-from .agent_base import call_gpt5_json
+from typing import Any, Dict, Optional
+from ..prompts import register
+from ..schemas import LandingCopy
+from .agent_base import call_gpt5_json, call_grounded_json
 
-PROMPT = (
+PROMPT = register("landing_copy", 1, (
     "You are the Landing Copy Agent. Using web search only, generate concise hero+subhead and 3 bullet benefits: \n"
     "{\"hero\": \"\", \"subhead\": \"\", \"bullets\": [\"\", \"\", \"\"]}"
-)
+), output_type=LandingCopy)
 
-def run(api_key: str, email: str) -> dict:
-    return call_gpt5_json(api_key, PROMPT, email)
+GROUNDED_PROMPT = register("landing_copy_grounded", 1, (
+    "You are the Landing Copy Agent. Using only the research brief provided, generate concise hero+subhead and 3 bullet benefits: \n"
+    "{\"hero\": \"\", \"subhead\": \"\", \"bullets\": [\"\", \"\", \"\"]}"
+), output_type=LandingCopy)
+
+async def run(api_key: str, email: str, brief: Optional[Dict[str, Any]] = None, web_search: bool = False) -> dict:
+    if brief:
+        return await call_grounded_json(api_key, GROUNDED_PROMPT, email, brief, web_search=web_search)
+    return await call_gpt5_json(api_key, PROMPT, email)
 
 
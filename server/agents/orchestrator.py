@@ -1,29 +1,29 @@
 import asyncio
-from typing import Any, Dict
-import httpx
+from typing import Any, Dict, Iterable, Optional
 
 from . import run_positioning, run_landing_copy, run_ads, run_emails
-
-async def run_all_parallel(api_key: str, email: str) -> Dict[str, Any]:
-    loop = asyncio.get_running_loop()
-    # Run CPU-bound wrappers in threads since OpenAI client is sync
-    positioning_fut = loop.run_in_executor(None, run_positioning, api_key, email)
-    landing_fut = loop.run_in_executor(None, run_landing_copy, api_key, email)
-    ads_fut = loop.run_in_executor(None, run_ads, api_key, email)
-    emails_fut = loop.run_in_executor(None, run_emails, api_key, email)
-    positioning, landing, ads, emails = await asyncio.gather(positioning_fut, landing_fut, ads_fut, emails_fut)
-    return {
-        "positioning": positioning,
-        "landing_copy": landing,
-        "ads": ads,
-        "emails": emails,
-    }
-
-async def save_to_airtable(base_id: str, table: str, api_key: str, record_id: str, payload: Dict[str, Any]) -> None:
-    # Store the consolidated orchestration result into one long-text field by id
-    fields = {"fldNLJlEqVwvOg100": __import__("json").dumps(payload)}
-    async with httpx.AsyncClient(timeout=30) as http:
-        url = f"https://api.airtable.com/v0/{base_id}/{table}"
-        await http.patch(url, headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}, json={"records": [{"id": record_id, "fields": fields}]})
+from ..settings import AGENT_NAMES, get_settings
 
 
+async def run_all_parallel(api_key: str, email: str, brief: Optional[Dict[str, Any]] = None, search_agents: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    # With a brief the agents run grounded (no web search unless opted in per agent);
+    # without one they fall back to researching the email themselves
+    search = set(get_settings().agents_web_search if search_agents is None else search_agents)
+    # Agents use the async OpenAI client, so run them concurrently on the event loop.
+    # One agent failing (after its retries) leaves an error entry instead of discarding the others.
+    results = await asyncio.gather(
+        run_positioning(api_key, email, brief, web_search="positioning" in search),
+        run_landing_copy(api_key, email, brief, web_search="landing_copy" in search),
+        run_ads(api_key, email, brief, web_search="ads" in search),
+        run_emails(api_key, email, brief, web_search="emails" in search),
+        return_exceptions=True,
+    )
+    out: Dict[str, Any] = {}
+    for name, result in zip(AGENT_NAMES, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        out[name] = {"error": f"{type(result).__name__}: {result}"} if isinstance(result, BaseException) else result
+    if all(isinstance(r, BaseException) for r in results):
+        # Nothing usable: let the caller record the stage as failed
+        raise results[0]
+    return out
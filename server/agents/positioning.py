@@ -1,11 +1,21 @@
-from .agent_base import call_gpt5_json
+from typing import Any, Dict, Optional
+from ..prompts import register
+from ..schemas import Positioning
+from .agent_base import call_gpt5_json, call_grounded_json
 
-PROMPT = (
+PROMPT = register("positioning", 1, (
     "You are the Positioning Agent. Using web search only, produce tight positioning: \n"
     "{\"tagline\": \"\", \"category\": \"\", \"value_props\": [\"\"], \"proof_points\": [\"\"]}"
-)
+), output_type=Positioning)
 
-def run(api_key: str, email: str) -> dict:
-    return call_gpt5_json(api_key, PROMPT, email)
+GROUNDED_PROMPT = register("positioning_grounded", 1, (
+    "You are the Positioning Agent. Using only the research brief provided, produce tight positioning: \n"
+    "{\"tagline\": \"\", \"category\": \"\", \"value_props\": [\"\"], \"proof_points\": [\"\"]}"
+), output_type=Positioning)
+
+async def run(api_key: str, email: str, brief: Optional[Dict[str, Any]] = None, web_search: bool = False) -> dict:
+    if brief:
+        return await call_grounded_json(api_key, GROUNDED_PROMPT, email, brief, web_search=web_search)
+    return await call_gpt5_json(api_key, PROMPT, email)
 
 
@@ -0,0 +1,386 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote as urlquote
+
+import httpx
+
+from .metrics import span
+from .ratelimit import TokenBucket
+from .resilience import call, classify, is_upstream_failure
+from .schemas import Brief, BriefRecord, read_brief
+from .settings import data_path, env_float, env_int, env_str
+
+EMAIL_FIELD_ID = "fldXhVuckpHBhWJOX"
+# Long-text field holding a `schemas.BriefRecord`: the validated research brief plus,
+# once the agents finish, their output. The field's display name in the base:
+BRIEF_FIELD_ID = "fldNLJlEqVwvOg100"
+BRIEF_FIELD_NAME = "Full Response"
+# Typed columns filled from the brief
+BUSINESS_NAME_FIELD_ID = "fldsrAZbfzPGLP6F8"
+ONE_LINER_FIELD_ID = "fldkI28kyg7gaiz2g"
+ICP_FIELD_ID = "flda7vhrHp4CuyxdC"
+KEYWORDS_FIELD_ID = "fldwRfzjs6xt5Vqit"
+# Airtable accepts at most 10 records per create/update request
+BATCH_SIZE = 10
+
+
+def brief_fields(brief: Brief) -> Dict[str, Any]:
+    """Record fields for a validated brief: the stored `BriefRecord` and the typed columns it fills."""
+    fields: Dict[str, Any] = {BRIEF_FIELD_ID: BriefRecord(brief=brief).model_dump_json()}
+    info = brief.general_info
+    if info is not None and info.business_name:
+        fields[BUSINESS_NAME_FIELD_ID] = info.business_name
+    if info is not None and info.one_liner:
+        fields[ONE_LINER_FIELD_ID] = info.one_liner
+    if brief.icp:
+        fields[ICP_FIELD_ID] = brief.icp
+    if brief.topics_keywords:
+        fields[KEYWORDS_FIELD_ID] = ", ".join(brief.topics_keywords)
+    return fields
+
+
+def record_brief(record: Dict[str, Any]) -> Optional[Brief]:
+    """The brief stored on a record, read from its one brief field (by id; mirror rows cached by name also work)."""
+    fields = record.get("fields") or {}
+    return read_brief(fields.get(BRIEF_FIELD_ID) or fields.get(BRIEF_FIELD_NAME))
+
+
+def api_url() -> str:
+    return env_str("AIRTABLE_API_URL", "https://api.airtable.com").rstrip("/")
+
+
+class AirtableMirror:
+    """Local SQLite copy of Airtable records keyed by lowercase email, plus pending writes.
+
+    `records` is a read-through cache: rows older than `ttl_seconds` are refetched.
+    `pending` holds field updates not yet sent, merged per record so several writes
+    to one record cost a single PATCH. Each merge bumps `version`, so a flush only
+    clears a row if nothing new was merged into it while the request was in flight.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS airtable_records ("
+            " email TEXT PRIMARY KEY, record_id TEXT NOT NULL, fields TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS airtable_records_id ON airtable_records (record_id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS airtable_pending ("
+            " base_id TEXT NOT NULL, tbl TEXT NOT NULL, record_id TEXT NOT NULL, fields TEXT NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 1, attempts INTEGER NOT NULL DEFAULT 0, error TEXT,"
+            " updated_at REAL NOT NULL, PRIMARY KEY (base_id, tbl, record_id))"
+        )
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record_id, fields, fetched_at FROM airtable_records WHERE email = ?", (email.lower(),)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.ttl_seconds:
+            return None
+        return {"id": row[0], "fields": json.loads(row[1])}
+
+    def put(self, email: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO airtable_records (email, record_id, fields, fetched_at) VALUES (?, ?, ?, ?)",
+                (email.lower(), record["id"], json.dumps(record.get("fields") or {}), time.time()),
+            )
+
+    def queue_update(self, base_id: str, table: str, record_id: str, fields: Dict[str, Any]) -> None:
+        """Merge `fields` into the record's pending update and into the mirrored copy (read-your-writes)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT fields FROM airtable_pending WHERE base_id = ? AND tbl = ? AND record_id = ?",
+                    (base_id, table, record_id),
+                ).fetchone()
+                if row is None:
+                    self._db.execute(
+                        "INSERT INTO airtable_pending (base_id, tbl, record_id, fields, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (base_id, table, record_id, json.dumps(fields), now),
+                    )
+                else:
+                    merged = {**json.loads(row[0]), **fields}
+                    self._db.execute(
+                        "UPDATE airtable_pending SET fields = ?, version = version + 1, updated_at = ?"
+                        " WHERE base_id = ? AND tbl = ? AND record_id = ?",
+                        (json.dumps(merged), now, base_id, table, record_id),
+                    )
+                for email, mirrored in self._db.execute(
+                    "SELECT email, fields FROM airtable_records WHERE record_id = ?", (record_id,)
+                ).fetchall():
+                    self._db.execute(
+                        "UPDATE airtable_records SET fields = ? WHERE email = ?",
+                        (json.dumps({**json.loads(mirrored), **fields}), email),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def pending_batch(self, limit: int = BATCH_SIZE) -> List[Tuple[str, str, str, Dict[str, Any], int]]:
+        """Oldest pending updates that share a base and table: `(base_id, table, record_id, fields, version)`."""
+        with self._lock:
+            first = self._db.execute(
+                "SELECT base_id, tbl FROM airtable_pending ORDER BY updated_at LIMIT 1"
+            ).fetchone()
+            if first is None:
+                return []
+            rows = self._db.execute(
+                "SELECT base_id, tbl, record_id, fields, version FROM airtable_pending"
+                " WHERE base_id = ? AND tbl = ? ORDER BY updated_at LIMIT ?",
+                (first[0], first[1], limit),
+            ).fetchall()
+        return [(r[0], r[1], r[2], json.loads(r[3]), int(r[4])) for r in rows]
+
+    def ack(self, rows: List[Tuple[str, str, str, Dict[str, Any], int]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM airtable_pending WHERE base_id = ? AND tbl = ? AND record_id = ? AND version = ?",
+                [(r[0], r[1], r[2], r[4]) for r in rows],
+            )
+
+    def fail(self, rows: List[Tuple[str, str, str, Dict[str, Any], int]], error: str, max_attempts: int) -> int:
+        """Record a failed flush; rows past `max_attempts` are dropped. Returns how many were dropped."""
+        keys = [(r[0], r[1], r[2]) for r in rows]
+        with self._lock:
+            self._db.executemany(
+                "UPDATE airtable_pending SET attempts = attempts + 1, error = ? WHERE base_id = ? AND tbl = ? AND record_id = ?",
+                [(error, *k) for k in keys],
+            )
+            dropped = self._db.execute("SELECT COUNT(*) FROM airtable_pending WHERE attempts >= ?", (max_attempts,)).fetchone()[0]
+            self._db.execute("DELETE FROM airtable_pending WHERE attempts >= ?", (max_attempts,))
+        return int(dropped)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM airtable_pending").fetchone()[0])
+
+
+class AirtableClient:
+    """Airtable access for one base/table: mirrored reads, write-behind batched updates.
+
+    Every request (lookups, creates and batch PATCHes) takes a token from a shared
+    bucket sized to Airtable's per-base rate limit, so bursts queue locally instead
+    of turning into 429s.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        api_key: str,
+        base_id: str,
+        table: str,
+        mirror: AirtableMirror,
+        bucket: TokenBucket,
+        flush_delay: float = 0.5,
+        max_attempts: int = 5,
+    ) -> None:
+        self.http = http
+        self.api_key = api_key
+        self.base_id = base_id
+        self.table = table
+        self.mirror = mirror
+        self.bucket = bucket
+        self.flush_delay = flush_delay
+        self.max_attempts = max_attempts
+        self.url = f"{api_url()}/v0/{base_id}/{urlquote(table, safe='')}"
+        # Index of the lookup formula that last matched, tried first next time
+        self._formula_hint = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.stats: Dict[str, Any] = {
+            "mirror_hits": 0, "mirror_misses": 0, "requests": 0, "batches": 0,
+            "records_flushed": 0, "dropped": 0, "rate_limited": 0, "last_error": None,
+        }
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    async def _request(self, method: str, url: Optional[str] = None, idempotent: bool = True, **kwargs: Any) -> httpx.Response:
+        """One logical request: retried on 429/5xx/connection errors, each attempt paced by the bucket."""
+
+        async def attempt() -> httpx.Response:
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            r = await self.http.request(method, url or self.url, headers=self._headers(), **kwargs)
+            if r.status_code == 429:
+                self.stats["rate_limited"] += 1
+            return r
+
+        with span("airtable.request", method=method) as sp:
+            r = await call("airtable", attempt, idempotent=idempotent)
+            if r.status_code >= 400:
+                sp.status = str(r.status_code)
+        return r
+
+    async def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        email = email.strip().lower()
+        # The mirror is SQLite with a 30s busy timeout; its calls run off the event loop
+        cached = await asyncio.to_thread(self.mirror.get, email)
+        if cached is not None:
+            self.stats["mirror_hits"] += 1
+            return cached
+        self.stats["mirror_misses"] += 1
+        # Many Airtable endpoints require field NAMES in filterByFormula. Try name first, then ID fallback.
+        formulas = [
+            f"LOWER({{Email}})='{email}'",
+            f"LOWER({{{EMAIL_FIELD_ID}}})='{email}'",
+        ]
+        order = [self._formula_hint] + [i for i in range(len(formulas)) if i != self._formula_hint]
+        for i in order:
+            # Fields keyed by id, like the ones we write, so reads never depend on display names
+            r = await self._request("GET", params={"maxRecords": 1, "filterByFormula": formulas[i], "returnFieldsByFieldId": "true"})
+            if r.status_code == 422:
+                # Unknown field name in this formula variant; anything else is a real failure
+                continue
+            r.raise_for_status()
+            self._formula_hint = i
+            recs = r.json().get("records", [])
+            if recs:
+                await asyncio.to_thread(self.mirror.put, email, recs[0])
+                return recs[0]
+            # The formula worked and there is simply no such record
+            return None
+        return None
+
+    async def create(self, email: str) -> Dict[str, Any]:
+        # Not idempotent: a timed-out create may have landed, so only provably unsent attempts are retried
+        r = await self._request("POST", idempotent=False, json={"records": [{"fields": {EMAIL_FIELD_ID: email}}], "returnFieldsByFieldId": True})
+        r.raise_for_status()
+        record = r.json()["records"][0]
+        await asyncio.to_thread(self.mirror.put, email, record)
+        return record
+
+    async def update_later(self, record_id: str, fields: Dict[str, Any]) -> None:
+        """Queue a field update; it is merged with other pending updates and sent in a batch."""
+        await asyncio.to_thread(self.mirror.queue_update, self.base_id, self.table, record_id, fields)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Send pending updates in batches of up to 10 records; returns the number flushed."""
+        flushed = 0
+        while True:
+            rows = await asyncio.to_thread(self.mirror.pending_batch, BATCH_SIZE)
+            if not rows:
+                return flushed
+            base_id, table = rows[0][0], rows[0][1]
+            url = f"{api_url()}/v0/{base_id}/{urlquote(table, safe='')}"
+            payload = {"records": [{"id": r[2], "fields": r[3]} for r in rows]}
+            try:
+                r = await self._request("PATCH", url=url, json=payload)
+                if r.status_code == 429:
+                    # Leave the rows queued; back off for as long as Airtable asks
+                    await asyncio.sleep(float(r.headers.get("retry-after") or 30))
+                    continue
+                if classify(r) is not None:
+                    # Still failing after retries: keep the rows for the next round without charging them
+                    self.stats["last_error"] = f"HTTP {r.status_code}"
+                    return flushed
+                r.raise_for_status()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if is_upstream_failure(e):
+                    # Airtable is unreachable or its breaker is open; the rows wait on disk
+                    self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                    return flushed
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                self.stats["dropped"] += await asyncio.to_thread(self.mirror.fail, rows, self.stats["last_error"], self.max_attempts)
+                return flushed
+            await asyncio.to_thread(self.mirror.ack, rows)
+            self.stats["batches"] += 1
+            self.stats["records_flushed"] += len(rows)
+            flushed += len(rows)
+
+    async def _flusher(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(self.flush_delay, 5.0))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Linger briefly so updates landing close together merge into one PATCH
+            await asyncio.sleep(self.flush_delay)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._flusher())
+            if self.mirror.pending_count():
+                self._wakeup.set()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        # Best-effort final flush; anything left stays queued on disk for the next start
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except Exception:
+            pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self.mirror.pending_count()}
+
+
+def mirror_from_env() -> AirtableMirror:
+    return AirtableMirror(
+        data_path("AIRTABLE_MIRROR_PATH", "airtable.sqlite3"),
+        ttl_seconds=env_float("AIRTABLE_MIRROR_TTL", 3600),
+    )
+
+
+_MIRROR: Optional[AirtableMirror] = None
+_BUCKET: Optional[TokenBucket] = None
+_CLIENT: Optional[AirtableClient] = None
+
+
+def get_airtable(http: httpx.AsyncClient, api_key: Optional[str], base_id: Optional[str], table: str) -> Optional[AirtableClient]:
+    """Return the shared client for this base/table, or None when Airtable is not configured."""
+    global _MIRROR, _BUCKET, _CLIENT
+    if not (api_key and base_id):
+        return None
+    if _CLIENT is not None and (_CLIENT.http, _CLIENT.api_key, _CLIENT.base_id, _CLIENT.table) == (http, api_key, base_id, table):
+        return _CLIENT
+    if _MIRROR is None:
+        _MIRROR = mirror_from_env()
+    if _BUCKET is None:
+        # Airtable allows 5 requests per second per base; a burst above 1 can exceed that
+        # in a one-second window, and a 429 costs a 30 second lockout
+        _BUCKET = TokenBucket(env_float("AIRTABLE_RPS", 5), env_float("AIRTABLE_BURST", 1))
+    previous = _CLIENT
+    _CLIENT = AirtableClient(
+        http, api_key, base_id, table, _MIRROR, _BUCKET,
+        flush_delay=env_float("AIRTABLE_FLUSH_DELAY", 0.5),
+        max_attempts=env_int("AIRTABLE_MAX_ATTEMPTS", 5),
+    )
+    if previous is not None and previous._task is not None:
+        # Config changed while running: hand the flusher over to the new client
+        previous._task.cancel()
+        previous._task = None
+        _CLIENT.start()
+    return _CLIENT
+
+
+def current_airtable() -> Optional[AirtableClient]:
+    return _CLIENT
@@ -1,198 +1,356 @@
+import asyncio
+import hmac
+import ipaddress
 import os
 import json
-from typing import Any, Dict, Optional, List
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import signal
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, List, Tuple
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from openai import OpenAI
-from dotenv import load_dotenv
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr, ValidationError
 import httpx
+from starlette.background import BackgroundTask
+from .admission import Overloaded, RateLimited, get_admission, retry_after_header
+from .admission import describe as admission_describe
+from .airtable import BRIEF_FIELD_ID, AirtableClient, brief_fields, current_airtable, get_airtable, record_brief
+from .brief_cache import cache_domain, get_brief_cache
+from .cancellation import ClientDisconnected, cancel_on_disconnect, record_cancelled
+from .chat_context import new_context_state
+from .clients import clients_lifespan, get_clients
+from .images import get_image_store
+from .jobs import get_job_queue
+from .metrics import render as render_metrics, span
+from .prompts import BRIEF_RESEARCH, record_usage, stats as prompt_stats
+from .resilience import CircuitOpenError, DeadlineExceeded, breakers, call, deadline
+from .routing import get_router
+from .schemas import Brief, BriefRecord, StructuredOutputError, parsed_output
+from .scheduler import get_scheduler, priority
+from .settings import DEBUG_LEVELS, get_settings, reload_settings
+from .sessions import get_session_store
+from .singleflight import SingleFlight, email_domain, normalize_email
 try:
-    from .agents.orchestrator import run_all_parallel, save_to_airtable
+    from .agents.orchestrator import run_all_parallel
 except Exception:
     run_all_parallel = None  # type: ignore
-    save_to_airtable = None  # type: ignore
 
-# Lazy-load chat agent so we can surface import errors and try multiple paths
+# Chat agent is imported during startup; import errors are surfaced by /api/ready and chat responses
 chat_respond = None  # type: ignore
+chat_respond_stream = None  # type: ignore
+warm_chat_agents = None  # type: ignore
 ChatTurn = None  # type: ignore
 CHAT_IMPORT_ERROR: Optional[str] = None
 
-def _load_chat_impl() -> None:
-    global chat_respond, ChatTurn, CHAT_IMPORT_ERROR
-    if chat_respond is not None and ChatTurn is not None:
-        return
+# Filled in by the startup phase of the lifespan and reported by /api/ready
+STARTUP: Dict[str, Any] = {"ready": False}
+
+
+def _import_chat_impl() -> None:
+    global chat_respond, chat_respond_stream, warm_chat_agents, ChatTurn, CHAT_IMPORT_ERROR
     try:
-        # Primary: relative import
-        from .agents_sdk.orchestrator import chat_respond as cr, ChatTurn as CT  # type: ignore
-        chat_respond, ChatTurn = cr, CT
+        from .agents_sdk.orchestrator import chat_respond as cr, chat_respond_stream as crs, warm_agents as wa, ChatTurn as CT  # type: ignore
+        chat_respond, chat_respond_stream, warm_chat_agents, ChatTurn = cr, crs, wa, CT
         CHAT_IMPORT_ERROR = None
-        return
-    except Exception as e1:
-        CHAT_IMPORT_ERROR = f"relative import failed: {e1}"
+    except Exception as e:
+        CHAT_IMPORT_ERROR = f"{type(e).__name__}: {e}"
+
+
+get_settings()
+
+
+def _install_reload_signal() -> bool:
+    # SIGHUP re-reads .env without a restart (not available on every platform)
     try:
-        # Fallback: absolute import (if server is a package on sys.path)
-        from server.agents_sdk.orchestrator import chat_respond as cr, ChatTurn as CT  # type: ignore
-        chat_respond, ChatTurn = cr, CT
-        CHAT_IMPORT_ERROR = None
-        return
-    except Exception as e2:
-        CHAT_IMPORT_ERROR = (CHAT_IMPORT_ERROR or "") + f"; absolute import failed: {e2}"
-from urllib.parse import quote as urlquote
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_settings)
+        return True
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        return False
+
+
+async def _queue_ok(queue: Any) -> bool:
+    try:
+        await queue.acounts()
+        return True
+    except Exception:
+        return False
+
+
+async def _startup(queue: Any) -> None:
+    """Import, build and warm everything the first request would otherwise pay for."""
+    STARTUP.clear()
+    STARTUP["ready"] = False
+    t0 = time.perf_counter()
+    settings = get_settings()
+    _import_chat_impl()
+    t1 = time.perf_counter()
+    warmed = None
+    if warm_chat_agents is not None:
+        try:
+            registry = await warm_chat_agents()
+            warmed = registry.warmed if settings.chat_warmup else None
+        except Exception as e:
+            STARTUP["warmup_error"] = str(e)
+    STARTUP.update({
+        "checks": {
+            "chat_agent": chat_respond is not None,
+            "openai_api_key": bool(settings.openai_api_key),
+            "job_queue": await _queue_ok(queue),
+            "brief_agents": run_all_parallel is not None,
+        },
+        "import_error": CHAT_IMPORT_ERROR,
+        "warmed": warmed,
+        "import_ms": round((t1 - t0) * 1000, 1),
+        "startup_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "reload_signal": _install_reload_signal(),
+    })
+    STARTUP["ready"] = all(STARTUP["checks"].values())
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Shared keep-alive pools for Airtable and OpenAI live for the whole app
+    async with clients_lifespan():
+        queue = get_job_queue()
+        queue.register("brief", _brief_job)
+        await queue.start()
+        await _startup(queue)
+        airtable = _airtable()
+        if airtable is not None:
+            # Flushes queued Airtable writes, including any left on disk by a previous run
+            airtable.start()
+        try:
+            yield
+        finally:
+            STARTUP["ready"] = False
+            if STARTUP.get("reload_signal"):
+                asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            await queue.stop()
+            airtable = current_airtable()
+            if airtable is not None:
+                await airtable.stop()
+
+
+app = FastAPI(title="Markit Backend", version="0.1.0", lifespan=lifespan)
+
+
+@asynccontextmanager
+async def brief_runtime() -> AsyncIterator[None]:
+    """Client pools and the Airtable writer for generating briefs outside the server (`server.batch`)."""
+    async with clients_lifespan():
+        airtable = _airtable()
+        if airtable is not None:
+            airtable.start()
+        try:
+            yield
+        finally:
+            if airtable is not None:
+                # Drain queued Airtable writes before the pools close
+                await airtable.stop()
 
-load_dotenv(override=True)
 
-app = FastAPI(title="Markit Backend", version="0.1.0")
+async def generate_brief(email: str, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Find or create the lead's record and generate its brief inline, as `POST /api/brief?wait=true` does.
+
+    Skips the HTTP admission and request sharing; call it inside `brief_runtime()`.
+    Stage durations are added to `timings` when given.
+    """
+    return await _create_brief(email, wait=True, timings=timings)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # tighten later
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the pages read how long to back off after a 429/503
+    expose_headers=["Retry-After"],
 )
 
+
+@app.exception_handler(ClientDisconnected)
+async def _client_disconnected(_request: Request, _exc: ClientDisconnected) -> Response:
+    # Nobody is listening; nginx's "client closed request" keeps these apart in access logs
+    return Response(status_code=499)
+
+
+@app.exception_handler(Overloaded)
+async def _overloaded(_request: Request, exc: Overloaded) -> Response:
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": retry_after_header(exc.retry_after)})
+
+
+@app.exception_handler(RateLimited)
+async def _rate_limited(_request: Request, exc: RateLimited) -> Response:
+    return JSONResponse({"detail": str(exc)}, status_code=429, headers={"Retry-After": retry_after_header(exc.retry_after)})
+
+
 class BriefRequest(BaseModel):
     email: EmailStr
 class ChatStartRequest(BaseModel):
     email: EmailStr
+    debug: Optional[str] = None
 
 
 class ChatSendRequest(BaseModel):
     session_id: str
     email: EmailStr
     message: str
+    # off | basic | full; defaults to CHAT_DEBUG_LEVEL
+    debug: Optional[str] = None
 
 
-# In-memory chat sessions (basic; can swap to Redis later)
-CHAT_SESSIONS: Dict[str, List[Dict[str, str]]] = {}
+# Small, fixed-size meta fields kept at the basic level; prompts, transcripts and raw dumps are full-only
+_BASIC_META_KEYS = ("provider", "agent", "model", "route", "streamed", "context", "usage", "airtable", "error", "error_primary", "error_fallback")
 
 
-def _airtable_headers(api_key: str) -> Dict[str, str]:
-    return {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+def _debug_level(requested: Optional[str]) -> str:
+    level = (requested or "").strip().lower()
+    return level if level in DEBUG_LEVELS else get_settings().chat_debug_level
 
-async def _airtable_find_by_email(client_http: httpx.AsyncClient, base_id: str, table: str, api_key: str, email: str) -> Optional[Dict[str, Any]]:
-    # Many Airtable endpoints require field NAMES in filterByFormula. Try name first, then ID fallback.
-    formulas = [
-        f"LOWER({{Email}})='{email.lower()}'",
-        f"LOWER({{fldXhVuckpHBhWJOX}})='{email.lower()}'",
-    ]
-    url = f"https://api.airtable.com/v0/{base_id}/{urlquote(table, safe='')}"
-    last_err: Optional[Exception] = None
-    for f in formulas:
-        try:
-            r = await client_http.get(url, headers=_airtable_headers(api_key), params={
-                "maxRecords": 1,
-                "filterByFormula": f,
-            })
-            r.raise_for_status()
-            data = r.json()
-            recs = data.get("records", [])
-            if recs:
-                return recs[0]
-        except Exception as e:
-            last_err = e
-            continue
-    if last_err:
-        # swallow; higher level will record an error status if needed
-        pass
-    return None
-
-async def _airtable_create_record(client_http: httpx.AsyncClient, base_id: str, table: str, api_key: str, email: str) -> Dict[str, Any]:
-    url = f"https://api.airtable.com/v0/{base_id}/{urlquote(table, safe='')}"
-    payload = {"records": [{"fields": {"fldXhVuckpHBhWJOX": email}}]}
-    r = await client_http.post(url, headers=_airtable_headers(api_key), json=payload)
-    r.raise_for_status()
-    return r.json()["records"][0]
-
-async def _airtable_update_record(client_http: httpx.AsyncClient, base_id: str, table: str, api_key: str, record_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
-    url = f"https://api.airtable.com/v0/{base_id}/{urlquote(table, safe='')}"
-    payload = {"records": [{"id": record_id, "fields": fields}]}
-    r = await client_http.patch(url, headers=_airtable_headers(api_key), json=payload)
-    r.raise_for_status()
-    return r.json()
-
-async def _run_generation_and_update(email: str, api_key: str, airtable_api_key: str, airtable_base_id: str, airtable_table: str, record_id: str) -> Dict[str, Any]:
-    client = OpenAI(api_key=api_key)
-    developer_text = (
-        "<ROLE> You are a marketing research analyst. Given an email with a business URL, separate the URL and use the web search tool to produce a concise, specific, marketing-ready JSON brief for PR, UGC, and creator workflows. </ROLE>\n"
-        "<PRINCIPLES>\nAlways use web search; no prior knowledge.\nUse primary sources first, then secondary (≤24 months).\nNo fluff; only specific, actionable facts.\nIf unverifiable or <70% confidence, return null.\nOutput exactly in schema below. </PRINCIPLES>\n"
-        "<PROCESS>\nConfirm correct company from URL.\n"
-        "general_info: business_name, one_liner, website.\n"
-        "products: For each top product — name, description, pricing_summary, key_features, pain_points_solved, target_use_cases.\n"
-        "icp: 3–5 sentence vivid persona of the perfect customer for top product(s).\n"
-        "competitors: Direct only — name, url, why_competes.\n"
-        "topics_keywords:\nFrom audience perspective, pick influencer topics/niches most aligned with products + ICP.\n"
-        "Exactly 10 keywords, 1–2 words each (1 word preferred).\n"
-        "Avoid obscure terms unless ICP uses them often.\n"
-        "No grouping, flat list. </PROCESS>\n"
-        "<OUTPUT_SCHEMA>\njson: {   \"general_info\": {     \"business_name\": \"\",     \"one_liner\": \"\",     \"website\": \"\"   },   \"products\": [     {       \"name\": \"\",       \"description\": \"\",       \"pricing_summary\": \"\",       \"key_features\": [],       \"pain_points_solved\": [],       \"target_use_cases\": []     }   ],   \"icp\": \"\",   \"competitors\": [     {       \"name\": \"\",       \"url\": \"\",       \"why_competes\": \"\"     }   ],   \"topics_keywords\": [\"\", \"\", \"\", \"\", \"\", \"\", \"\", \"\", \"\", \"\"] } \n"
-        "<STYLE>\nKeep all text short, specific, and marketing-useful.\nICP must be vivid and realistic (job title, goals, challenges, buying behavior).\nInclude pain points inside each product.\nAvoid corporate trivia. </STYLE>\n"
-        "<FAILSAFE> If a required field is unverifiable or <70% confident, return null. If you are unsure about the company, return \"null\" and nothing else"
-    )
 
-    resp = client.responses.create(
-        model="gpt-5",
-        input=[
-            {"role": "developer", "content": [{"type": "input_text", "text": developer_text}]},
-            {"role": "user", "content": [{"type": "input_text", "text": email}]},
-        ],
-        text={"format": {"type": "text"}, "verbosity": "medium"},
-        reasoning={"effort": "high", "summary": "detailed"},
-        tools=[{"type": "web_search_preview", "user_location": {"type": "approximate", "country": "US"}, "search_context_size": "medium"}],
-        store=True,
-    )
+def _slim_meta(meta: Dict[str, Any], level: str) -> Dict[str, Any]:
+    if level == "full":
+        return meta
+    if level == "off":
+        return {}
+    return {k: meta[k] for k in _BASIC_META_KEYS if k in meta}
 
-    output_text = getattr(resp, "output_text", None)
-    data: Any = output_text
-    try:
-        if isinstance(output_text, str):
-            data = json.loads(output_text)
-    except Exception:
-        pass
 
-    # Update Airtable with fields
-    fields_update: Dict[str, Any] = {
-        "fldNLJlEqVwvOg100": json.dumps(data) if not isinstance(data, str) else (data or "")
-    }
-    try:
-        if isinstance(data, dict):
-            gi = data.get("general_info", {}) if isinstance(data.get("general_info", {}), dict) else {}
-            if gi.get("business_name"): fields_update["fldsrAZbfzPGLP6F8"] = str(gi.get("business_name"))
-            if gi.get("one_liner"): fields_update["fldkI28kyg7gaiz2g"] = str(gi.get("one_liner"))
-            if data.get("icp"): fields_update["flda7vhrHp4CuyxdC"] = str(data.get("icp"))
-            if isinstance(data.get("topics_keywords"), list):
-                fields_update["fldwRfzjs6xt5Vqit"] = ", ".join([str(k) for k in data.get("topics_keywords")])
-    except Exception:
-        pass
+# In-process de-duplication of concurrent brief requests and research calls
+BRIEF_REQUESTS = SingleFlight()
+BRIEF_GENERATIONS = SingleFlight()
 
-    async with httpx.AsyncClient(timeout=30) as http_client:
-        await _airtable_update_record(http_client, airtable_base_id, airtable_table, airtable_api_key, record_id, fields_update)
+
+def _airtable_config() -> Tuple[Optional[str], Optional[str], str]:
+    settings = get_settings()
+    return settings.airtable_api_key, settings.airtable_base_id, settings.airtable_table
+
+
+def _airtable() -> Optional[AirtableClient]:
+    """Shared mirrored Airtable client for the configured base/table, or None if not configured."""
+    api_key, base_id, table = _airtable_config()
+    return get_airtable(get_clients().airtable, api_key, base_id, table)
+
+async def _generate_brief(email: str, api_key: str) -> Tuple[Brief, Optional[str]]:
+    client = get_clients().openai(api_key)
+    with span("openai.responses", prompt=BRIEF_RESEARCH.name) as sp:
+        try:
+            # Strict JSON-schema output: the brief either validates or the call fails here, not downstream
+            resp = await call("openai", lambda: client.responses.parse(
+                model="gpt-5",
+                input=[
+                    {"role": "developer", "content": [{"type": "input_text", "text": BRIEF_RESEARCH.text}]},
+                    {"role": "user", "content": [{"type": "input_text", "text": email}]},
+                ],
+                text_format=Brief,
+                text={"verbosity": "medium"},
+                reasoning={"effort": "high", "summary": "detailed"},
+                tools=[{"type": "web_search_preview", "user_location": {"type": "approximate", "country": "US"}, "search_context_size": "medium"}],
+                store=True,
+                extra_body=BRIEF_RESEARCH.cache_args(),
+            ))
+        except ValidationError as e:
+            raise StructuredOutputError(BRIEF_RESEARCH.name, f"invalid JSON ({e.error_count()} errors)") from e
+        if getattr(resp, "usage", None) is not None:
+            sp.usage(record_usage(BRIEF_RESEARCH, resp.usage))
+    return parsed_output(resp, Brief, BRIEF_RESEARCH.name), getattr(resp, "output_text", None)
+
+
+async def _generate_brief_shared(email: str, api_key: str) -> Tuple[Brief, Optional[str], str]:
+    """Return `(brief, raw, cache_status)`, consulting the domain brief cache first."""
+    cache = get_brief_cache()
+    domain = cache_domain(email) if cache is not None else ""
+    if cache is not None and domain:
+        cached = await cache.aget(domain)
+        if cached is not None:
+            try:
+                return Brief.model_validate(cached.get("data")), cached.get("raw"), "hit"
+            except ValidationError:
+                # Cached before briefs were validated and does not fit the schema: research again
+                pass
+
+    async def _generate() -> Tuple[Brief, Optional[str]]:
+        brief, output_text = await _generate_brief(email, api_key)
+        # Only briefs that identified the company are worth sharing across its leads
+        if cache is not None and domain and brief.identified:
+            await cache.aset(domain, {"data": brief.model_dump(), "raw": output_text})
+        return brief, output_text
+
+    # Collapse concurrent research for the same email (or company domain when enabled)
+    key = f"email:{normalize_email(email)}"
+    if get_settings().brief_singleflight_domain and email_domain(email):
+        key = f"domain:{email_domain(email)}"
+    (brief, output_text), _shared = await BRIEF_GENERATIONS.do([key], _generate)
+    return brief, output_text, ("miss" if cache is not None and domain else "bypass")
+
+
+async def _run_generation_and_update(email: str, api_key: str, record_id: str, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    timings = timings if timings is not None else {}
+    with span("stage.brief") as stage:
+        brief, output_text, cache_status = await _generate_brief_shared(email, api_key)
+        stage.attrs["cache"] = cache_status
+    timings["brief_ms"] = stage.ms
+    data = brief.model_dump()
+
+    # Writes go through the write-behind queue: the brief fields and the orchestration
+    # result below are merged into a single batched PATCH for this record
+    airtable = _airtable() if record_id else None
+    if airtable is not None:
+        await airtable.update_later(record_id, brief_fields(brief))
 
     # Run 4 agents in parallel and save consolidated output
-    try:
-        consolidated = await run_all_parallel(api_key, email)
-        await save_to_airtable(airtable_base_id, airtable_table, airtable_api_key, record_id, {"orchestration": consolidated})
-    except Exception:
-        pass
+    with span("stage.agents") as stage:
+        try:
+            settings = get_settings()
+            grounding = data if settings.agents_grounded and brief.identified else None
+            consolidated = await run_all_parallel(api_key, email, brief=grounding, search_agents=settings.agents_web_search)
+            if airtable is not None:
+                # Stored next to the brief in the same field, so chat can still read the brief afterwards
+                await airtable.update_later(record_id, {BRIEF_FIELD_ID: BriefRecord(brief=brief, orchestration=consolidated).model_dump_json()})
+        except Exception as e:
+            stage.status = "error"
+            stage.attrs["error"] = f"{type(e).__name__}: {e}"
+    timings["agents_ms"] = stage.ms
+
+    return {"data": data, "raw": output_text, "record_id": record_id, "cache": cache_status}
 
-    return {"data": data, "raw": output_text, "record_id": record_id}
+
+def _upstream_status(e: Exception) -> int:
+    # Out of budget -> 504, dependency known to be down -> 503, anything else upstream -> 502
+    if isinstance(e, DeadlineExceeded):
+        return 504
+    if isinstance(e, CircuitOpenError):
+        return 503
+    return 502
 
 
 @app.post("/api/brief")
-async def create_brief(req: BriefRequest, background: BackgroundTasks, wait: bool = True) -> Dict[str, Any]:
-    # Reload env and construct client with current key each request
-    load_dotenv(override=True)
-    api_key = os.getenv("OPENAI_API_KEY")
+async def create_brief(req: BriefRequest, request: Request, wait: bool = True) -> Dict[str, Any]:
+    # Double submits and the parallel generate.html calls share one find/create/generate run.
+    # `wait` is part of the key: a queued submit must not get an inline caller's generated
+    # brief back, nor an inline caller a job id. The research itself is shared either way.
+    email = str(req.email)
+    admission = get_admission("brief")
+    admission.check_rate(request, email)
+
+    async def _admitted() -> Tuple[Dict[str, Any], bool]:
+        # Only inline generation takes a slot; queued briefs are paced by the job queue's workers.
+        # The budget covers lookup, research and agents; every upstream call inside inherits it.
+        async with (admission.gate.slot() if wait else nullcontext()):
+            with deadline(get_settings().brief_deadline_s):
+                return await BRIEF_REQUESTS.do(
+                    [f"email:{normalize_email(email)}:{'wait' if wait else 'queue'}"], lambda: _create_brief(email, wait)
+                )
+
+    # A closed tab cancels this caller, including its place in the queue; the shared run stops once no caller is left
+    result, shared = await cancel_on_disconnect(request, _admitted, "brief")
+    return {**result, "deduplicated": shared}
+
+
+async def _create_brief(email: str, wait: bool, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    api_key = get_settings().openai_api_key
     if not api_key:
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY not set on server")
-    client = OpenAI(api_key=api_key)
-    airtable_api_key = os.getenv("AIRTABLE_API_KEY")
-    airtable_base_id = os.getenv("AIRTABLE_BASE_ID")
-    # Sanitize table env (strip whitespace or stray '%' from copy/paste)
-    _tbl = os.getenv("AIRTABLE_TABLE", "OAI Hackathon") or "OAI Hackathon"
-    airtable_table = _tbl.strip().rstrip('%')
+    airtable_api_key, airtable_base_id, _ = _airtable_config()
 
     if not airtable_api_key or not airtable_base_id:
         # Continue without Airtable, but note missing config
@@ -201,140 +359,229 @@ async def create_brief(req: BriefRequest, background: BackgroundTasks, wait: boo
         airtable_enabled = True
     airtable_status: Dict[str, Any] = {"enabled": airtable_enabled}
 
-    developer_text = (
-        "<ROLE> You are a marketing research analyst. Given an email with a business URL, separate the URL and use the web search tool to produce a concise, specific, marketing-ready JSON brief for PR, UGC, and creator workflows. </ROLE>\n"
-        "<PRINCIPLES>\nAlways use web search; no prior knowledge.\nUse primary sources first, then secondary (≤24 months).\nNo fluff; only specific, actionable facts.\nIf unverifiable or <70% confidence, return null.\nOutput exactly in schema below. </PRINCIPLES>\n"
-        "<PROCESS>\nConfirm correct company from URL.\n"
-        "general_info: business_name, one_liner, website.\n"
-        "products: For each top product — name, description, pricing_summary, key_features, pain_points_solved, target_use_cases.\n"
-        "icp: 3–5 sentence vivid persona of the perfect customer for top product(s).\n"
-        "competitors: Direct only — name, url, why_competes.\n"
-        "topics_keywords:\nFrom audience perspective, pick influencer topics/niches most aligned with products + ICP.\n"
-        "Exactly 10 keywords, 1–2 words each (1 word preferred).\n"
-        "Avoid obscure terms unless ICP uses them often.\n"
-        "No grouping, flat list. </PROCESS>\n"
-        "<OUTPUT_SCHEMA>\njson: {   \"general_info\": {     \"business_name\": \"\",     \"one_liner\": \"\",     \"website\": \"\"   },   \"products\": [     {       \"name\": \"\",       \"description\": \"\",       \"pricing_summary\": \"\",       \"key_features\": [],       \"pain_points_solved\": [],       \"target_use_cases\": []     }   ],   \"icp\": \"\",   \"competitors\": [     {       \"name\": \"\",       \"url\": \"\",       \"why_competes\": \"\"     }   ],   \"topics_keywords\": [\"\", \"\", \"\", \"\", \"\", \"\", \"\", \"\", \"\", \"\"] } \n"
-        "<STYLE>\nKeep all text short, specific, and marketing-useful.\nICP must be vivid and realistic (job title, goals, challenges, buying behavior).\nInclude pain points inside each product.\nAvoid corporate trivia. </STYLE>\n"
-        "<FAILSAFE> If a required field is unverifiable or <70% confident, return null. If you are unsure about the company, return \"null\" and nothing else"
-    )
-
     # Airtable: find or create
     existing_record = None
     created_record = None
+    mode = "created"
     if airtable_enabled:
+        t0 = time.perf_counter()
         try:
-            async with httpx.AsyncClient(timeout=30) as http_client:
-                existing_record = await _airtable_find_by_email(http_client, airtable_base_id, airtable_table, airtable_api_key, str(req.email))
-                airtable_status["checked"] = True
-                if existing_record:
-                    airtable_status["existing_record_id"] = existing_record.get("id")
+            airtable = _airtable()
+            assert airtable is not None
+            existing_record = await airtable.find_by_email(email)
+            airtable_status["checked"] = True
+            if existing_record:
+                airtable_status["existing_record_id"] = existing_record.get("id")
+                pending_job = await get_job_queue().afind_active("brief", "record_id", existing_record.get("id"))
+                if pending_job or (existing_record.get("fields") or {}).get(BRIEF_FIELD_ID):
                     return {
                         "ok": True,
                         "mode": "existing",
                         "record_id": existing_record.get("id"),
                         "fields": existing_record.get("fields", {}),
+                        **({"job_id": pending_job} if pending_job else {}),
                         "airtable": airtable_status,
                     }
-                created_record = await _airtable_create_record(http_client, airtable_base_id, airtable_table, airtable_api_key, str(req.email))
+                # Created by a run that was cancelled or died before its brief was written: finish it now
+                created_record = existing_record
+                mode = "resumed"
+            else:
+                created_record = await airtable.create(email)
                 airtable_status["created_record_id"] = created_record.get("id")
         except httpx.HTTPError as e:
             airtable_status["error"] = f"HTTPError: {e}"
         except Exception as e:
             airtable_status["error"] = f"Error: {e}"
+        finally:
+            if timings is not None:
+                timings["airtable_ms"] = round((time.perf_counter() - t0) * 1000, 1)
 
-    # Run generation either inline (wait=True) or schedule in background (wait=False)
+    # Run generation either inline (wait=True) or hand it to the durable job queue (wait=False)
     if created_record and airtable_enabled:
+        payload = {"email": email, "record_id": created_record["id"]}
         if wait:
-            try:
-                result = await _run_generation_and_update(str(req.email), api_key, airtable_api_key, airtable_base_id, airtable_table, created_record["id"])
-                airtable_status["updated"] = True
-                return {
-                    "ok": True,
-                    "mode": "created",
-                    "email": str(req.email),
-                    "record_id": created_record.get("id"),
-                    "data": result.get("data"),
-                    "raw": result.get("raw"),
-                    "airtable": airtable_status,
-                }
-            except Exception as e:
-                raise HTTPException(status_code=502, detail=f"OpenAI/Airtable processing failed: {e}")
+            # The inline run is recorded as a running job, so a record without a brief is
+            # only resumed once nobody is generating it any more
+            async with get_job_queue().inline("brief", payload, unique="record_id") as job:
+                if not job["owned"]:
+                    # Another submit or worker started this record's brief after the lookup above
+                    return {"ok": True, "mode": "existing", "record_id": created_record.get("id"), "job_id": job["id"], "airtable": airtable_status}
+                try:
+                    result = await _run_generation_and_update(email, api_key, created_record["id"], timings=timings)
+                except Exception as e:
+                    raise HTTPException(status_code=_upstream_status(e), detail=f"OpenAI/Airtable processing failed: {e}")
+                job["result"] = {"record_id": created_record.get("id"), "data": result.get("data"), "cache": result.get("cache")}
+            airtable_status["updated"] = True
+            return {
+                "ok": True,
+                "mode": mode,
+                "email": email,
+                "record_id": created_record.get("id"),
+                "data": result.get("data"),
+                "raw": result.get("raw"),
+                "cache": result.get("cache"),
+                "airtable": airtable_status,
+            }
         else:
-            background.add_task(_run_generation_and_update, str(req.email), api_key, airtable_api_key, airtable_base_id, airtable_table, created_record["id"]) 
+            job_id = await get_job_queue().aenqueue("brief", payload, unique="record_id")
             return {
                 "ok": True,
                 "mode": "queued",
-                "email": str(req.email),
+                "email": email,
                 "record_id": created_record.get("id"),
+                "job_id": job_id,
                 "airtable": airtable_status,
             }
     # If Airtable disabled, still run and return data when wait=True
     if wait:
         try:
-            result = await _run_generation_and_update(str(req.email), api_key, airtable_api_key or "", airtable_base_id or "", airtable_table or "OAI Hackathon", record_id="")
-            return {"ok": True, "mode": "created", "email": str(req.email), "record_id": None, "data": result.get("data"), "raw": result.get("raw"), "airtable": airtable_status}
+            result = await _run_generation_and_update(email, api_key, record_id="", timings=timings)
+            return {"ok": True, "mode": "created", "email": email, "record_id": None, "data": result.get("data"), "raw": result.get("raw"), "cache": result.get("cache"), "airtable": airtable_status}
         except Exception as e:
-            raise HTTPException(status_code=502, detail=f"OpenAI processing failed: {e}")
+            raise HTTPException(status_code=_upstream_status(e), detail=f"OpenAI processing failed: {e}")
     else:
-        background.add_task(_run_generation_and_update, str(req.email), api_key, airtable_api_key or "", airtable_base_id or "", airtable_table or "OAI Hackathon", record_id="")
-        return {"ok": True, "mode": "queued", "email": str(req.email), "record_id": None, "airtable": airtable_status}
+        job_id = await get_job_queue().aenqueue("brief", {"email": email, "record_id": ""})
+        return {"ok": True, "mode": "queued", "email": email, "record_id": None, "job_id": job_id, "airtable": airtable_status}
+
+
+async def _brief_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Keys are resolved when the job runs so they never sit in the job database
+    api_key = get_settings().openai_api_key
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set on server")
+    airtable_api_key, airtable_base_id, _ = _airtable_config()
+    record_id = payload.get("record_id") or ""
+    if record_id and not (airtable_api_key and airtable_base_id):
+        raise RuntimeError("Airtable not configured for queued record")
+    # Queued briefs have nobody waiting on them; they yield OpenAI budget to inline briefs and chat
+    with deadline(get_settings().brief_deadline_s), priority("background"):
+        result = await _run_generation_and_update(str(payload["email"]), api_key, record_id)
+    return {"record_id": record_id or None, "data": result.get("data"), "cache": result.get("cache")}
+
+
+@app.get("/api/brief/jobs/{job_id}")
+async def brief_job_status(job_id: str) -> Dict[str, Any]:
+    """Return the state of a queued brief generation (queued/running/succeeded/failed)."""
+    job = await get_job_queue().aget(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    return {"ok": True, "job": job}
+
+
+@app.get("/api/ready")
+async def ready() -> Response:
+    """Readiness probe: 200 once startup has imported, built and checked everything, else 503."""
+    airtable = current_airtable()
+    body = {**STARTUP, "settings_loaded_at": get_settings().loaded_at, "airtable": airtable.describe() if airtable is not None else None, "breakers": breakers(), "admission": admission_describe(), "outbound": get_scheduler().describe(), "routing": get_router().describe()}
+    return Response(json.dumps(body), status_code=200 if STARTUP.get("ready") else 503, media_type="application/json")
+
+
+def _is_loopback(request: Request) -> bool:
+    # The socket peer, never X-Forwarded-For. Behind a proxy every caller arrives from it, so loopback means nothing there
+    if get_settings().rate_limit_trust_forwarded:
+        return False
+    try:
+        return request.client is not None and ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError:
+        return False
+
+
+@app.post("/api/admin/reload")
+async def admin_reload(request: Request) -> Dict[str, Any]:
+    """Re-read `.env` into the settings object (also triggered by SIGHUP).
+
+    `restart_required` lists changed variables read only at startup (see `Settings`).
+    Requires `X-Admin-Token` when ADMIN_TOKEN is set; without one, only loopback callers are allowed.
+    """
+    token = get_settings().admin_token
+    if token:
+        if not hmac.compare_digest(request.headers.get("x-admin-token", ""), token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif not _is_loopback(request):
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to reload from another host")
+    changed, restart_required = reload_settings()
+    return {"ok": True, "changed": changed, "restart_required": restart_required, "settings": get_settings().describe()}
+
+
+@app.get("/api/metrics")
+async def metrics() -> Response:
+    """Span durations, token counts and retries in the Prometheus text format."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/prompts")
+async def prompt_usage() -> Dict[str, Any]:
+    """Per-template prompt size and token usage, including the prompt-cache hit rate."""
+    return {"ok": True, "prompts": prompt_stats()}
+
+
+@app.get("/api/images/{image_id}")
+async def get_image(image_id: str, request: Request, size: Optional[str] = None, px: Optional[int] = None) -> Response:
+    """Serve a generated image by content hash; `?size=thumb&px=N` returns a downscaled copy."""
+    store = get_image_store()
+    thumb = size == "thumb"
+    if thumb:
+        found = await asyncio.to_thread(store.thumbnail, image_id, store.thumb_size)
+    else:
+        found = store.path(image_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Unknown image")
+    path, media_type = found
+    # Content never changes for a given hash and thumbnail size, so together they are a strong validator
+    etag = f'"{image_id}-thumb{store.thumb_size}"' if thumb else f'"{image_id}"'
+    # A thumbnail URL without the current size (older links, or IMAGE_THUMB_SIZE changed since)
+    # names a rendition that may change, so it is revalidated instead of cached forever
+    fixed = not thumb or px == store.thumb_size
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable" if fixed else "public, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
 
 
 @app.post("/api/chat/start")
-async def chat_start(req: ChatStartRequest) -> Dict[str, Any]:
-    _load_chat_impl()
+async def chat_start(req: ChatStartRequest, request: Request) -> Dict[str, Any]:
+    return await cancel_on_disconnect(request, lambda: _admit_chat(request, str(req.email), lambda: _chat_start(req)), "chat_start")
+
+
+async def _admit_chat(request: Request, email: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    # A person is waiting on every chat call: they go ahead of brief generation for OpenAI budget
+    async with get_admission("chat").admit(request, email):
+        with priority("interactive"):
+            return await fn()
+
+
+async def _chat_start(req: ChatStartRequest) -> Dict[str, Any]:
+    store = get_session_store()
     session_id = os.urandom(8).hex()
-    CHAT_SESSIONS[session_id] = []
 
     # Try to fetch the user's prior research brief from Airtable for richer context
-    load_dotenv(override=True)
-    airtable_api_key = os.getenv("AIRTABLE_API_KEY")
-    airtable_base_id = os.getenv("AIRTABLE_BASE_ID")
-    _tbl2 = os.getenv("AIRTABLE_TABLE", "OAI Hackathon") or "OAI Hackathon"
-    airtable_table = _tbl2.strip().rstrip('%')
-    brief: Optional[Dict[str, Any]] = None
+    airtable_api_key, airtable_base_id, airtable_table = _airtable_config()
+    brief: Optional[Brief] = None
     record_id: Optional[str] = None
     airtable_meta: Dict[str, Any] = {"enabled": bool(airtable_api_key and airtable_base_id)}
     if airtable_api_key and airtable_base_id:
         try:
-            async with httpx.AsyncClient(timeout=20) as http_client:
-                rec = await _airtable_find_by_email(http_client, airtable_base_id, airtable_table, airtable_api_key, str(req.email))
-                if rec:
-                    record_id = rec.get("id")
-                    fields = rec.get("fields", {})
-                    # Primary field where we stored the JSON brief
-                    raw = fields.get("fldNLJlEqVwvOg100") or fields.get("Full Response") or ""
-                    if isinstance(raw, str) and raw:
-                        try:
-                            parsed = json.loads(raw)
-                            if isinstance(parsed, dict):
-                                brief = parsed
-                        except Exception:
-                            # Fallback: sometimes Airtable stores JSON-like text; try heuristics
-                            brief = None
-                    # Secondary heuristic: if any field looks like the schema
-                    if not brief:
-                        for v in fields.values():
-                            if isinstance(v, str) and '"general_info"' in v and '"products"' in v:
-                                try:
-                                    parsed2 = json.loads(v)
-                                    if isinstance(parsed2, dict):
-                                        brief = parsed2
-                                        break
-                                except Exception:
-                                    continue
+            airtable = _airtable()
+            assert airtable is not None
+            rec = await airtable.find_by_email(str(req.email))
+            if rec:
+                record_id = rec.get("id")
+                # One field, validated against the brief schema
+                brief = record_brief(rec)
             airtable_meta["record_id"] = record_id
-            airtable_meta["has_brief"] = bool(brief)
+            airtable_meta["has_brief"] = brief is not None
         except Exception as e:
             airtable_meta["error"] = str(e)
 
     # Build hidden greeting turn for the orchestrator
     email_str = str(req.email)
     domain = email_str.split("@", 1)[1] if "@" in email_str else ""
+    # The brief is pinned once in the context state instead of living inside the greeting turn
     hidden_user_prompt = (
-        f"you are greeting {email_str} who works at {domain}. below is their business information, in less than 240 chars greet them, let them know you know about their company and reiterate a one-liner to show you do, and ask what marketing task they'd like to execute next (open ended). Be friendly and professional.\n" 
-        + ("BUSINESS_INFO:\n" + json.dumps(brief) + "\n" if brief else "BUSINESS_INFO:\n{}\n")
+        f"you are greeting {email_str} who works at {domain}. their business information is in BUSINESS_INFO above, in less than 240 chars greet them, let them know you know about their company and reiterate a one-liner to show you do, and ask what marketing task they'd like to execute next (open ended). Be friendly and professional.\n"
     )
+    context_state = new_context_state(brief=brief.model_dump_json() if brief is not None else "{}")
+    await store.acreate(session_id, context_state)
 
     # If chat agent is available, get the first assistant reply now (does not show the hidden user turn)
     first_reply = None
@@ -343,13 +590,15 @@ async def chat_start(req: ChatStartRequest) -> Dict[str, Any]:
         try:
             init_history: List[Dict[str, str]] = [{"role": "user", "content": hidden_user_prompt}]
             turns: List[ChatTurn] = [ChatTurn(**t) for t in init_history]  # type: ignore[arg-type]
-            reply, m = await chat_respond(email_str, turns)
+            with deadline(get_settings().chat_deadline_s):
+                reply, m = await chat_respond(email_str, turns, context_state, route=get_router().greeting())
             first_reply = reply or ""
             meta.update(m or {})
             # Persist both hidden user turn and assistant reply in the server session history
-            CHAT_SESSIONS[session_id].extend(init_history)
-            if first_reply:
-                CHAT_SESSIONS[session_id].append({"role": "assistant", "content": first_reply})
+            await store.aappend_turns(session_id, init_history + ([{"role": "assistant", "content": first_reply}] if first_reply else []))
+            # Never replay the greeting instruction once it has been answered
+            context_state["hidden_turns"] = len(init_history)
+            await store.asave_context(session_id, context_state)
         except Exception as e:
             meta["error"] = f"prefetch_greeting_failed: {e}"
 
@@ -359,36 +608,68 @@ async def chat_start(req: ChatStartRequest) -> Dict[str, Any]:
         "agent_ready": chat_respond is not None,
         "import_error": CHAT_IMPORT_ERROR,
         "first_reply": first_reply,
-        "meta": meta,
+        "meta": _slim_meta(meta, _debug_level(req.debug)),
     }
 
 
 @app.post("/api/chat/send")
-async def chat_send(req: ChatSendRequest) -> Dict[str, Any]:
-    _load_chat_impl()
+async def chat_send(req: ChatSendRequest, request: Request) -> Dict[str, Any]:
+    return await cancel_on_disconnect(request, lambda: _admit_chat(request, str(req.email), lambda: _chat_send(req)), "chat_send")
+
+
+async def _chat_send(req: ChatSendRequest) -> Dict[str, Any]:
     if chat_respond is None:
         raise HTTPException(status_code=500, detail=f"Chat agent not available: {CHAT_IMPORT_ERROR}")
-    hist = CHAT_SESSIONS.get(req.session_id)
-    if hist is None:
-        raise HTTPException(status_code=404, detail="Unknown session_id")
-
-    # Append user turn
-    hist.append({"role": "user", "content": req.message})
+    hist, context_state = await _load_session_with_user_turn(req.session_id, req.message)
 
     # Build pydantic ChatTurn list and get agent reply
     turns: List[ChatTurn] = [ChatTurn(**t) for t in hist]  # type: ignore[arg-type]
-    reply, meta = await chat_respond(str(req.email), turns)
-    # Surface raw request/response debug into API for the UI debug console
-    meta["_debug"] = {
-        "history": hist,
-        "email": str(req.email),
-    }
+    with deadline(get_settings().chat_deadline_s):
+        reply, meta = await chat_respond(str(req.email), turns, context_state)
+    return await _finish_chat_turn(req.session_id, str(req.email), reply, meta, context_state, len(hist), _debug_level(req.debug))
+
 
-    # Append assistant turn
-    hist.append({"role": "assistant", "content": reply})
-    # Surface optional image fields if the agent generated one
-    resp: Dict[str, Any] = {"ok": True, "reply": reply, "meta": meta}
+async def _load_session_with_user_turn(session_id: str, message: str) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    loaded = await get_session_store().aload(session_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Unknown session_id")
+    hist, context_state = loaded
+    # Append user turn
+    user_turn = {"role": "user", "content": message}
+    await get_session_store().aappend_turns(session_id, [user_turn])
+    hist.append(user_turn)
+    return hist, context_state or new_context_state()
+
+
+async def _finish_chat_turn(
+    session_id: str,
+    email: str,
+    reply: str,
+    meta: Dict[str, Any],
+    context_state: Dict[str, Any],
+    turn_index: int,
+    debug_level: str,
+) -> Dict[str, Any]:
+    store = get_session_store()
+    # Append assistant turn and persist any summary the context manager folded in
+    await store.aappend_turns(session_id, [{"role": "assistant", "content": reply}])
+    await store.asave_context(session_id, context_state)
+    if debug_level == "full":
+        # Surface raw request/response debug into API for the UI debug console
+        meta["_debug"] = {
+            "history": await store.aload_turns(session_id),
+            "email": email,
+        }
+
+    # Surface optional image fields if the agent generated any.
+    # `turn_index` is the assistant turn's position; /api/chat/status?since=turn_index+1 picks up after it.
+    resp: Dict[str, Any] = {"ok": True, "reply": reply, "turn_index": turn_index, "meta": _slim_meta(meta, debug_level)}
     try:
+        images = meta.get("images") if isinstance(meta, dict) else None
+        if images:
+            resp["images"] = [
+                {k: i[k] for k in ("image_url", "thumb_url", "caption") if i.get(k)} for i in images
+            ]
         img_url = meta.get("image_url") if isinstance(meta, dict) else None
         caption = meta.get("caption") if isinstance(meta, dict) else None
         if img_url:
@@ -400,10 +681,89 @@ async def chat_send(req: ChatSendRequest) -> Dict[str, Any]:
     return resp
 
 
+async def _save_partial_reply(session_id: str, error: Dict[str, Any], partial: str, context_state: Dict[str, Any], turn_index: int) -> Dict[str, Any]:
+    """Keep the text a failed stream already showed as the assistant turn, so the session matches the page."""
+    if not partial:
+        return error
+    try:
+        store = get_session_store()
+        await store.aappend_turns(session_id, [{"role": "assistant", "content": partial}])
+        await store.asave_context(session_id, context_state)
+    except Exception:
+        return {**error, "partial": partial, "saved": False}
+    return {**error, "partial": partial, "saved": True, "turn_index": turn_index}
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatSendRequest, request: Request) -> StreamingResponse:
+    """Server-Sent Events variant of /api/chat/send.
+
+    Emits `delta` (text chunk), `handoff` (agent change) and a closing `final`
+    event whose data matches the /api/chat/send response body. A run that fails
+    ends with `error` instead; text already sent is saved as the reply (`partial`).
+    """
+    if chat_respond_stream is None:
+        raise HTTPException(status_code=500, detail=f"Chat agent not available: {CHAT_IMPORT_ERROR}")
+    # Admit before the user turn is stored, so a 429/503 leaves the session untouched.
+    # The slot is held until the stream ends; the background task also runs when the client disconnects.
+    admission = get_admission("chat")
+    admission.check_rate(request, str(req.email))
+    await cancel_on_disconnect(request, admission.gate.acquire, "chat_stream")
+    started = time.perf_counter()
+    try:
+        hist, context_state = await _load_session_with_user_turn(req.session_id, req.message)
+        turns: List[ChatTurn] = [ChatTurn(**t) for t in hist]  # type: ignore[arg-type]
+    except BaseException:
+        admission.gate.release()
+        raise
+    email = str(req.email)
+    debug_level = _debug_level(req.debug)
+
+    async def _release_slot() -> None:
+        # Async so Starlette runs it on the loop rather than in a worker thread
+        admission.gate.release(held=time.perf_counter() - started)
+
+    async def events():
+        relayed: List[str] = []
+        try:
+            with deadline(get_settings().chat_deadline_s), priority("interactive"):
+                async for ev in chat_respond_stream(email, turns, context_state):
+                    if ev["event"] == "final":
+                        data = ev["data"]
+                        yield _sse("final", await _finish_chat_turn(
+                            req.session_id, email, data.get("reply") or "", data.get("meta") or {}, context_state, len(hist), debug_level,
+                        ))
+                    elif ev["event"] == "error":
+                        yield _sse("error", await _save_partial_reply(req.session_id, ev["data"], "".join(relayed), context_state, len(hist)))
+                    else:
+                        if ev["event"] == "delta":
+                            relayed.append(ev["data"].get("text") or "")
+                        yield _sse(ev["event"], ev["data"])
+        except (asyncio.CancelledError, GeneratorExit):
+            # Starlette cancels (or closes) the stream when the client disconnects; the agent run is torn down with it
+            record_cancelled("chat_stream")
+            raise
+        except Exception as e:
+            yield _sse("error", await _save_partial_reply(req.session_id, {"error": str(e)}, "".join(relayed), context_state, len(hist)))
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_release_slot),
+    )
+
+
 @app.get("/api/chat/status")
-async def chat_status(session_id: str) -> Dict[str, Any]:
-    """Return the current session history and the last assistant message, if any."""
-    hist = CHAT_SESSIONS.get(session_id)
+async def chat_status(session_id: str, since: int = 0) -> Dict[str, Any]:
+    """Return session turns from index `since` on and the last assistant message among them, if any.
+
+    Pass the returned `next_since` back as `since` to poll only for new turns.
+    """
+    since = max(0, since)
+    hist = await get_session_store().aload_turns(session_id, since)
     if hist is None:
         raise HTTPException(status_code=404, detail="Unknown session_id")
     last_assistant = None
@@ -411,4 +771,11 @@ async def chat_status(session_id: str) -> Dict[str, Any]:
         if turn.get("role") == "assistant":
             last_assistant = turn.get("content", "")
             break
-    return {"ok": True, "session_id": session_id, "history": hist, "last_assistant": last_assistant}
+    return {
+        "ok": True,
+        "session_id": session_id,
+        "since": since,
+        "next_since": since + len(hist),
+        "history": hist,
+        "last_assistant": last_assistant,
+    }
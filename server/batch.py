@@ -0,0 +1,201 @@
+"""Bulk brief generation: `python -m server.batch leads.csv -o results.jsonl`.
+
+Each email goes through the same find/create, research brief and agent pipeline
+as `POST /api/brief?wait=true`, with at most `--concurrency` leads in flight.
+Results are appended to the output JSONL as they finish; that file is also the
+checkpoint, so re-running the same command after a crash skips leads that
+already succeeded and retries the ones that failed.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from .app import brief_runtime, generate_brief
+from .resilience import deadline
+from .scheduler import priority
+from .settings import env_int, get_settings
+from .singleflight import normalize_email
+
+
+def read_emails(path: str) -> Iterator[str]:
+    """Yield emails from a CSV (an `email` column, else the first column) or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                email = item.get("email") if isinstance(item, dict) else item
+                if isinstance(email, str) and "@" in email:
+                    yield email.strip()
+            return
+        rows = csv.reader(f)
+        header = next(rows, None)
+        if header is None:
+            return
+        lowered = [h.strip().lower() for h in header]
+        col = lowered.index("email") if "email" in lowered else 0
+        if "@" in header[col]:
+            # No header row, the first line is already a lead
+            yield header[col].strip()
+        for row in rows:
+            if len(row) > col and "@" in row[col]:
+                yield row[col].strip()
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Normalized emails that already have a successful result in `path`."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        # A run killed mid-write leaves a partial last line; drop it before appending
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[: data.rfind(b"\n") + 1]
+    for line in data.decode("utf-8").splitlines():
+        try:
+            item = json.loads(line)
+        except Exception:
+            continue
+        if item.get("ok"):
+            done.add(normalize_email(item.get("email", "")))
+    return done
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    s = sorted(values)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": s[-1]}
+
+
+class BatchStats:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, result: Dict[str, Any]) -> None:
+        if result["ok"]:
+            self.ok += 1
+        else:
+            self.failed += 1
+        for stage, ms in (result.get("timings") or {}).items():
+            self.stages.setdefault(stage, []).append(ms)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        done = self.ok + self.failed
+        return {
+            "ok": self.ok,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_s": round(elapsed, 2),
+            "leads_per_min": round(done / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {stage: _percentiles(v) for stage, v in self.stages.items()},
+        }
+
+
+async def process_one(email: str) -> Dict[str, Any]:
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    try:
+        with deadline(get_settings().brief_deadline_s), priority("background"):
+            # Records left without a brief by a killed run come back as mode "resumed"
+            res = await generate_brief(email, timings=timings)
+        out: Dict[str, Any] = {
+            "email": email,
+            "ok": bool(res.get("ok")) and not (res.get("airtable") or {}).get("error"),
+            "mode": res.get("mode"),
+            "record_id": res.get("record_id"),
+            "cache": res.get("cache"),
+            "data": res.get("data", res.get("fields")),
+        }
+        if (res.get("airtable") or {}).get("error"):
+            out["error"] = res["airtable"]["error"]
+    except Exception as e:
+        out = {"email": email, "ok": False, "error": f"{type(e).__name__}: {getattr(e, 'detail', None) or e}"}
+    timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    out["timings"] = timings
+    return out
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int,
+    limit: Optional[int] = None,
+    progress_every: float = 10.0,
+) -> Dict[str, Any]:
+    if not get_settings().openai_api_key:
+        raise SystemExit("OPENAI_API_KEY not set")
+    done = load_checkpoint(output_path)
+    stats = BatchStats()
+    seen: Set[str] = set()
+
+    def pending() -> Iterator[str]:
+        count = 0
+        for email in read_emails(input_path):
+            key = normalize_email(email)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key in done:
+                stats.skipped += 1
+                continue
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            yield email
+
+    leads = pending()
+    last_report = time.perf_counter()
+
+    async with brief_runtime():
+        with open(output_path, "a", encoding="utf-8") as out:
+
+            async def worker() -> None:
+                nonlocal last_report
+                # Workers pull from one shared iterator so only `concurrency` leads are ever in memory
+                for email in leads:
+                    result = await process_one(email)
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    stats.add(result)
+                    if time.perf_counter() - last_report >= progress_every:
+                        last_report = time.perf_counter()
+                        s = stats.summary()
+                        print(f"[batch] ok={s['ok']} failed={s['failed']} skipped={s['skipped']} {s['leads_per_min']}/min", file=sys.stderr)
+
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return stats.summary()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server.batch", description="Generate briefs for a list of leads.")
+    parser.add_argument("input", help="CSV (email column) or JSONL file of leads")
+    parser.add_argument("-o", "--output", help="results JSONL, also used to resume (default: <input>.results.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=env_int("BATCH_CONCURRENCY", 4))
+    parser.add_argument("--limit", type=int, default=None, help="process at most this many new leads")
+    parser.add_argument("--progress-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+    output = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+    summary = asyncio.run(run_batch(args.input, output, args.concurrency, args.limit, args.progress_every))
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""Offline benchmarks: fake OpenAI/Airtable servers and a load driver (`python -m server.bench`)."""
+
+import os
+
+# The Agents SDK reads this once, when it is first imported (the agent-setup benchmark imports
+# it before any app is started); nothing here should try to export traces to the real API
+os.environ.setdefault("OPENAI_AGENTS_DISABLE_TRACING", "1")
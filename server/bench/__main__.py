@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from . import agents, coldstart, disconnect, pooling
+from .fakes import FakeConfig
+from .load import format_report, run
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server.bench", description="Load-test server.app against local fakes.")
+    parser.add_argument("-u", "--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="seconds to keep starting journeys")
+    parser.add_argument("--chat-ratio", type=float, default=0.6, help="share of journeys that are chats (rest are generate)")
+    parser.add_argument("--turns", type=int, default=3, help="messages per chat journey")
+    parser.add_argument("--background-users", type=int, default=0, help="extra users queueing briefs (wait=false) as background jobs")
+    parser.add_argument("--instant", action="store_true", help="zero upstream latency and no failures (server overhead only)")
+    parser.add_argument("--research-latency", default="lognormal:3.0,0.4")
+    parser.add_argument("--agent-latency", default="lognormal:1.5,0.4")
+    parser.add_argument("--chat-latency", default="lognormal:1.0,0.3")
+    parser.add_argument("--ttft-latency", default="lognormal:0.4,0.3")
+    parser.add_argument("--image-latency", default="lognormal:2.0,0.3")
+    parser.add_argument("--airtable-latency", default="lognormal:0.15,0.3")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 5xx from either fake")
+    parser.add_argument("--openai-429-rate", type=float, default=0.0)
+    parser.add_argument("--airtable-429-rate", type=float, default=0.0)
+    parser.add_argument("--airtable-rps", type=float, default=5.0, help="fake Airtable rate limit (0 disables)")
+    parser.add_argument("--openai-rpm", type=float, default=0.0, help="fake OpenAI requests-per-minute limit (0 disables)")
+    parser.add_argument("--openai-tpm", type=float, default=0.0, help="fake OpenAI tokens-per-minute limit (0 disables)")
+    parser.add_argument("--openai-capacity", type=int, default=0, help="responses the fake OpenAI generates at once before queueing (0: unlimited)")
+    parser.add_argument("--image-reply-rate", type=float, default=0.1, help="share of chat replies that request images")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", help="also write the full report as JSON here")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="app setting for this run, e.g. ADMISSION_CHAT_CONCURRENCY=8 (repeatable)")
+    parser.add_argument("--disconnect", action="store_true", help="instead of load, check that abandoned requests stop their upstream work")
+    parser.add_argument("--pooling", action="store_true", help="instead of load, compare the shared client registry with a client per call")
+    parser.add_argument("--agent-setup", action="store_true", help="instead of load, time per-turn agent setup with and without the agent registry")
+    parser.add_argument("--cold-start", action="store_true", help="instead of load, time import, startup and the first requests of fresh processes")
+    args = parser.parse_args(argv)
+    if args.disconnect:
+        results = disconnect.run()
+        print(disconnect.format_results(results))
+        return 0 if all(r["ok"] for r in results) else 1
+    if args.cold_start:
+        results = coldstart.run()
+        print(coldstart.format_results(results))
+        return 0 if results["ready"] else 1
+    if args.agent_setup:
+        print(agents.format_results(agents.run()))
+        return 0
+    if args.pooling:
+        print(pooling.format_results(pooling.run(concurrency=args.users)))
+        return 0
+    if args.instant:
+        config = FakeConfig.instant()
+    else:
+        config = FakeConfig(
+            args.research_latency, args.agent_latency, args.chat_latency, args.ttft_latency, args.image_latency,
+            args.airtable_latency, error_rate=args.error_rate, openai_429_rate=args.openai_429_rate,
+            airtable_429_rate=args.airtable_429_rate, airtable_rps=args.airtable_rps, openai_capacity=args.openai_capacity,
+            openai_rpm=args.openai_rpm, openai_tpm=args.openai_tpm,
+            image_reply_rate=args.image_reply_rate, retry_after=args.retry_after, seed=args.seed,
+        )
+    env = dict(item.split("=", 1) for item in args.env if "=" in item)
+    report = run(args.users, args.duration, args.chat_ratio, args.turns, config, env=env, background_users=args.background_users)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Per-turn agent setup: rebuilding agents for every message against the shared registry.
+
+Before the registry each chat turn built a new chat agent on a new
+`OpenAIResponsesModel` and `AsyncOpenAI` client (with its own connection pool)
+plus a `Runner`, and each orchestration run built all five agents the same way.
+This times that setup, with no model call, against looking the agents up in
+the `AgentRegistry` that now does it once at startup.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from agents import OpenAIResponsesModel, Runner
+from openai import AsyncOpenAI
+
+from ..agents_sdk.orchestrator import AgentRegistry, build_chat_agent, build_orchestrator
+from ..clients import ClientRegistry
+from ..routing import get_router
+from .load import _percentile
+
+
+async def _time(setup: Callable[[], Awaitable[Any]], iterations: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await setup()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": round(_percentile(samples, 0.5), 4), "p99_ms": round(_percentile(samples, 0.99), 4)}
+
+
+async def _compare(iterations: int) -> List[Dict[str, Any]]:
+    clients = ClientRegistry()
+    registry = AgentRegistry(clients)
+    route = get_router().chat([{"role": "user", "content": "Draft a launch email."}])
+
+    async def rebuilt_chat() -> None:
+        openai = AsyncOpenAI(api_key="sk-bench", max_retries=0)
+        build_chat_agent(OpenAIResponsesModel(model=route.model, openai_client=openai), route.effort)
+        Runner()
+        await openai.close()
+
+    async def rebuilt_orchestrator() -> None:
+        openai = AsyncOpenAI(api_key="sk-bench", max_retries=0)
+        build_orchestrator(OpenAIResponsesModel(model="gpt-5", openai_client=openai))
+        Runner()
+        await openai.close()
+
+    async def registry_chat() -> None:
+        registry.chat_agent(route)
+
+    async def registry_orchestrator() -> None:
+        registry.orchestrator, registry.runner
+
+    try:
+        return [
+            {"setup": "chat turn", "mode": "rebuilt per turn", **await _time(rebuilt_chat, iterations)},
+            {"setup": "chat turn", "mode": "agent registry", **await _time(registry_chat, iterations)},
+            {"setup": "orchestration", "mode": "rebuilt per run", **await _time(rebuilt_orchestrator, iterations)},
+            {"setup": "orchestration", "mode": "agent registry", **await _time(registry_orchestrator, iterations)},
+        ]
+    finally:
+        await clients.aclose()
+
+
+def run(iterations: int = 200) -> List[Dict[str, Any]]:
+    # Nothing is sent; the clients only need a key to be constructed
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    os.environ.setdefault("OPENAI_AGENTS_DISABLE_TRACING", "1")
+    return asyncio.run(_compare(iterations))
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = [f"{'setup':<15}{'mode':<18}{'p50 ms':>10}{'p99 ms':>10}"]
+    for r in results:
+        lines.append(f"{r['setup']:<15}{r['mode']:<18}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+    return "\n".join(lines)
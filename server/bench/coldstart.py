@@ -0,0 +1,77 @@
+"""Cold start: import time, startup time and the first requests of a fresh process.
+
+Each run starts a new interpreter that imports `server.app`, runs the app
+lifespan (imports, agent registry, warm-up) and serves `POST /api/chat/start`
+twice against the fakes. The startup phase should carry the import and build
+cost, so the first request costs about the same as the second.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from .fakes import FakeConfig, airtable_app, openai_app
+from .load import ServerThread, _free_port, bench_env
+
+METRICS = ("import_ms", "startup_ms", "ready_ms", "first_request_ms", "second_request_ms")
+
+
+def _child() -> None:
+    """Runs in the fresh interpreter; prints one JSON line of timings."""
+    t0 = time.perf_counter()
+    from server.app import app
+
+    imported = time.perf_counter()
+    import httpx
+
+    server = ServerThread(app, _free_port())
+    server.start(timeout=120)
+    started = time.perf_counter()
+    out: Dict[str, Any] = {"import_ms": (imported - t0) * 1000, "startup_ms": (started - imported) * 1000}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{server.port}", timeout=60.0) as c:
+            r = c.get("/api/ready")
+            out["ready"] = r.status_code == 200
+            out["ready_ms"] = (time.perf_counter() - t0) * 1000
+            for name, email in (("first_request_ms", "first@cold.example"), ("second_request_ms", "second@cold.example")):
+                t = time.perf_counter()
+                c.post("/api/chat/start", json={"email": email}).raise_for_status()
+                out[name] = (time.perf_counter() - t) * 1000
+    finally:
+        server.stop()
+    print(json.dumps(out))
+
+
+def run(runs: int = 3) -> Dict[str, Any]:
+    fakes = [ServerThread(openai_app(FakeConfig.instant()), _free_port()), ServerThread(airtable_app(FakeConfig.instant()), _free_port())]
+    for f in fakes:
+        f.start()
+    samples: List[Dict[str, Any]] = []
+    try:
+        # Without pacing: the app's 5 rps Airtable budget would otherwise delay the second request
+        env = {**os.environ, **bench_env(fakes[0].port, fakes[1].port, env={"AIRTABLE_RPS": "1000", "AIRTABLE_BURST": "100"})}
+        for _ in range(runs):
+            proc = subprocess.run(
+                [sys.executable, "-c", "from server.bench.coldstart import _child; _child()"],
+                env=env, capture_output=True, text=True, timeout=300, check=True,
+            )
+            samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    finally:
+        for f in fakes:
+            f.stop()
+    return {
+        "runs": runs,
+        "ready": all(s.get("ready") for s in samples),
+        **{m: round(statistics.median(s[m] for s in samples), 1) for m in METRICS},
+    }
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    lines = [f"cold start, median of {results['runs']} fresh processes (ready: {results['ready']})"]
+    for m in METRICS:
+        lines.append(f"  {m:<20}{results[m]:>10}")
+    return "\n".join(lines)
@@ -0,0 +1,99 @@
+"""Disconnect check: hang up on slow requests and verify the server stops the upstream work.
+
+Against a fake OpenAI slow enough that every call is still in flight when the
+client gives up, three requests are abandoned:
+
+* `POST /api/brief` during the research call: the research request is dropped
+  and the four agents never start. A second submit then resumes the record.
+* `POST /api/chat/send` during the chat agent's request.
+* `POST /api/chat/stream` after its first delta.
+
+For each, the fake must have seen the request abandoned, no further upstream
+calls may follow, and the app must count the request as cancelled.
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .fakes import FakeConfig
+from .load import ServerThread, stack, upstream_calls
+
+SLOW = "fixed:3.0"
+
+
+def slow_config() -> FakeConfig:
+    return FakeConfig(
+        research_latency=SLOW, agent_latency="fixed:0.2", chat_latency=SLOW, ttft_latency="fixed:0.2",
+        image_latency="fixed:0", airtable_latency="fixed:0.01", airtable_rps=0.0, image_reply_rate=0.0,
+    )
+
+
+def _cancelled(metrics_text: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for m in re.finditer(r'^markit_requests_cancelled_total\{endpoint="([^"]+)"\} (\S+)$', metrics_text, re.M):
+        out[m.group(1)] = int(float(m.group(2)))
+    return out
+
+
+def _delta(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    return {k: after.get(k, 0) - before.get(k, 0) for k in after if after.get(k, 0) != before.get(k, 0)}
+
+
+async def _abandon(c: httpx.AsyncClient, path: str, body: Dict[str, Any], after: float) -> None:
+    try:
+        await c.post(path, json=body, timeout=after)
+    except httpx.TimeoutException:
+        pass
+
+
+async def _abandon_stream(c: httpx.AsyncClient, body: Dict[str, Any]) -> None:
+    async with c.stream("POST", "/api/chat/stream", json=body) as r:
+        async for line in r.aiter_lines():
+            if line.startswith("event: delta"):
+                return
+
+
+async def check(base_url: str, openai: ServerThread, hold: float, after: float = 0.5) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as c:
+
+        async def scenario(name: str, endpoint: str, expect: Dict[str, int], abandon: Any) -> None:
+            calls = upstream_calls(openai)
+            cancelled = _cancelled((await c.get("/api/metrics")).text)
+            await abandon
+            # Outlast the fake's latency so anything still running would have completed or called again
+            await asyncio.sleep(hold)
+            upstream = _delta(calls, upstream_calls(openai))
+            counted = _cancelled((await c.get("/api/metrics")).text).get(endpoint, 0) - cancelled.get(endpoint, 0)
+            ok = counted == 1 and all(upstream.get(k, 0) == v for k, v in expect.items())
+            results.append({"scenario": name, "ok": ok, "upstream": upstream, "cancelled": counted})
+
+        email = "walkaway@disconnect.example"
+        await scenario("brief", "brief", {"responses": 1, "abandoned": 1}, _abandon(c, "/api/brief", {"email": email}, after))
+        t0 = time.perf_counter()
+        r = await c.post("/api/brief", json={"email": email})
+        resumed = r.json().get("mode") if r.status_code == 200 else f"HTTP {r.status_code}"
+        results.append({"scenario": "brief resubmit", "ok": resumed == "resumed", "mode": resumed, "seconds": round(time.perf_counter() - t0, 2)})
+
+        session = (await c.post("/api/chat/start", json={"email": email})).json()["session_id"]
+        body = {"session_id": session, "email": email, "message": "Draft a subject line for launch week."}
+        await scenario("chat send", "chat_send", {"responses": 1, "abandoned": 1}, _abandon(c, "/api/chat/send", body, after))
+        await scenario("chat stream", "chat_stream", {"streams": 1, "abandoned": 1}, _abandon_stream(c, body))
+    return results
+
+
+def run(config: Optional[FakeConfig] = None, hold: float = 4.0) -> List[Dict[str, Any]]:
+    with stack(config or slow_config()) as (openai, _airtable, server):
+        return asyncio.run(check(f"http://127.0.0.1:{server.port}", openai, hold))
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = []
+    for r in results:
+        detail = {k: v for k, v in r.items() if k not in ("scenario", "ok")}
+        lines.append(f"{'ok  ' if r['ok'] else 'FAIL'} {r['scenario']:<16}{detail}")
+    return "\n".join(lines)
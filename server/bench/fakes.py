@@ -0,0 +1,398 @@
+"""Local stand-ins for the OpenAI Responses/Images API and the Airtable REST API.
+
+They speak just enough of each protocol for this server (including Responses
+SSE streaming) and add configurable latency, error and 429 behaviour so load
+tests can run without network access or quota.
+"""
+
+import asyncio
+import base64
+import contextlib
+import itertools
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..ratelimit import TokenBucket
+
+BRIEF = {
+    "general_info": {"business_name": "Acme Robotics", "one_liner": "Warehouse robots you can rent by the hour.", "website": "https://acme.example"},
+    "products": [{
+        "name": "PickBot", "description": "Autonomous picking arm", "pricing_summary": "$4/hour",
+        "key_features": ["no integration", "hourly billing"], "pain_points_solved": ["seasonal labour gaps"],
+        "target_use_cases": ["peak season fulfilment"],
+    }],
+    "icp": "Operations director at a mid-size 3PL who needs peak-season capacity without capex.",
+    "competitors": [{"name": "Locus", "url": "https://locusrobotics.com", "why_competes": "AMRs for fulfilment"}],
+    "topics_keywords": ["logistics", "warehouse", "robotics", "automation", "supplychain", "3pl", "ecommerce", "fulfilment", "ops", "peak"],
+}
+# Agent outputs by the name of the JSON schema the request asks for (`schemas` model names)
+AGENT_OUTPUTS = {
+    "Positioning": {"tagline": "Rent a robot for the rush", "category": "Robotics as a service", "value_props": ["No capex", "Hourly billing"], "proof_points": ["Live in a week"]},
+    "LandingCopy": {"hero": "Peak season, sorted.", "subhead": "Warehouse robots by the hour.", "bullets": ["No integration", "Hourly billing", "Scale down after peak"]},
+    "Ads": {"ads": [{"headline": "Robots by the hour", "primary": "Cover peak without hiring.", "cta": "Book a demo"}], "keywords": ["3pl", "robotics"]},
+    "Emails": {"cold": [{"subject": "Peak season capacity", "body": "Rent PickBot by the hour."}], "nurture": [{"subject": "How 3PLs cover peak", "body": "A short case study."}]},
+}
+CHAT_REPLY = (
+    "Love it. Here is a tight plan for launch week: lead with the hourly pricing, "
+    "line up two 3PL case studies, and pitch logistics newsletters on the peak-season angle. "
+    "Want me to draft the first outreach email?"
+)
+IMAGE_REPLY = (
+    "Two merch ideas:\n<IMAGE_PROMPT>Minimal black tee with a tiny robot arm picking a box</IMAGE_PROMPT>\n"
+    "Caption: Robot arm tee\n<IMAGE_PROMPT>Sticker of a smiling warehouse robot</IMAGE_PROMPT>\nCaption: Robot sticker"
+)
+# Relative duration of a call by reasoning effort, and of a mini model. Configured latencies
+# describe each kind of call at the effort it usually runs at.
+EFFORT_SCALE = {"minimal": 0.3, "low": 0.6, "medium": 1.0, "high": 1.6}
+USUAL_EFFORT = {"research": "high", "agent": "medium", "chat": "medium"}
+MINI_SCALE = 0.5
+# Smallest valid PNG, so stored images are real files
+PNG_1PX = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+
+class Latency:
+    """A latency distribution parsed from `fixed:S`, `uniform:LO,HI` or `lognormal:MEDIAN,SIGMA` (seconds)."""
+
+    def __init__(self, spec: str) -> None:
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(",") if a.strip()] if args else []
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        median, sigma = self.args[0], (self.args[1] if len(self.args) > 1 else 0.5)
+        return rng.lognormvariate(math.log(max(median, 1e-6)), sigma)
+
+
+class FakeConfig:
+    """Behaviour of the fakes. Latencies are distribution specs, rates are probabilities per request."""
+
+    def __init__(
+        self,
+        research_latency: str = "lognormal:3.0,0.4",
+        agent_latency: str = "lognormal:1.5,0.4",
+        chat_latency: str = "lognormal:1.0,0.3",
+        ttft_latency: str = "lognormal:0.4,0.3",
+        image_latency: str = "lognormal:2.0,0.3",
+        airtable_latency: str = "lognormal:0.15,0.3",
+        error_rate: float = 0.0,
+        openai_429_rate: float = 0.0,
+        airtable_429_rate: float = 0.0,
+        airtable_rps: float = 5.0,
+        openai_capacity: int = 0,
+        openai_rpm: float = 0.0,
+        openai_tpm: float = 0.0,
+        image_reply_rate: float = 0.1,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.research_latency = Latency(research_latency)
+        self.agent_latency = Latency(agent_latency)
+        self.chat_latency = Latency(chat_latency)
+        self.ttft_latency = Latency(ttft_latency)
+        self.image_latency = Latency(image_latency)
+        self.airtable_latency = Latency(airtable_latency)
+        self.error_rate = error_rate
+        self.openai_429_rate = openai_429_rate
+        self.airtable_429_rate = airtable_429_rate
+        self.airtable_rps = airtable_rps
+        # Responses generated at once before further requests queue behind them (0: unlimited),
+        # so pushing more concurrent work at the fake slows everyone down like a saturated backend
+        self.openai_capacity = openai_capacity
+        # Org limits enforced like OpenAI's (continuously refilled per-minute budgets), 0: unlimited
+        self.openai_rpm = openai_rpm
+        self.openai_tpm = openai_tpm
+        self.image_reply_rate = image_reply_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def instant(cls) -> "FakeConfig":
+        """No latency, no failures: measures the server's own overhead."""
+        zero = "fixed:0"
+        return cls(zero, zero, zero, zero, zero, zero, image_reply_rate=0.0, airtable_rps=0.0)
+
+
+def _effort(body: Dict[str, Any]) -> str:
+    reasoning = body.get("reasoning") if isinstance(body.get("reasoning"), dict) else {}
+    effort = str(reasoning.get("effort") or "medium")
+    return effort if effort in EFFORT_SCALE else "medium"
+
+
+def _scale(body: Dict[str, Any], kind: str) -> float:
+    scale = EFFORT_SCALE[_effort(body)] / EFFORT_SCALE[USUAL_EFFORT[kind]]
+    return scale * (MINI_SCALE if "mini" in str(body.get("model") or "") else 1.0)
+
+
+def _usage(body: Dict[str, Any], output_tokens: int) -> Dict[str, Any]:
+    input_tokens = len(json.dumps(body.get("input"), ensure_ascii=False)) // 4
+    # Reasoning tokens grow with effort; at medium they are half the visible output
+    reasoning_tokens = int(output_tokens * EFFORT_SCALE[_effort(body)] / 2)
+    return {
+        "input_tokens": input_tokens,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": output_tokens + reasoning_tokens,
+        "output_tokens_details": {"reasoning_tokens": reasoning_tokens},
+        "total_tokens": input_tokens + output_tokens + reasoning_tokens,
+    }
+
+
+def _response(text: Optional[str], usage: Dict[str, Any], status: str = "completed") -> Dict[str, Any]:
+    output = []
+    if text is not None:
+        output = [{
+            "type": "message", "id": "msg_bench", "role": "assistant", "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }]
+    return {
+        "id": "resp_bench", "object": "response", "created_at": int(time.time()), "model": "gpt-5", "status": status,
+        "output": output, "parallel_tool_calls": True, "tool_choice": "auto", "tools": [], "usage": usage,
+    }
+
+
+def _developer_text(body: Dict[str, Any]) -> str:
+    parts: List[str] = [str(body.get("instructions") or "")]
+    for item in body.get("input") or []:
+        if isinstance(item, dict) and item.get("role") in ("developer", "system"):
+            for c in item.get("content") or []:
+                if isinstance(c, dict):
+                    parts.append(str(c.get("text") or ""))
+    return "\n".join(parts)
+
+
+def openai_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    # `abandoned`: the caller hung up before the response was finished (cancelled upstream work);
+    # `research`/`chat`/`agent` count Responses calls by what they were for
+    app.state.calls = {
+        "responses": 0, "streams": 0, "images": 0, "errors": 0, "rate_limited": 0, "abandoned": 0,
+        "research": 0, "chat": 0, "agent": 0,
+    }
+    app.state.capacity = None
+    app.state.limits = {
+        "requests": TokenBucket(config.openai_rpm / 60.0, config.openai_rpm) if config.openai_rpm > 0 else None,
+        "tokens": TokenBucket(config.openai_tpm / 60.0, config.openai_tpm) if config.openai_tpm > 0 else None,
+    }
+
+    def _limit_headers() -> Dict[str, str]:
+        headers = {}
+        for kind, bucket in app.state.limits.items():
+            if bucket is not None:
+                left = bucket.available
+                headers[f"x-ratelimit-limit-{kind}"] = str(int(bucket.burst))
+                headers[f"x-ratelimit-remaining-{kind}"] = str(int(left))
+                headers[f"x-ratelimit-reset-{kind}"] = f"{(bucket.burst - left) / bucket.rate:.3f}s"
+        return headers
+
+    def _charge(kind: str, tokens: int) -> Optional[JSONResponse]:
+        costs = {"requests": 1.0, "tokens": float(tokens)}
+        short = [k for k, b in app.state.limits.items() if b is not None and b.available < costs[k]]
+        if short:
+            app.state.calls["rate_limited"] += 1
+            app.state.calls[f"rate_limited_{kind}"] = app.state.calls.get(f"rate_limited_{kind}", 0) + 1
+            wait = max(app.state.limits[k].wait_time(costs[k]) for k in short)
+            return JSONResponse(
+                {"error": {"message": f"Rate limit reached for {short[0]}", "type": short[0], "code": "rate_limit_exceeded"}},
+                status_code=429, headers={**_limit_headers(), "retry-after-ms": str(int(wait * 1000) + 1)},
+            )
+        for k, b in app.state.limits.items():
+            if b is not None:
+                b.try_acquire(costs[k])
+        return None
+
+    def _capacity() -> Any:
+        if config.openai_capacity <= 0:
+            return contextlib.nullcontext()
+        if app.state.capacity is None:
+            app.state.capacity = asyncio.Semaphore(config.openai_capacity)
+        return app.state.capacity
+
+    def _fail() -> Optional[JSONResponse]:
+        roll = config.rng.random()
+        if roll < config.openai_429_rate:
+            app.state.calls["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": str(config.retry_after)},
+            )
+        if roll < config.openai_429_rate + config.error_rate:
+            app.state.calls["errors"] += 1
+            return JSONResponse({"error": {"message": "The server had an error", "type": "server_error"}}, status_code=500)
+        return None
+
+    def _classify(body: Dict[str, Any]) -> str:
+        text = _developer_text(body)
+        if "marketing research analyst" in text:
+            return "research"
+        if "named Mark" in text or "Mark only" in text:
+            return "chat"
+        return "agent"
+
+    @app.post("/v1/responses")
+    async def responses(request: Request) -> Any:
+        raw = await request.body()
+        body = json.loads(raw)
+        failed = _fail()
+        if failed is not None:
+            return failed
+        kind = _classify(body)
+        if kind == "research":
+            text, latency = json.dumps(BRIEF), config.research_latency
+        elif kind == "chat":
+            text = IMAGE_REPLY if config.rng.random() < config.image_reply_rate else CHAT_REPLY
+            latency = config.chat_latency
+        else:
+            schema = ((body.get("text") or {}).get("format") or {}).get("name")
+            text, latency = json.dumps(AGENT_OUTPUTS.get(schema, {})), config.agent_latency
+        usage = _usage(body, len(text) // 4)
+        scale = _scale(body, kind)
+        route = f"{body.get('model')}/{_effort(body)}"
+        app.state.calls[route] = app.state.calls.get(route, 0) + 1
+        app.state.calls[kind] += 1
+        limited = _charge(kind, len(raw) // 4 + len(text) // 4)
+        if limited is not None:
+            return limited
+        if not body.get("stream"):
+            app.state.calls["responses"] += 1
+            async with _capacity():
+                await asyncio.sleep(latency.sample(config.rng) * scale)
+            if await request.is_disconnected():
+                app.state.calls["abandoned"] += 1
+            return JSONResponse(_response(text, usage), headers=_limit_headers())
+        app.state.calls["streams"] += 1
+        ttft = config.ttft_latency.sample(config.rng) * scale
+        total = max(ttft, latency.sample(config.rng) * scale)
+
+        async def events() -> Any:
+            seq = itertools.count()
+
+            def ev(data: Dict[str, Any]) -> str:
+                data["sequence_number"] = next(seq)
+                return f"event: {data['type']}\ndata: {json.dumps(data)}\n\n"
+
+            try:
+                yield ev({"type": "response.created", "response": _response(None, usage, "in_progress")})
+                async with _capacity():
+                    await asyncio.sleep(ttft)
+                    yield ev({"type": "response.output_item.added", "output_index": 0, "item": {"type": "message", "id": "msg_bench", "role": "assistant", "status": "in_progress", "content": []}})
+                    yield ev({"type": "response.content_part.added", "item_id": "msg_bench", "output_index": 0, "content_index": 0, "part": {"type": "output_text", "text": "", "annotations": []}})
+                    words = text.split(" ")
+                    for i, word in enumerate(words):
+                        yield ev({"type": "response.output_text.delta", "item_id": "msg_bench", "output_index": 0, "content_index": 0, "delta": word if i == 0 else " " + word, "logprobs": []})
+                        await asyncio.sleep((total - ttft) / len(words))
+                yield ev({"type": "response.output_text.done", "item_id": "msg_bench", "output_index": 0, "content_index": 0, "text": text, "logprobs": []})
+                yield ev({"type": "response.completed", "response": _response(text, usage)})
+            except asyncio.CancelledError:
+                app.state.calls["abandoned"] += 1
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=_limit_headers())
+
+    @app.post("/v1/images/generations")
+    async def images(request: Request) -> Any:
+        await request.json()
+        failed = _fail()
+        if failed is not None:
+            return failed
+        app.state.calls["images"] += 1
+        await asyncio.sleep(config.image_latency.sample(config.rng))
+        return {"created": int(time.time()), "data": [{"b64_json": base64.b64encode(PNG_1PX).decode()}]}
+
+    @app.get("/v1/models/{model}")
+    async def model(model: str) -> Dict[str, Any]:
+        return {"id": model, "object": "model", "created": 0, "owned_by": "bench"}
+
+    @app.get("/calls")
+    async def calls() -> Dict[str, Any]:
+        return app.state.calls
+
+    return app
+
+
+def airtable_app(config: FakeConfig) -> FastAPI:
+    """Airtable table emulation with its per-base rate limit (429 plus a lockout once exceeded)."""
+    app = FastAPI(title="fake-airtable")
+    records: Dict[str, Dict[str, Any]] = {}
+    ids = itertools.count(1)
+    window: List[float] = []
+    state = {"locked_until": 0.0}
+    app.state.calls = {"GET": 0, "POST": 0, "PATCH": 0, "rate_limited": 0, "errors": 0}
+
+    def _gate(method: str) -> Optional[JSONResponse]:
+        now = time.monotonic()
+        app.state.calls[method] += 1
+        limited = now < state["locked_until"] or config.rng.random() < config.airtable_429_rate
+        if config.airtable_rps > 0 and not limited:
+            while window and window[0] <= now - 1.0:
+                window.pop(0)
+            window.append(now)
+            if len(window) > config.airtable_rps:
+                state["locked_until"] = now + config.retry_after
+                limited = True
+        if limited:
+            app.state.calls["rate_limited"] += 1
+            return JSONResponse({"errors": [{"error": "RATE_LIMIT_REACHED"}]}, status_code=429, headers={"retry-after": str(config.retry_after)})
+        if config.rng.random() < config.error_rate:
+            app.state.calls["errors"] += 1
+            return JSONResponse({"error": {"type": "SERVER_ERROR"}}, status_code=503)
+        return None
+
+    @app.get("/v0/{base_id}/{table}")
+    async def list_records(base_id: str, table: str, request: Request) -> Any:
+        failed = _gate("GET")
+        if failed is not None:
+            return failed
+        await asyncio.sleep(config.airtable_latency.sample(config.rng))
+        formula = request.query_params.get("filterByFormula", "")
+        email = formula.split("'")[1] if formula.count("'") >= 2 else ""
+        found = [r for r in records.values() if str(r["fields"].get("fldXhVuckpHBhWJOX", "")).lower() == email]
+        return {"records": found[: int(request.query_params.get("maxRecords") or 100)]}
+
+    @app.post("/v0/{base_id}/{table}")
+    async def create_records(base_id: str, table: str, request: Request) -> Any:
+        body = await request.json()
+        failed = _gate("POST")
+        if failed is not None:
+            return failed
+        await asyncio.sleep(config.airtable_latency.sample(config.rng))
+        out = []
+        for rec in body.get("records") or []:
+            rid = f"rec{next(ids):014d}"
+            records[rid] = {"id": rid, "createdTime": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()), "fields": dict(rec.get("fields") or {})}
+            out.append(records[rid])
+        return {"records": out}
+
+    @app.patch("/v0/{base_id}/{table}")
+    async def update_records(base_id: str, table: str, request: Request) -> Any:
+        body = await request.json()
+        failed = _gate("PATCH")
+        if failed is not None:
+            return failed
+        await asyncio.sleep(config.airtable_latency.sample(config.rng))
+        out = []
+        for rec in body.get("records") or []:
+            if rec.get("id") not in records:
+                return JSONResponse({"error": {"type": "ROW_DOES_NOT_EXIST"}}, status_code=404)
+            records[rec["id"]]["fields"].update(rec.get("fields") or {})
+            out.append(records[rec["id"]])
+        return {"records": out}
+
+    @app.get("/calls")
+    async def calls() -> Dict[str, Any]:
+        return {**app.state.calls, "records": len(records)}
+
+    return app
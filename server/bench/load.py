@@ -0,0 +1,348 @@
+"""Load driver: runs the fakes and `server.app` on local ports and replays front-end traffic.
+
+Two user journeys mirror the pages:
+
+* `generate`: generate.html fires `POST /api/brief` and `POST /api/chat/start`
+  together for a new lead.
+* `chat`: chat.html starts a session, checks `/api/chat/status`, then sends
+  several turns over `/api/chat/stream` (falling back to `/api/chat/send`).
+
+Each virtual user loops over journeys until the duration is up. The server runs
+on its own event loop thread so its loop lag can be sampled without the
+driver's own work skewing it.
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+from .fakes import FakeConfig, airtable_app, openai_app
+
+# A question, accepting Mark's offer to draft, a thank-you, then direct requests: one of each routing tier
+CHAT_MESSAGES = (
+    "Hey Mark, what should I focus on for launch week?",
+    "Yes please, go ahead.",
+    "Thanks, that's perfect!",
+    "Draft a subject line for the 3PL outreach email.",
+    "Can you tighten that into three bullet points?",
+    "Visualize two merch ideas for our booth.",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class ServerThread:
+    """A uvicorn server on a private event loop in a daemon thread."""
+
+    def __init__(self, app: Any, port: int) -> None:
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self, timeout: float = 30.0) -> None:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"server on port {self.port} did not start")
+            time.sleep(0.02)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+class LoopLag:
+    """Samples how late `asyncio.sleep(interval)` wakes up on a loop; lateness is time the loop was blocked."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self._stop = False
+
+    async def run(self) -> None:
+        while not self._stop:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - t0 - self.interval))
+
+    def stop(self) -> None:
+        self._stop = True
+
+    def summary(self) -> Dict[str, float]:
+        ms = [s * 1000 for s in self.samples]
+        return {
+            "samples": len(ms),
+            "p50_ms": round(_percentile(ms, 0.5), 2),
+            "p99_ms": round(_percentile(ms, 0.99), 2),
+            "max_ms": round(max(ms), 2) if ms else 0.0,
+        }
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        # 429/503 answered by admission control; kept out of the latency figures
+        self.shed: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def record_shed(self, name: str) -> None:
+        self.shed[name] = self.shed.get(name, 0) + 1
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.shed)):
+            values = self.latencies.get(name, [])
+            ms = [v * 1000 for v in values]
+            endpoints[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "shed": self.shed.get(name, 0),
+                "rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+                "p50_ms": round(_percentile(ms, 0.5), 1),
+                "p95_ms": round(_percentile(ms, 0.95), 1),
+                "p99_ms": round(_percentile(ms, 0.99), 1),
+            }
+        total = sum(len(v) for k, v in self.latencies.items() if not k.endswith(".ttft"))
+        return {"elapsed_s": round(elapsed, 2), "requests": total, "shed": sum(self.shed.values()), "rps": round(total / elapsed, 2) if elapsed > 0 else 0.0, "endpoints": endpoints}
+
+
+async def _back_off(r: httpx.Response) -> None:
+    # A person told "try again in N seconds" waits about that long
+    try:
+        await asyncio.sleep(float(r.headers.get("retry-after") or 1))
+    except ValueError:
+        await asyncio.sleep(1)
+
+
+async def _timed(rec: Recorder, name: str, coro: Any) -> Optional[httpx.Response]:
+    t0 = time.perf_counter()
+    try:
+        r = await coro
+    except Exception:
+        rec.record(name, time.perf_counter() - t0, False)
+        return None
+    if r.status_code in (429, 503):
+        rec.record_shed(name)
+        await _back_off(r)
+    else:
+        rec.record(name, time.perf_counter() - t0, r.status_code < 400)
+    return r
+
+
+async def generate_journey(c: httpx.AsyncClient, rec: Recorder, email: str) -> None:
+    await asyncio.gather(
+        _timed(rec, "POST /api/brief", c.post("/api/brief", json={"email": email})),
+        _timed(rec, "POST /api/chat/start", c.post("/api/chat/start", json={"email": email})),
+    )
+
+
+async def _stream_turn(c: httpx.AsyncClient, rec: Recorder, body: Dict[str, Any]) -> bool:
+    t0 = time.perf_counter()
+    first = None
+    try:
+        async with c.stream("POST", "/api/chat/stream", json=body) as r:
+            if r.status_code in (429, 503):
+                # Like chat.html: a shed turn is not retried over /api/chat/send
+                rec.record_shed("POST /api/chat/stream")
+                await _back_off(r)
+                return True
+            if r.status_code >= 400:
+                rec.record("POST /api/chat/stream", time.perf_counter() - t0, False)
+                return False
+            event = ""
+            async for line in r.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                    if event == "delta" and first is None:
+                        first = time.perf_counter() - t0
+                elif line.startswith("data:") and event == "error":
+                    rec.record("POST /api/chat/stream", time.perf_counter() - t0, False)
+                    return True
+    except Exception:
+        rec.record("POST /api/chat/stream", time.perf_counter() - t0, False)
+        return False
+    rec.record("POST /api/chat/stream", time.perf_counter() - t0, True)
+    if first is not None:
+        rec.record("POST /api/chat/stream.ttft", first, True)
+    return True
+
+
+async def chat_journey(c: httpx.AsyncClient, rec: Recorder, email: str, turns: int) -> None:
+    r = await _timed(rec, "POST /api/chat/start", c.post("/api/chat/start", json={"email": email}))
+    if r is None or r.status_code >= 400:
+        return
+    session_id = r.json().get("session_id")
+    await _timed(rec, "GET /api/chat/status", c.get("/api/chat/status", params={"session_id": session_id}))
+    for i in range(turns):
+        body = {"session_id": session_id, "email": email, "message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)], "debug": "basic"}
+        if not await _stream_turn(c, rec, body):
+            await _timed(rec, "POST /api/chat/send", c.post("/api/chat/send", json=body))
+
+
+async def background_journey(c: httpx.AsyncClient, rec: Recorder, email: str) -> None:
+    # A bulk import queueing briefs: each becomes a background job on the server
+    await _timed(rec, "POST /api/brief?wait=false", c.post("/api/brief", params={"wait": "false"}, json={"email": email}))
+    await asyncio.sleep(0.5)
+
+
+async def drive(
+    base_url: str,
+    users: int,
+    duration: float,
+    chat_ratio: float,
+    turns: int,
+    seed: int = 0,
+    background_users: int = 0,
+) -> Recorder:
+    rng = random.Random(seed)
+    rec = Recorder()
+    deadline = time.perf_counter() + duration
+    counter = iter(range(10 ** 9))
+    limits = httpx.Limits(max_connections=users * 4, max_keepalive_connections=users * 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(600.0), limits=limits) as c:
+
+        async def user(uid: int) -> None:
+            while time.perf_counter() < deadline:
+                n = next(counter)
+                # Half of the chats come back to an existing lead, like a returning user
+                email = f"lead{n}@bench{n % 997}.example"
+                if rng.random() < chat_ratio:
+                    if n and rng.random() < 0.5:
+                        k = rng.randrange(n)
+                        email = f"lead{k}@bench{k % 997}.example"
+                    await chat_journey(c, rec, email, turns)
+                else:
+                    await generate_journey(c, rec, email)
+
+        async def importer() -> None:
+            while time.perf_counter() < deadline:
+                n = next(counter)
+                await background_journey(c, rec, f"bulk{n}@import{n % 997}.example")
+
+        await asyncio.gather(*(user(i) for i in range(users)), *(importer() for _ in range(background_users)))
+    rec.finished = time.perf_counter()
+    return rec
+
+
+def bench_env(openai_port: int, airtable_port: int, data_dir: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """App environment pointing at the fakes; nothing leaves the machine."""
+    return {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_AGENTS_DISABLE_TRACING": "1",
+        "AIRTABLE_API_URL": f"http://127.0.0.1:{airtable_port}",
+        "AIRTABLE_API_KEY": "key-bench",
+        "AIRTABLE_BASE_ID": "appBench",
+        "MARKIT_DATA_DIR": data_dir or tempfile.mkdtemp(prefix="markit-bench-"),
+        # Every virtual user shares one client address; per-IP limits would throttle the bench itself
+        "RATE_LIMIT_BRIEF_IP_PER_MIN": "0",
+        "RATE_LIMIT_CHAT_IP_PER_MIN": "0",
+        **(env or {}),
+    }
+
+
+@contextmanager
+def stack(
+    config: FakeConfig,
+    data_dir: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+) -> Iterator[Tuple[ServerThread, ServerThread, ServerThread]]:
+    """Run the two fakes and the app in this process; yields `(openai, airtable, app)` server threads."""
+    openai_port, airtable_port, app_port = _free_port(), _free_port(), _free_port()
+    os.environ.update(bench_env(openai_port, airtable_port, data_dir, env))
+    fakes = [ServerThread(openai_app(config), openai_port), ServerThread(airtable_app(config), airtable_port)]
+    for f in fakes:
+        f.start()
+    from ..app import app
+
+    server = ServerThread(app, app_port)
+    try:
+        server.start(timeout=120)
+        yield fakes[0], fakes[1], server
+    finally:
+        server.stop()
+        for f in fakes:
+            f.stop()
+
+
+def upstream_calls(fake: ServerThread) -> Dict[str, int]:
+    return dict(fake.server.config.app.state.calls)
+
+
+def run(
+    users: int = 8,
+    duration: float = 30.0,
+    chat_ratio: float = 0.6,
+    turns: int = 3,
+    config: Optional[FakeConfig] = None,
+    data_dir: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    background_users: int = 0,
+) -> Dict[str, Any]:
+    """Start the fakes and the app in this process, drive traffic, and return the report."""
+    config = config or FakeConfig()
+    with stack(config, data_dir, env) as (openai, airtable, server):
+        lag = LoopLag()
+        lag_future = asyncio.run_coroutine_threadsafe(lag.run(), server.loop)
+        try:
+            rec = asyncio.run(drive(f"http://127.0.0.1:{server.port}", users, duration, chat_ratio, turns, background_users=background_users))
+        finally:
+            lag.stop()
+            try:
+                lag_future.result(timeout=5)
+            except Exception:
+                pass
+    report = rec.report()
+    report["event_loop_lag"] = lag.summary()
+    report["upstream"] = {"openai": upstream_calls(openai), "airtable": upstream_calls(airtable)}
+    report["config"] = {
+        "users": users, "background_users": background_users, "duration_s": duration, "chat_ratio": chat_ratio,
+        "turns": turns, "data_dir": os.environ["MARKIT_DATA_DIR"],
+    }
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{report['requests']} requests in {report['elapsed_s']}s ({report['rps']} req/s), {report['shed']} shed", ""]
+    lines.append(f"{'endpoint':<32}{'count':>7}{'err':>6}{'shed':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in report["endpoints"].items():
+        lines.append(f"{name:<32}{e['count']:>7}{e['errors']:>6}{e['shed']:>6}{e['rps']:>8}{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+    lag = report["event_loop_lag"]
+    lines += ["", f"event loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms ({lag['samples']} samples)"]
+    lines.append("upstream: " + json.dumps(report["upstream"]))
+    return "\n".join(lines)
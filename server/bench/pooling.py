@@ -0,0 +1,90 @@
+"""Pooling check: the shared client registry against a new client per call.
+
+Before the registry every handler opened its own `httpx.AsyncClient` (and every
+agent its own `AsyncOpenAI`), so each call paid for a new connection and a new
+client. This drives the same Airtable lookups at the fake both ways and reports
+the TCP connections the fake accepted and the call latency. Against a local
+fake there is no TLS handshake or network round trip, so real upstreams widen
+the gap further.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from ..clients import ClientRegistry
+from .fakes import FakeConfig, airtable_app
+from .load import ServerThread, _free_port, _percentile
+
+
+def _counting(app: Any, peers: Set[Tuple[str, int]]) -> Any:
+    # Every new TCP connection arrives from a new client port
+    async def wrapped(scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and scope.get("client"):
+            peers.add(tuple(scope["client"]))
+        await app(scope, receive, send)
+
+    return wrapped
+
+
+async def _drive(call: Callable[[], Awaitable[None]], requests: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with limit:
+            t0 = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def _compare(url: str, peers: Set[Tuple[str, int]], requests: int, concurrency: int) -> List[Dict[str, Any]]:
+    params = {"filterByFormula": "{fldXhVuckpHBhWJOX} = 'pool@bench.example'", "maxRecords": "1"}
+
+    async def per_call() -> None:
+        async with httpx.AsyncClient(timeout=30) as c:
+            (await c.get(url, params=params)).raise_for_status()
+
+    registry = ClientRegistry()
+
+    async def pooled() -> None:
+        (await registry.airtable.get(url, params=params)).raise_for_status()
+
+    results = []
+    try:
+        for mode, call in (("client per call", per_call), ("shared registry", pooled)):
+            peers.clear()
+            latencies = [s * 1000 for s in await _drive(call, requests, concurrency)]
+            results.append({
+                "mode": mode,
+                "requests": requests,
+                "connections": len(peers),
+                "p50_ms": round(_percentile(latencies, 0.5), 2),
+                "p99_ms": round(_percentile(latencies, 0.99), 2),
+            })
+    finally:
+        await registry.aclose()
+    return results
+
+
+def run(requests: int = 500, concurrency: int = 8, config: Optional[FakeConfig] = None) -> List[Dict[str, Any]]:
+    peers: Set[Tuple[str, int]] = set()
+    # No rate limit: both modes should measure connection handling, not 429 back-off
+    fake = ServerThread(_counting(airtable_app(config or FakeConfig.instant()), peers), _free_port())
+    fake.start()
+    try:
+        return asyncio.run(_compare(f"http://127.0.0.1:{fake.port}/v0/appBench/Leads", peers, requests, concurrency))
+    finally:
+        fake.stop()
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = [f"{'mode':<18}{'requests':>9}{'conns':>7}{'p50 ms':>9}{'p99 ms':>9}"]
+    for r in results:
+        lines.append(f"{r['mode']:<18}{r['requests']:>9}{r['connections']:>7}{r['p50_ms']:>9}{r['p99_ms']:>9}")
+    return "\n".join(lines)
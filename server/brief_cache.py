@@ -0,0 +1,188 @@
+import abc
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .settings import data_path, env_float, env_int, env_str
+
+# Shared mailbox providers say nothing about the lead's company, so never share briefs across them
+FREEMAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "outlook.com", "hotmail.com", "live.com",
+    "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "gmx.com", "yandex.com",
+})
+
+
+def cache_domain(email_or_domain: str) -> str:
+    """Normalize an email or bare domain to the cache key (lowercase, no `www.`)."""
+    d = (email_or_domain or "").strip().lower()
+    if "@" in d:
+        d = d.rsplit("@", 1)[1]
+    d = d.rstrip(".")
+    if d.startswith("www."):
+        d = d[4:]
+    if not d or d in FREEMAIL_DOMAINS:
+        return ""
+    return d
+
+
+class BriefCache(abc.ABC):
+    """Domain-keyed cache of research briefs with a TTL and an LRU size bound."""
+
+    # Backends whose calls can block set this, and `aget`/`aset` then run them in a thread
+    blocking = False
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abc.abstractmethod
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, domain: str, value: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    async def aget(self, domain: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, domain) if self.blocking else self.get(domain)
+
+    async def aset(self, domain: str, value: Dict[str, Any]) -> None:
+        if self.blocking:
+            await asyncio.to_thread(self.set, domain, value)
+        else:
+            self.set(domain, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _record(self, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+class MemoryBriefCache(BriefCache):
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        super().__init__(ttl_seconds, max_entries)
+        self._items: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        item = self._items.get(domain)
+        if item is None:
+            return self._record(None)
+        created_at, value = item
+        if time.time() - created_at > self.ttl_seconds:
+            del self._items[domain]
+            return self._record(None)
+        self._items.move_to_end(domain)
+        return self._record(value)
+
+    def set(self, domain: str, value: Dict[str, Any]) -> None:
+        self._items[domain] = (time.time(), value)
+        self._items.move_to_end(domain)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SqliteBriefCache(BriefCache):
+    """On-disk variant so cached briefs survive restarts and are shared by workers."""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int) -> None:
+        super().__init__(ttl_seconds, max_entries)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS brief_cache ("
+            " domain TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS brief_cache_accessed ON brief_cache (accessed_at)")
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created_at FROM brief_cache WHERE domain = ?", (domain,)).fetchone()
+            if row is None:
+                return self._record(None)
+            if now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM brief_cache WHERE domain = ?", (domain,))
+                return self._record(None)
+            self._db.execute("UPDATE brief_cache SET accessed_at = ? WHERE domain = ?", (now, domain))
+        return self._record(json.loads(row[0]))
+
+    def set(self, domain: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO brief_cache (domain, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (domain, json.dumps(value), now, now),
+            )
+            self._db.execute("DELETE FROM brief_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            over = self._count() - self.max_entries
+            if over > 0:
+                self._db.execute(
+                    "DELETE FROM brief_cache WHERE domain IN (SELECT domain FROM brief_cache ORDER BY accessed_at LIMIT ?)",
+                    (over,),
+                )
+                self.evictions += over
+
+    def _count(self) -> int:
+        return int(self._db.execute("SELECT COUNT(*) FROM brief_cache").fetchone()[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+def cache_from_env() -> Optional[BriefCache]:
+    backend = env_str("BRIEF_CACHE_BACKEND", "memory").lower()
+    ttl = env_float("BRIEF_CACHE_TTL", 7 * 24 * 3600)
+    max_entries = env_int("BRIEF_CACHE_MAX_ENTRIES", 1000)
+    if backend in ("off", "none", "0", "false"):
+        return None
+    if backend == "sqlite":
+        path = data_path("BRIEF_CACHE_PATH", "brief_cache.sqlite3")
+        return SqliteBriefCache(path, ttl, max_entries)
+    return MemoryBriefCache(ttl, max_entries)
+
+
+_CACHE: Optional[BriefCache] = None
+_CACHE_LOADED = False
+
+
+def get_brief_cache() -> Optional[BriefCache]:
+    global _CACHE, _CACHE_LOADED
+    if not _CACHE_LOADED:
+        _CACHE = cache_from_env()
+        _CACHE_LOADED = True
+    return _CACHE
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+
+from .metrics import METRICS
+
+METRICS.describe("markit_requests_cancelled_total", "counter", "Requests whose upstream work was cancelled because the client disconnected.")
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before its response was ready."""
+
+    def __init__(self, endpoint: str) -> None:
+        super().__init__(f"{endpoint}: client disconnected")
+        self.endpoint = endpoint
+
+
+def record_cancelled(endpoint: str) -> None:
+    METRICS.inc("markit_requests_cancelled_total", endpoint=endpoint)
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return once the server reports `http.disconnect` for this request.
+
+    Only call this after the body has been read; FastAPI does that before the endpoint runs.
+    """
+    while True:
+        message = await request.receive()
+        if message.get("type") == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, fn: Callable[[], Awaitable[Any]], endpoint: str) -> Any:
+    """Await `fn()`, cancelling it as soon as the client that asked for it goes away.
+
+    The work runs as its own task, inheriting the current deadline and trace. On
+    disconnect it is cancelled and awaited so spans, breakers and shared flights
+    see the cancellation before `ClientDisconnected` is raised.
+    """
+    work = asyncio.ensure_future(fn())
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        watcher.cancel()
+        raise
+    if work in done or watcher.exception() is not None:
+        watcher.cancel()
+        return await work
+    work.cancel()
+    await asyncio.wait({work})
+    if not work.cancelled() and work.exception() is None:
+        # Finished in the same tick as the disconnect; nobody is left to read it
+        return work.result()
+    record_cancelled(endpoint)
+    raise ClientDisconnected(endpoint)
@@ -0,0 +1,149 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from .metrics import span
+from .prompts import CHAT_SUMMARY, count_tokens, record_usage
+from .resilience import call
+from .settings import env_int, env_str
+
+# Summarizer signature: (previous_summary, turns_to_fold, max_tokens) -> new summary
+Summarizer = Callable[[str, List[Dict[str, str]], int], Awaitable[str]]
+
+
+class ContextConfig:
+    """Bounds for the chat prompt; defaults can be overridden with CHAT_* env vars."""
+
+    def __init__(
+        self,
+        window_turns: Optional[int] = None,
+        summary_batch: Optional[int] = None,
+        summary_max_tokens: Optional[int] = None,
+        window_budget_tokens: Optional[int] = None,
+        summary_model: Optional[str] = None,
+    ) -> None:
+        self.window_turns = window_turns if window_turns is not None else env_int("CHAT_WINDOW_TURNS", 8)
+        # Fold older turns in batches so the summary is not rewritten on every message
+        self.summary_batch = summary_batch if summary_batch is not None else env_int("CHAT_SUMMARY_BATCH", 4)
+        self.summary_max_tokens = summary_max_tokens if summary_max_tokens is not None else env_int("CHAT_SUMMARY_MAX_TOKENS", 400)
+        self.window_budget_tokens = window_budget_tokens if window_budget_tokens is not None else env_int("CHAT_WINDOW_BUDGET_TOKENS", 3000)
+        self.summary_model = summary_model or env_str("CHAT_SUMMARY_MODEL", "gpt-5-mini")
+
+
+def new_context_state(brief: Optional[str] = None, hidden_turns: int = 0) -> Dict[str, Any]:
+    """Per-session context state; a plain dict so session stores can persist it as JSON.
+
+    `brief` is the pinned business-info JSON, `hidden_turns` counts leading turns
+    (the greeting instruction) that are never replayed once answered, and
+    `summarized_through` is how many turns are already folded into `summary`.
+    """
+    return {"brief": brief, "hidden_turns": hidden_turns, "summary": "", "summarized_through": hidden_turns}
+
+
+def _format_turns(turns: Sequence[Dict[str, str]]) -> str:
+    lines: List[str] = []
+    for turn in turns:
+        speaker = "User" if turn.get("role") == "user" else "Mark"
+        lines.append(f"{speaker}: {turn.get('content', '')}")
+    return "\n".join(lines)
+
+
+def truncate_summary(text: str, max_tokens: int) -> str:
+    # Keep the most recent part of an over-long summary
+    if count_tokens(text) <= max_tokens:
+        return text
+    # ~4 chars per token; trimmed further when the exact count (tiktoken) is higher
+    keep = max_tokens * 4
+    while keep > 1:
+        clipped = "…" + text[-(keep - 1):]
+        if count_tokens(clipped) <= max_tokens:
+            return clipped
+        keep = keep * 9 // 10
+    return ""
+
+
+async def extractive_summarizer(previous: str, turns: List[Dict[str, str]], max_tokens: int) -> str:
+    """Local fallback: append clipped turns to the running summary and cap its size."""
+    clipped = []
+    for turn in turns:
+        content = " ".join(str(turn.get("content", "")).split())
+        if len(content) > 240:
+            content = content[:239] + "…"
+        speaker = "User" if turn.get("role") == "user" else "Mark"
+        clipped.append(f"{speaker}: {content}")
+    merged = (previous + "\n" if previous else "") + "\n".join(clipped)
+    return truncate_summary(merged, max_tokens)
+
+
+def model_summarizer(client: Any, model: str) -> Summarizer:
+    async def _summarize(previous: str, turns: List[Dict[str, str]], max_tokens: int) -> str:
+        with span("openai.responses", prompt=CHAT_SUMMARY.name) as sp:
+            resp = await call("openai", lambda: client.responses.create(
+                model=model,
+                input=[
+                    {"role": "developer", "content": [{"type": "input_text", "text": CHAT_SUMMARY.text.format(max_words=max_tokens * 3 // 4)}]},
+                    {"role": "user", "content": [{"type": "input_text", "text": (
+                        "PREVIOUS_SUMMARY:\n" + (previous or "(none)") + "\nNEW_TURNS:\n" + _format_turns(turns)
+                    )}]},
+                ],
+                reasoning={"effort": "minimal"},
+                store=False,
+                extra_body=CHAT_SUMMARY.cache_args(),
+            ))
+            if getattr(resp, "usage", None) is not None:
+                sp.usage(record_usage(CHAT_SUMMARY, resp.usage))
+        return truncate_summary(str(getattr(resp, "output_text", "") or "").strip(), max_tokens)
+
+    return _summarize
+
+
+async def build_bounded_prompt(
+    history: Sequence[Dict[str, str]],
+    state: Dict[str, Any],
+    config: Optional[ContextConfig] = None,
+    summarizer: Optional[Summarizer] = None,
+) -> Tuple[str, str, Dict[str, Any]]:
+    """Build the chat prompt from a pinned brief, a running summary and the last K turns.
+
+    Updates `state` in place when turns roll out of the window, folding only the
+    newly evicted turns into the summary. Returns `(prompt, window_transcript, stats)`.
+    """
+    config = config or ContextConfig()
+    hidden = int(state.get("hidden_turns") or 0)
+    turns = list(history)
+    # Hidden greeting instructions are only replayed while they are the whole conversation
+    done = max(int(state.get("summarized_through") or 0), hidden) if len(turns) > hidden else 0
+
+    window_start = max(done, len(turns) - config.window_turns)
+    # Respect the token budget for verbatim turns, always keeping the newest one
+    while window_start < len(turns) - 1 and count_tokens(_format_turns(turns[window_start:])) > config.window_budget_tokens:
+        window_start += 1
+
+    pending = turns[done:window_start]
+    # Deferring a small batch keeps those turns verbatim, which is only allowed while they still fit the budget
+    over_budget = count_tokens(_format_turns(turns[done:])) > config.window_budget_tokens
+    if pending and (len(pending) >= config.summary_batch or over_budget):
+        previous = str(state.get("summary") or "")
+        try:
+            state["summary"] = await (summarizer or extractive_summarizer)(previous, pending, config.summary_max_tokens)
+        except Exception:
+            state["summary"] = await extractive_summarizer(previous, pending, config.summary_max_tokens)
+        state["summarized_through"] = done = window_start
+    else:
+        # Not enough to fold yet: keep those turns verbatim a little longer
+        window_start = done
+
+    window = turns[window_start:]
+    transcript = _format_turns(window)
+    # Stable pieces first (the pinned brief follows the static instructions), then the slowly changing summary, then the window
+    parts = []
+    if state.get("brief"):
+        parts.append("BUSINESS_INFO:\n" + str(state["brief"]) + "\n")
+    if state.get("summary"):
+        parts.append("EARLIER_CONVERSATION_SUMMARY:\n" + str(state["summary"]) + "\n")
+    parts.append("---\n" + transcript)
+    prompt = "".join(parts)
+    stats = {
+        "window_turns": len(window),
+        "summarized_turns": max(0, done - hidden),
+        "summary_tokens_est": count_tokens(str(state.get("summary") or "")),
+        "prompt_tokens_est": count_tokens(prompt),
+    }
+    return prompt, transcript, stats
@@ -0,0 +1,108 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from .scheduler import request_hook, response_hook
+from .settings import env_float, env_int, get_settings
+
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed
+    try:
+        import h2  # type: ignore  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def limits_from_env() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=env_int("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+class ClientRegistry:
+    """Pooled upstream clients shared by every request in the process.
+
+    One keep-alive `httpx.AsyncClient` serves Airtable, and a second one backs
+    every `AsyncOpenAI` client (one per API key) so OpenAI, the Agents SDK and
+    image calls all reuse the same connection pool.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[httpx.Limits] = None,
+        http2: Optional[bool] = None,
+        airtable_timeout: Optional[float] = None,
+        openai_timeout: Optional[float] = None,
+    ) -> None:
+        self.limits = limits or limits_from_env()
+        self.http2 = _http2_available() if http2 is None else http2
+        self.airtable = httpx.AsyncClient(
+            limits=self.limits,
+            http2=self.http2,
+            timeout=airtable_timeout if airtable_timeout is not None else env_float("AIRTABLE_TIMEOUT", 30.0),
+        )
+        # GPT-5 with high reasoning effort can run for minutes; keep the SDK default ceiling.
+        # Every model call (SDK, Agents SDK, images) passes the outbound scheduler's hooks.
+        self.openai_http = httpx.AsyncClient(
+            limits=self.limits,
+            http2=self.http2,
+            timeout=openai_timeout if openai_timeout is not None else env_float("OPENAI_TIMEOUT", 600.0),
+            event_hooks={"request": [request_hook], "response": [response_hook]},
+        )
+        self._openai: Dict[str, AsyncOpenAI] = {}
+
+    def openai(self, api_key: Optional[str] = None) -> AsyncOpenAI:
+        key = api_key or get_settings().openai_api_key or ""
+        client = self._openai.get(key)
+        if client is None:
+            # Retries, backoff and deadlines are handled once in `resilience.call`, not per SDK call
+            client = AsyncOpenAI(api_key=key or None, http_client=self.openai_http, max_retries=0)
+            self._openai[key] = client
+        return client
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "openai_clients": len(self._openai),
+        }
+
+    async def aclose(self) -> None:
+        self._openai.clear()
+        await self.airtable.aclose()
+        await self.openai_http.aclose()
+
+
+_REGISTRY: Optional[ClientRegistry] = None
+
+
+def get_clients() -> ClientRegistry:
+    """Return the app-scoped registry, creating one lazily outside the app lifespan."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = ClientRegistry()
+    return _REGISTRY
+
+
+async def close_clients() -> None:
+    global _REGISTRY
+    if _REGISTRY is not None:
+        registry, _REGISTRY = _REGISTRY, None
+        await registry.aclose()
+
+
+@asynccontextmanager
+async def clients_lifespan() -> AsyncIterator[ClientRegistry]:
+    registry = get_clients()
+    try:
+        yield registry
+    finally:
+        await close_clients()
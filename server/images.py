@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import io
+import os
+import re
+from typing import Optional, Tuple
+
+from .settings import data_path, env_int, env_str
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Magic bytes -> (extension, media type); anything else is served as PNG like the model default
+_FORMATS = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"RIFF", "webp", "image/webp"),
+)
+
+
+def _sniff(data: bytes) -> Tuple[str, str]:
+    for magic, ext, media_type in _FORMATS:
+        if data.startswith(magic):
+            return ext, media_type
+    return "png", "image/png"
+
+
+def _pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+class ImageStore:
+    """Content-addressed image files on local disk, keyed by SHA-256 of the bytes.
+
+    Files live under `root/<first two hex chars>/<hash>.<ext>` and never change once
+    written, so they can be served with immutable caching. Thumbnails are rendered on
+    first request when Pillow is installed and kept next to the original; their URL
+    names the size, so changing `thumb_size` never reuses a cached rendition.
+    `url_prefix` may be absolute for pages that are not served by this app.
+    """
+
+    def __init__(self, root: str, url_prefix: str = "/api/images", thumb_size: int = 384) -> None:
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.thumb_size = thumb_size
+        self.thumbnails = _pillow_available()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2])
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        ext, _ = _sniff(data)
+        path = os.path.join(self._dir(digest), f"{digest}.{ext}")
+        if not os.path.exists(path):
+            os.makedirs(self._dir(digest), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def put_b64(self, b64: str) -> str:
+        return self.put(base64.b64decode(b64))
+
+    def url(self, digest: str) -> str:
+        return f"{self.url_prefix}/{digest}"
+
+    def thumb_url(self, digest: str) -> str:
+        return f"{self.url_prefix}/{digest}?size=thumb&px={self.thumb_size}"
+
+    def path(self, digest: str) -> Optional[Tuple[str, str]]:
+        """Return `(path, media_type)` of the original image, or None if unknown."""
+        if not _HASH_RE.match(digest or ""):
+            return None
+        d = self._dir(digest)
+        for _, ext, media_type in _FORMATS:
+            p = os.path.join(d, f"{digest}.{ext}")
+            if os.path.exists(p):
+                return p, media_type
+        return None
+
+    def thumbnail(self, digest: str, max_side: int) -> Optional[Tuple[str, str]]:
+        """Return `(path, media_type)` of a bounded-size rendition, or the original without Pillow."""
+        original = self.path(digest)
+        if original is None or not self.thumbnails:
+            return original
+        p = os.path.join(self._dir(digest), f"{digest}.thumb{max_side}.webp")
+        if not os.path.exists(p):
+            from PIL import Image
+
+            with Image.open(original[0]) as im:
+                im.thumbnail((max_side, max_side))
+                buf = io.BytesIO()
+                im.save(buf, format="WEBP", quality=80)
+            tmp = f"{p}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(buf.getvalue())
+            os.replace(tmp, p)
+        return p, "image/webp"
+
+
+def store_from_env() -> ImageStore:
+    # e.g. https://api.markit.example when the pages live on another origin (or on disk)
+    public_base = env_str("IMAGE_PUBLIC_BASE_URL").rstrip("/")
+    return ImageStore(
+        data_path("IMAGE_STORE_DIR", "images"),
+        url_prefix=f"{public_base}/api/images",
+        thumb_size=env_int("IMAGE_THUMB_SIZE", 384),
+    )
+
+
+_STORE: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = store_from_env()
+    return _STORE
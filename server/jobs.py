@@ -0,0 +1,330 @@
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .settings import data_path, env_float, env_int
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _owner_alive(owner: str) -> bool:
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        # Another host's worker: only its lease can tell
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Durable local job queue backed by SQLite with a bounded asyncio worker pool.
+
+    Running jobs hold a lease that their worker keeps extending. If the process
+    dies, the lease lapses and the job is picked up again by the next worker to
+    poll, in this process after a restart or in another one sharing the file.
+    Failed attempts are retried with exponential backoff up to `max_attempts`;
+    a lapsed lease counts as an attempt, so a job that keeps killing its worker
+    ends up failed rather than looping.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 4,
+        max_attempts: int = 3,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+        retry_base_delay: float = 5.0,
+    ) -> None:
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,"
+            " state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT, error TEXT, owner TEXT,"
+            " run_after REAL NOT NULL, lease_until REAL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state_run_after ON jobs (state, run_after)")
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id, _ = self._insert(kind, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def _insert(self, kind: str, payload: Dict[str, Any], unique: Optional[str] = None, state: str = QUEUED) -> Tuple[str, bool]:
+        """Insert a job; with `unique`, return `(id, False)` for an active job with the same `payload[unique]` instead.
+
+        A RUNNING insert is owned and leased by this process, like a claimed job.
+        """
+        job_id = os.urandom(8).hex()
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if unique is not None:
+                    row = self._db.execute(
+                        "SELECT id FROM jobs WHERE kind = ? AND state IN (?, ?) AND json_extract(payload, ?) = ? LIMIT 1",
+                        (kind, QUEUED, RUNNING, f"$.{unique}", payload[unique]),
+                    ).fetchone()
+                    if row is not None:
+                        self._db.execute("COMMIT")
+                        return row[0], False
+                running = state == RUNNING
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, payload, state, attempts, owner, run_after, lease_until, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload), state, int(running), self.owner if running else None,
+                     now, now + self.lease_seconds if running else None, now, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return job_id, True
+
+    # Async entry points for request handlers: the SQLite calls can wait up to 30s
+    # on another worker's write lock, so they run in a thread
+
+    async def aenqueue(self, kind: str, payload: Dict[str, Any], unique: Optional[str] = None) -> str:
+        """Enqueue a job, or with `unique` return the active job whose payload has the same `payload[unique]`."""
+        job_id, created = await asyncio.to_thread(self._insert, kind, payload, unique)
+        # Set from the loop; asyncio.Event is not thread-safe
+        if created and self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    @contextlib.asynccontextmanager
+    async def inline(self, kind: str, payload: Dict[str, Any], unique: str) -> AsyncIterator[Dict[str, Any]]:
+        """Record a job the caller runs itself, so other submits see it as active.
+
+        Yields `{"id", "owned"}`. When another job with the same `payload[unique]` is
+        already queued or running, `owned` is False and nothing is recorded; the caller
+        should not run it. Otherwise the row is leased to this process while the block
+        runs and finished with the block's outcome (set `job["result"]` to store one).
+        If the process dies mid-run the lease lapses and a worker finishes the job.
+        """
+        job_id, owned = await asyncio.to_thread(self._insert, kind, payload, unique, RUNNING)
+        job: Dict[str, Any] = {"id": job_id, "owned": owned}
+        if not owned:
+            yield job
+            return
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id))
+        try:
+            yield job
+        except BaseException as e:
+            heartbeat.cancel()
+            # Cancelled or failed: a later submit may start it again
+            await asyncio.to_thread(self._finish, job_id, FAILED, error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            heartbeat.cancel()
+        await asyncio.to_thread(self._finish, job_id, SUCCEEDED, result=job.get("result"))
+
+    async def aget(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def afind_active(self, kind: str, key: str, value: Any) -> Optional[str]:
+        return await asyncio.to_thread(self.find_active, kind, key, value)
+
+    async def acounts(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.counts)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "state": row["state"],
+            "attempts": row["attempts"],
+            "payload": json.loads(row["payload"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def find_active(self, kind: str, key: str, value: Any) -> Optional[str]:
+        """Id of a queued or running `kind` job whose payload has `key == value`, if any."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND state IN (?, ?) AND json_extract(payload, ?) = ? LIMIT 1",
+                (kind, QUEUED, RUNNING, f"$.{key}", value),
+            ).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {r[0]: int(r[1]) for r in rows}
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        with self._lock:
+            if not self._tasks:
+                # Stopped while this claim waited for its thread: leave the job queued
+                return None
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute(
+                        "SELECT * FROM jobs WHERE (state = ? AND run_after <= ?) OR (state = ? AND lease_until < ?)"
+                        " ORDER BY created_at LIMIT 1",
+                        (QUEUED, now, RUNNING, now),
+                    ).fetchone()
+                    if row is None or row["state"] == QUEUED or int(row["attempts"]) < self.max_attempts:
+                        break
+                    # Its worker died on the last allowed attempt; running it again would exceed the limit
+                    self._db.execute(
+                        "UPDATE jobs SET state = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                        (FAILED, f"lease expired on attempt {row['attempts']} of {self.max_attempts}", now, row["id"]),
+                    )
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET state = ?, owner = ?, attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, self.owner, now + self.lease_seconds, now, row["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return row
+
+    def _finish(self, job_id: str, state: str, result: Any = None, error: Optional[str] = None, run_after: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, lease_until = NULL, run_after = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                (state, json.dumps(result) if result is not None else None, error, run_after or now, now, job_id, self.owner),
+            )
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self._extend_lease, job_id)
+
+    def _extend_lease(self, job_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND owner = ? AND state = ?",
+                (now + self.lease_seconds, now, job_id, self.owner, RUNNING),
+            )
+
+    async def _run_one(self, row: sqlite3.Row) -> None:
+        job_id = row["id"]
+        attempts = int(row["attempts"]) + 1
+        handler = self._handlers.get(row["kind"])
+        if handler is None:
+            await asyncio.to_thread(self._finish, job_id, FAILED, error=f"no handler for job kind {row['kind']!r}")
+            return
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id))
+        try:
+            result = await handler(json.loads(row["payload"]))
+            await asyncio.to_thread(self._finish, job_id, SUCCEEDED, result=result)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job for the next worker once the lease lapses
+            raise
+        except Exception as e:
+            if attempts < self.max_attempts:
+                delay = self.retry_base_delay * (2 ** (attempts - 1))
+                await asyncio.to_thread(self._finish, job_id, QUEUED, error=f"{type(e).__name__}: {e}", run_after=time.time() + delay)
+            else:
+                await asyncio.to_thread(self._finish, job_id, FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _worker(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            # SQLite waits on the file lock (up to 30s) when another process holds it; keep that off the loop
+            row = await asyncio.to_thread(self._claim)
+            if row is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_one(row)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        # Jobs a dead process on this host was running can resume immediately
+        with self._lock:
+            rows = self._db.execute("SELECT id, owner FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+            for row in rows:
+                if not _owner_alive(row["owner"] or ""):
+                    self._db.execute("UPDATE jobs SET lease_until = 0 WHERE id = ? AND owner = ?", (row["id"], row["owner"]))
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Hand in-flight jobs back right away instead of waiting for the lease to lapse
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts - 1, lease_until = NULL, updated_at = ? WHERE state = ? AND owner = ?",
+                (QUEUED, time.time(), RUNNING, self.owner),
+            )
+
+
+def queue_from_env() -> JobQueue:
+    return JobQueue(
+        data_path("JOBS_PATH", "jobs.sqlite3"),
+        workers=env_int("JOBS_WORKERS", 4),
+        max_attempts=env_int("JOBS_MAX_ATTEMPTS", 3),
+        lease_seconds=env_float("JOBS_LEASE_SECONDS", 60),
+    )
+
+
+_QUEUE: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _QUEUE
+    if _QUEUE is None:
+        _QUEUE = queue_from_env()
+    return _QUEUE
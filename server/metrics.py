@@ -0,0 +1,210 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .settings import env_str
+
+# Upstream calls range from ~50 ms Airtable lookups to multi-minute research runs
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_KINDS = ("input_tokens", "cached_tokens", "output_tokens", "reasoning_tokens")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items)
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """In-process counters and histograms rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                kind, help_text = self._help.get(name, ("counter", ""))
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(value)}")
+            for name, series in sorted(self._histograms.items()):
+                lines += [f"# HELP {name} {self._help.get(name, ('', ''))[1]}", f"# TYPE {name} histogram"]
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {hist.count}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {_fmt_value(round(hist.sum, 6))}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.describe("markit_span_duration_seconds", "histogram", "Duration of upstream calls and pipeline stages.")
+METRICS.describe("markit_tokens_total", "counter", "Model tokens by span and kind (input, cached, output, reasoning).")
+METRICS.describe("markit_retries_total", "counter", "Retried upstream attempts by span.")
+
+
+class _TraceWriter:
+    """Appends finished spans as JSON lines to METRICS_TRACE_PATH (disabled when unset)."""
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._file: Any = None
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if not self.path:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+
+_TRACES: Optional[_TraceWriter] = None
+# (trace id, span id, span) of the span enclosing the current task, if any
+_CURRENT: "contextvars.ContextVar[Optional[Tuple[str, str, Span]]]" = contextvars.ContextVar("markit_span", default=None)
+
+
+def _trace_writer() -> _TraceWriter:
+    global _TRACES
+    if _TRACES is None:
+        _TRACES = _TraceWriter(env_str("METRICS_TRACE_PATH") or None)
+    return _TRACES
+
+
+class Span:
+    def __init__(self, name: str, labels: Dict[str, Any]) -> None:
+        self.name = name
+        self.labels = labels
+        self.status = "ok"
+        self.retries = 0
+        self.tokens: Dict[str, int] = {}
+        self.attrs: Dict[str, Any] = {}
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def ms(self) -> float:
+        return round(self.seconds * 1000, 1)
+
+    def usage(self, tokens: Optional[Dict[str, int]]) -> None:
+        """Attach token counts as returned by `prompts.record_usage`."""
+        for kind in TOKEN_KINDS:
+            n = int((tokens or {}).get(kind) or 0)
+            if n:
+                self.tokens[kind] = self.tokens.get(kind, 0) + n
+
+
+@contextmanager
+def span(name: str, **labels: Any) -> Iterator[Span]:
+    """Time a block as `name`; failures are recorded with status `error` (or `cancelled`) and re-raised.
+
+    Labels end up on the Prometheus series, so keep them low-cardinality (agent or
+    prompt names, HTTP methods), never emails or record ids.
+    """
+    sp = Span(name, labels)
+    parent = _CURRENT.get()
+    trace_id = parent[0] if parent else os.urandom(8).hex()
+    span_id = os.urandom(4).hex()
+    token = _CURRENT.set((trace_id, span_id, sp))
+    try:
+        yield sp
+    except BaseException as e:
+        sp.status = "cancelled" if type(e).__name__ in ("CancelledError", "GeneratorExit") else "error"
+        sp.attrs.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        try:
+            _CURRENT.reset(token)
+        except ValueError:
+            # Async generators may be finalized from another context
+            pass
+        sp.seconds = time.perf_counter() - sp.started
+        METRICS.observe("markit_span_duration_seconds", sp.seconds, span=name, status=sp.status, **labels)
+        for kind, n in sp.tokens.items():
+            METRICS.inc("markit_tokens_total", n, span=name, kind=kind.replace("_tokens", ""), **labels)
+        if sp.retries:
+            METRICS.inc("markit_retries_total", sp.retries, span=name, **labels)
+        _trace_writer().write({
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_id": parent[1] if parent else None,
+            "name": name,
+            "labels": labels,
+            "status": sp.status,
+            "start": round(time.time() - sp.seconds, 6),
+            "duration_ms": sp.ms,
+            "tokens": sp.tokens,
+            "retries": sp.retries,
+            **sp.attrs,
+        })
+
+
+def current_span() -> Optional[Span]:
+    current = _CURRENT.get()
+    return current[2] if current else None
+
+
+def render() -> str:
+    return METRICS.render()
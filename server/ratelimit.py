@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = max(rate, 1e-9)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0, keep: float = 0.0) -> bool:
+        """Take `tokens` if at least `keep` would still be left afterwards (a reserve for others)."""
+        self._refill()
+        if self._tokens - tokens >= keep:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1.0, keep: float = 0.0) -> float:
+        """Seconds until `tokens` would be available above `keep` (0 if they are now)."""
+        self._refill()
+        return max(0.0, (tokens + keep - self._tokens) / self.rate)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def configure(self, rate: float, burst: float) -> None:
+        """Adopt a new rate and size, e.g. limits reported by the upstream."""
+        self._refill()
+        self.rate = max(rate, 1e-9)
+        self.burst = max(burst, 1.0)
+        self._tokens = min(self._tokens, self.burst)
+
+    def sync(self, tokens: float) -> None:
+        """Take the upstream's own count of what is left as the truth (it sees every client)."""
+        self._refill()
+        self._tokens = min(self.burst, max(0.0, tokens))
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        # Waiters queue on the lock so they are served in arrival order
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.wait_time(tokens))
@@ -0,0 +1,292 @@
+import asyncio
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+import httpx
+import openai
+
+from .metrics import METRICS, current_span
+from .settings import env_float
+
+METRICS.describe("markit_circuit_open_total", "counter", "Times a dependency's circuit breaker opened.")
+METRICS.describe("markit_circuit_rejected_total", "counter", "Calls rejected without trying because a breaker was open.")
+
+
+class DeadlineExceeded(Exception):
+    """The request's latency budget ran out before the upstream call could finish."""
+
+
+class CircuitOpenError(Exception):
+    """A dependency is failing and its breaker is rejecting calls until the cool-down ends."""
+
+    def __init__(self, dependency: str, retry_in: float) -> None:
+        super().__init__(f"{dependency} circuit open; retry in {retry_in:.1f}s")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+# Absolute time.monotonic() by which the current request must finish, inherited by child tasks
+_DEADLINE: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("markit_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bound everything awaited inside the block (and tasks it spawns) to `seconds` from now.
+
+    Nested deadlines only ever tighten the budget. `None` or a non-positive value adds no limit.
+    """
+    current = _DEADLINE.get()
+    new = current
+    if seconds is not None and seconds > 0:
+        until = time.monotonic() + seconds
+        new = until if current is None else min(current, until)
+    token = _DEADLINE.set(new)
+    try:
+        yield
+    finally:
+        try:
+            _DEADLINE.reset(token)
+        except ValueError:
+            # Async generators may be finalized from another context
+            pass
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current deadline, or None when there is none."""
+    until = _DEADLINE.get()
+    return None if until is None else until - time.monotonic()
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout` one probe is let through.
+
+    A successful probe closes the breaker, a failed one re-opens it for another cool-down.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_total = 0
+        self.rejected_total = 0
+        self._probing = False
+
+    def allow(self) -> None:
+        if self.state == "closed":
+            return
+        waited = time.monotonic() - self.opened_at
+        if self.state == "open" and waited >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        self.rejected_total += 1
+        METRICS.inc("markit_circuit_rejected_total", dependency=self.name)
+        raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - waited))
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened_total += 1
+                METRICS.inc("markit_circuit_open_total", dependency=self.name)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without judging the dependency (throttled or cancelled)."""
+        self._probing = False
+
+    def describe(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened_total, "rejected": self.rejected_total}
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    breaker = _BREAKERS.get(dependency)
+    if breaker is None:
+        breaker = _BREAKERS[dependency] = CircuitBreaker(
+            dependency,
+            failure_threshold=int(env_float("BREAKER_FAILURES", 5)),
+            reset_timeout=env_float("BREAKER_RESET_SECONDS", 30.0),
+        )
+    return breaker
+
+
+def breakers() -> Dict[str, Dict[str, Any]]:
+    return {name: b.describe() for name, b in _BREAKERS.items()}
+
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter"), overridden by a server-sent Retry-After."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 20.0) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(env_float("RETRY_MAX_ATTEMPTS", 3)),
+            base_delay=env_float("RETRY_BASE_DELAY", 0.5),
+            max_delay=env_float("RETRY_MAX_DELAY", 20.0),
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def _headers_of(obj: Any) -> Any:
+    if isinstance(obj, httpx.Response):
+        return obj.headers
+    response = getattr(obj, "response", None)
+    return getattr(response, "headers", None)
+
+
+def retry_after(obj: Any) -> Optional[float]:
+    """Seconds from `retry-after-ms` / `retry-after` on a response or an SDK error carrying one."""
+    headers = _headers_of(obj)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _status_of(obj: Any) -> Optional[int]:
+    if isinstance(obj, httpx.Response):
+        return obj.status_code
+    status = getattr(obj, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify(outcome: Any) -> Optional[str]:
+    """Return why `outcome` (a response or an exception) is worth retrying, or None if it is final.
+
+    `"throttled"` (429) is retried but does not count against the breaker: the
+    dependency is healthy, just busy. `"failed"` (timeouts, connection errors,
+    5xx) is retried and counts.
+    """
+    status = _status_of(outcome)
+    if status == 429:
+        return "throttled"
+    if status is not None and status >= 500:
+        return "failed"
+    if status is not None:
+        return None
+    if isinstance(outcome, (httpx.TransportError, asyncio.TimeoutError)):
+        return "failed"
+    # Carry no status code; covers APITimeoutError, a subclass
+    if isinstance(outcome, openai.APIConnectionError):
+        return "failed"
+    return None
+
+
+def _never_sent(outcome: Any) -> bool:
+    # Failed before the upstream could see the request. A timeout may have reached it.
+    if isinstance(outcome, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return True
+    return isinstance(outcome, openai.APIConnectionError) and not isinstance(outcome, openai.APITimeoutError)
+
+
+def _judge(breaker: CircuitBreaker, outcome: Any) -> Optional[str]:
+    reason = classify(outcome)
+    if reason == "failed":
+        breaker.record_failure()
+    elif reason == "throttled":
+        breaker.release()
+    else:
+        breaker.record_success()
+    return reason
+
+
+def record_outcome(dependency: str, outcome: Any) -> None:
+    """Feed the breaker for calls that cannot go through `call`, such as a stream already being relayed."""
+    _judge(get_breaker(dependency), outcome)
+
+
+async def call(
+    dependency: str,
+    fn: Callable[[], Awaitable[Any]],
+    policy: Optional[RetryPolicy] = None,
+    idempotent: bool = True,
+) -> Any:
+    """Run `fn` against `dependency` with retries, the breaker and the current deadline.
+
+    `fn` is invoked once per attempt. It may return an `httpx.Response`: retryable
+    statuses are retried and the last response is returned when attempts run
+    out, so callers keep their own status handling. Exceptions that are not
+    retryable, or that outlast the attempts, propagate. Non-idempotent calls are
+    only retried when the upstream clearly rejected them (429) or never saw them.
+    """
+    policy = policy or RetryPolicy.from_env()
+    breaker = get_breaker(dependency)
+    attempt = 0
+    while True:
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"{dependency}: latency budget exhausted")
+        breaker.allow()
+        error: Optional[BaseException] = None
+        result: Any = None
+        try:
+            result = await (asyncio.wait_for(fn(), timeout=left) if left is not None else fn())
+            outcome: Any = result
+        except asyncio.TimeoutError as e:
+            if left is not None and (remaining() or 0) <= 0:
+                breaker.release()
+                raise DeadlineExceeded(f"{dependency}: latency budget exhausted") from e
+            error = outcome = e
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            error = outcome = e
+        reason = _judge(breaker, outcome)
+        if reason is None:
+            if error is not None:
+                raise error
+            return result
+        if not idempotent and reason == "failed" and not _never_sent(outcome):
+            # The upstream may have acted on it; repeating could duplicate the write
+            if error is not None:
+                raise error
+            return result
+        attempt += 1
+        wait = policy.delay(attempt - 1, retry_after(outcome))
+        left = remaining()
+        if attempt >= policy.max_attempts or (left is not None and wait >= left):
+            if error is not None:
+                raise error
+            return result
+        sp = current_span()
+        if sp is not None:
+            sp.retries += 1
+        await asyncio.sleep(wait)
+
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """True for errors that mean the dependency itself is down, slow or throttling us."""
+    return isinstance(e, (DeadlineExceeded, CircuitOpenError)) or classify(e) is not None
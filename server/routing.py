@@ -0,0 +1,180 @@
+import re
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .metrics import METRICS
+from .settings import env_flag, env_str
+
+METRICS.describe("markit_route_decisions_total", "counter", "Model/effort routing decisions, by surface, tier and reason.")
+
+# Chat tiers, cheapest first: (model, reasoning effort). `execute` is what every turn used
+# before routing (GPT-5 at its default effort) and stays the tier for producing deliverables.
+CHAT_TIERS: Dict[str, Tuple[str, str]] = {
+    "light": ("gpt-5-mini", "minimal"),
+    "standard": ("gpt-5", "low"),
+    "execute": ("gpt-5", "medium"),
+}
+
+# Sub-agents writing from a research brief: short, structured copy needs less reasoning
+# than positioning. Agents without a brief research the web themselves and keep `high`.
+AGENT_EFFORT: Dict[str, str] = {"positioning": "medium", "landing_copy": "medium", "ads": "low", "emails": "low"}
+UNGROUNDED_EFFORT = "high"
+EFFORTS = ("minimal", "low", "medium", "high")
+
+# A message this long carries enough context that it is treated as a real task
+LONG_MESSAGE_WORDS = 60
+SHORT_MESSAGE_WORDS = 8
+
+_ACTION_RE = re.compile(
+    r"\b(?:write|draft|create|generate|make|design|produce|build|plan|outline|rewrite|re-?write|tighten|shorten|expand|"
+    r"polish|brainstorm|come up with|give me|list|find|source|visuali[sz]e|mock ?up|sketch|script|compose|prepare|"
+    r"put together|turn (?:this|that|it) into)\b",
+    re.I,
+)
+_ACK_RE = re.compile(
+    r"^\W*(?:thanks?|thank you|thx|ty|ok(?:ay)?|cool|great|nice|awesome|perfect|got it|sounds good|love (?:it|that)|"
+    r"makes sense|hi|hello|hey|bye|cheers|lol|haha|wow)\b",
+    re.I,
+)
+_AFFIRM_RE = re.compile(r"^\W*(?:yes|yeah|yep|yup|sure|please do|please|go ahead|go for it|do it|let'?s do (?:it|that)|let'?s go|ok(?:ay)?)\b", re.I)
+# The assistant's previous message offered to produce something
+_OFFER_RE = re.compile(r"\b(?:want me to|shall i|should i|would you like|do you want|i can (?:draft|write|create|put together|generate|mock up))\b", re.I)
+
+
+class Route:
+    """Where one model call goes: a tier name, its model and reasoning effort, and why."""
+
+    def __init__(self, surface: str, tier: str, model: str, effort: str, reason: str) -> None:
+        self.surface = surface
+        self.tier = tier
+        self.model = model
+        self.effort = effort
+        self.reason = reason
+
+    def describe(self) -> Dict[str, Any]:
+        return {"tier": self.tier, "model": self.model, "effort": self.effort, "reason": self.reason}
+
+
+def _tier_from_env(tier: str, default: Tuple[str, str]) -> Tuple[str, str]:
+    # CHAT_ROUTE_LIGHT="gpt-5-mini:minimal"; either half may be left out to keep the default
+    raw = env_str(f"CHAT_ROUTE_{tier.upper()}")
+    if not raw:
+        return default
+    model, _, effort = raw.partition(":")
+    effort = effort.strip().lower()
+    return model.strip() or default[0], effort if effort in EFFORTS else default[1]
+
+
+def _agent_effort_from_env() -> Dict[str, str]:
+    # Comma-separated overrides, e.g. AGENTS_EFFORT="ads=medium,emails=minimal"
+    out = dict(AGENT_EFFORT)
+    for item in env_str("AGENTS_EFFORT").split(","):
+        name, _, effort = item.partition("=")
+        if name.strip() in AGENT_EFFORT and effort.strip().lower() in EFFORTS:
+            out[name.strip()] = effort.strip().lower()
+    return out
+
+
+def _last_turns(history: Sequence[Any]) -> Tuple[str, str]:
+    """The latest user message and the assistant message just before it."""
+    user, previous = "", ""
+    for turn in reversed(history):
+        role = turn.get("role") if isinstance(turn, dict) else getattr(turn, "role", "")
+        content = turn.get("content") if isinstance(turn, dict) else getattr(turn, "content", "")
+        if not user:
+            if role == "user":
+                user = str(content or "")
+        elif role == "assistant":
+            previous = str(content or "")
+            break
+    return user, previous
+
+
+def classify_message(message: str, previous: str = "") -> Tuple[str, str]:
+    """Cheap local classification of a chat turn into `(tier, reason)`.
+
+    Asking for a deliverable (or accepting Mark's offer to make one) executes at
+    full strength; greetings and acknowledgements are light; questions and
+    anything unclear get the standard tier.
+    """
+    text = message.strip()
+    words = len(text.split())
+    if _ACTION_RE.search(text):
+        return "execute", "action"
+    if words <= SHORT_MESSAGE_WORDS and _AFFIRM_RE.match(text) and _OFFER_RE.search(previous):
+        return "execute", "accepted_offer"
+    if words >= LONG_MESSAGE_WORDS:
+        return "execute", "long_message"
+    if words <= SHORT_MESSAGE_WORDS and "?" not in text and (_ACK_RE.match(text) or _AFFIRM_RE.match(text)):
+        return "light", "small_talk"
+    if not text:
+        return "light", "empty"
+    return "standard", "question" if "?" in text else "default"
+
+
+class Router:
+    """Picks the model and reasoning effort for chat turns and brief sub-agents.
+
+    Routing is a handful of regexes over the latest message and the turn before
+    it, so it adds no latency of its own. Every decision is counted in
+    `markit_route_decisions_total`, and the tier is a label on the calling span,
+    so latency and token use can be compared per tier in /api/metrics.
+    `CHAT_ROUTING=0` sends every chat turn to the execute tier (the old behaviour).
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, Tuple[str, str]]] = None,
+        agent_effort: Optional[Dict[str, str]] = None,
+        enabled: bool = True,
+    ) -> None:
+        self.tiers = dict(tiers or CHAT_TIERS)
+        self.agent_effort = dict(agent_effort or AGENT_EFFORT)
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls) -> "Router":
+        return cls(
+            tiers={tier: _tier_from_env(tier, default) for tier, default in CHAT_TIERS.items()},
+            agent_effort=_agent_effort_from_env(),
+            enabled=env_flag("CHAT_ROUTING", True),
+        )
+
+    def _route(self, surface: str, tier: str, reason: str) -> Route:
+        model, effort = self.tiers[tier]
+        METRICS.inc("markit_route_decisions_total", surface=surface, tier=tier, reason=reason)
+        return Route(surface, tier, model, effort, reason)
+
+    def chat(self, history: Sequence[Any]) -> Route:
+        if not self.enabled:
+            return self._route("chat", "execute", "disabled")
+        message, previous = _last_turns(history)
+        tier, reason = classify_message(message, previous)
+        return self._route("chat", tier, reason)
+
+    def greeting(self) -> Route:
+        # The opening message is a <240 character hello built from the pinned brief
+        return self._route("greeting", "light" if self.enabled else "execute", "greeting" if self.enabled else "disabled")
+
+    def agent_effort_for(self, prompt_name: str) -> str:
+        """Reasoning effort for a brief sub-agent, from its prompt name (`ads`, `ads_grounded`, ...)."""
+        name = prompt_name[: -len("_grounded")] if prompt_name.endswith("_grounded") else ""
+        effort = self.agent_effort.get(name, UNGROUNDED_EFFORT) if name else UNGROUNDED_EFFORT
+        METRICS.inc("markit_route_decisions_total", surface="agent", tier=effort, reason=prompt_name)
+        return effort
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tiers": {tier: {"model": m, "effort": e} for tier, (m, e) in self.tiers.items()},
+            "agent_effort": self.agent_effort,
+        }
+
+
+_ROUTER: Optional[Router] = None
+
+
+def get_router() -> Router:
+    global _ROUTER
+    if _ROUTER is None:
+        _ROUTER = Router.from_env()
+    return _ROUTER
@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from .metrics import METRICS
+from .prompts import count_tokens
+from .ratelimit import TokenBucket
+from .resilience import retry_after
+from .settings import env_flag, env_float
+
+METRICS.describe("markit_outbound_wait_seconds", "histogram", "Time model calls waited for OpenAI request/token budget, by priority.")
+METRICS.describe("markit_outbound_throttled_total", "counter", "OpenAI 429s seen by the outbound scheduler, by model.")
+
+# Lower runs first. Interactive is a person waiting on a chat turn; standard is inline
+# brief generation; background is queued jobs and the batch CLI.
+PRIORITIES = {"interactive": 0, "standard": 1, "background": 2}
+_PRIORITY_NAMES = {rank: name for name, rank in PRIORITIES.items()}
+
+# Output tokens assumed per call when the request sets no max_output_tokens, by reasoning effort
+OUTPUT_ESTIMATES = {"minimal": 500, "low": 1000, "medium": 2000, "high": 8000}
+DEFAULT_OUTPUT_ESTIMATE = 1000
+
+# Only text generation counts against a model's RPM/TPM; images have their own limits
+_BUDGETED_PATHS = ("/responses", "/chat/completions")
+
+_PRIORITY: "contextvars.ContextVar[str]" = contextvars.ContextVar("markit_priority", default="standard")
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Run every model call made inside the block (and tasks it spawns) at priority `name`."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {name}")
+    token = _PRIORITY.set(name)
+    try:
+        yield
+    finally:
+        try:
+            _PRIORITY.reset(token)
+        except ValueError:
+            # Async generators may be finalized from another context
+            pass
+
+
+def current_priority() -> str:
+    return _PRIORITY.get()
+
+
+def request_tokens(body: Dict[str, Any], text: str) -> int:
+    """Token cost of a Responses/Chat request: its serialized input (`count_tokens`) plus the expected output."""
+    out = body.get("max_output_tokens") or body.get("max_completion_tokens") or body.get("max_tokens")
+    if not out:
+        effort = (body.get("reasoning") or {}).get("effort") if isinstance(body.get("reasoning"), dict) else None
+        out = OUTPUT_ESTIMATES.get(str(effort), DEFAULT_OUTPUT_ESTIMATE)
+    return count_tokens(text) + int(out)
+
+
+def _duration(raw: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset durations such as `20ms`, `1s`, `6m0s`."""
+    if not raw:
+        return None
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", raw)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def _header_float(headers: httpx.Headers, name: str) -> Optional[float]:
+    try:
+        value = headers.get(name)
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+class ModelBudget:
+    """Requests and tokens per minute for one model, with a reserve each priority must leave.
+
+    A budget of 0 means "not known yet": calls pass straight through until the
+    first response reports the real limits.
+    """
+
+    def __init__(self, model: str, rpm: float, tpm: float, floors: Dict[str, float]) -> None:
+        self.model = model
+        self.floors = floors
+        self.requests = TokenBucket(rpm / 60.0, rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm > 0 else None
+        self.paused_until = 0.0
+        self.waiting: List[Tuple[int, int, int, "asyncio.Future[None]"]] = []
+        self.granted: Dict[str, int] = {}
+        self.throttled = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _keep(self, bucket: TokenBucket, prio: str) -> float:
+        return bucket.burst * self.floors.get(prio, 0.0)
+
+    def _cost(self, bucket: TokenBucket, cost: float, keep: float) -> float:
+        # A call bigger than what this priority may ever hold waits for a full share instead of forever
+        return min(cost, max(bucket.burst - keep, 1.0))
+
+    def wait_time(self, prio: str, tokens: int) -> float:
+        wait = max(0.0, self.paused_until - time.monotonic())
+        for bucket, cost in ((self.requests, 1.0), (self.tokens, float(tokens))):
+            if bucket is not None:
+                keep = self._keep(bucket, prio)
+                wait = max(wait, bucket.wait_time(self._cost(bucket, cost, keep), keep))
+        return wait
+
+    def take(self, prio: str, tokens: int) -> None:
+        for bucket, cost in ((self.requests, 1.0), (self.tokens, float(tokens))):
+            if bucket is not None:
+                keep = self._keep(bucket, prio)
+                bucket.try_acquire(self._cost(bucket, cost, keep), keep)
+        self.granted[prio] = self.granted.get(prio, 0) + 1
+
+    def adapt(self, headers: httpx.Headers) -> None:
+        """Adopt the limits OpenAI reports and what it says is left, which replaces our own estimates."""
+        for kind in ("requests", "tokens"):
+            limit = _header_float(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+            bucket: Optional[TokenBucket] = getattr(self, kind)
+            if limit and limit > 0:
+                if bucket is None:
+                    bucket = TokenBucket(limit / 60.0, limit)
+                    setattr(self, kind, bucket)
+                elif bucket.burst != limit:
+                    bucket.configure(limit / 60.0, limit)
+            if bucket is not None and remaining is not None:
+                bucket.sync(remaining)
+
+    def describe(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for prio_rank, _seq, _tokens, fut in self.waiting:
+            if not fut.done():
+                name = _PRIORITY_NAMES[prio_rank]
+                counts[name] = counts.get(name, 0) + 1
+        return {
+            "rpm": self.requests.burst if self.requests else None,
+            "tpm": self.tokens.burst if self.tokens else None,
+            "requests_available": round(self.requests.available, 1) if self.requests else None,
+            "tokens_available": round(self.tokens.available) if self.tokens else None,
+            "paused_s": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "waiting": counts,
+            "granted": dict(self.granted),
+            "throttled": self.throttled,
+        }
+
+
+class OutboundScheduler:
+    """One queue in front of OpenAI for every model call in the process.
+
+    Calls wait in priority order (then arrival order) until their model's
+    request and token budgets allow them. Lower priorities must leave a reserve
+    of each budget untouched, so background briefs cannot use up the headroom
+    that live chat turns need. Budgets start from OPENAI_RPM / OPENAI_TPM (or
+    unknown) and follow the `x-ratelimit-*` headers on every response; a 429
+    pauses that model until the reported reset.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0.0,
+        tpm: float = 0.0,
+        reserve_interactive: float = 0.2,
+        reserve_standard: float = 0.2,
+        enabled: bool = True,
+    ) -> None:
+        self.enabled = enabled
+        self.rpm = rpm
+        self.tpm = tpm
+        # Share of each budget a priority may not dip into
+        self.floors = {
+            "interactive": 0.0,
+            "standard": reserve_interactive,
+            "background": min(0.9, reserve_interactive + reserve_standard),
+        }
+        self.budgets: Dict[str, ModelBudget] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "OutboundScheduler":
+        return cls(
+            rpm=env_float("OPENAI_RPM", 0.0),
+            tpm=env_float("OPENAI_TPM", 0.0),
+            reserve_interactive=env_float("OPENAI_RESERVE_INTERACTIVE", 0.2),
+            reserve_standard=env_float("OPENAI_RESERVE_STANDARD", 0.2),
+            enabled=env_flag("OPENAI_SCHEDULER", True),
+        )
+
+    def budget(self, model: str) -> ModelBudget:
+        b = self.budgets.get(model)
+        if b is None:
+            b = self.budgets[model] = ModelBudget(model, self.rpm, self.tpm, self.floors)
+        return b
+
+    async def acquire(self, model: str, tokens: int, prio: Optional[str] = None) -> None:
+        prio = prio or current_priority()
+        b = self.budget(model)
+        rank = PRIORITIES.get(prio, PRIORITIES["standard"])
+        if not self._blocked(b) and b.wait_time(prio, tokens) <= 0:
+            b.take(prio, tokens)
+            return
+        fut: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(b.waiting, (rank, next(self._seq), tokens, fut))
+        t0 = time.perf_counter()
+        self._pump(b)
+        try:
+            await fut
+        finally:
+            METRICS.observe("markit_outbound_wait_seconds", time.perf_counter() - t0, priority=prio)
+
+    def _blocked(self, b: ModelBudget) -> bool:
+        # Someone is already queued: newcomers go through the queue so priority order holds
+        return any(not w[3].done() for w in b.waiting)
+
+    def _pump(self, b: ModelBudget) -> None:
+        if b._timer is not None:
+            b._timer.cancel()
+            b._timer = None
+        while b.waiting:
+            rank, _seq, tokens, fut = b.waiting[0]
+            if fut.done():
+                heapq.heappop(b.waiting)
+                continue
+            prio = _PRIORITY_NAMES[rank]
+            wait = b.wait_time(prio, tokens)
+            if wait > 0:
+                b._timer = asyncio.get_running_loop().call_later(wait, self._pump, b)
+                return
+            heapq.heappop(b.waiting)
+            b.take(prio, tokens)
+            fut.set_result(None)
+
+    def observe(self, model: str, response: httpx.Response) -> None:
+        b = self.budget(model)
+        b.adapt(response.headers)
+        if response.status_code == 429:
+            b.throttled += 1
+            METRICS.inc("markit_outbound_throttled_total", model=model)
+            pause = retry_after(response)
+            if pause is None:
+                # Wait out whichever budget ran dry, not the (possibly minutes-long) full reset of both
+                exhausted = [
+                    _duration(response.headers.get(f"x-ratelimit-reset-{kind}"))
+                    for kind in ("requests", "tokens")
+                    if _header_float(response.headers, f"x-ratelimit-remaining-{kind}") == 0
+                ]
+                pause = max([d for d in exhausted if d is not None], default=1.0)
+            b.paused_until = max(b.paused_until, time.monotonic() + pause)
+        if b.waiting:
+            self._pump(b)
+
+    async def before_request(self, request: httpx.Request) -> None:
+        """httpx request hook: wait for budget before any text-generation call leaves the process."""
+        if not self.enabled or not request.url.path.endswith(_BUDGETED_PATHS):
+            return
+        try:
+            content = request.content
+            body = json.loads(content or b"{}")
+        except (httpx.RequestNotRead, ValueError):
+            return
+        model = str(body.get("model") or "")
+        if not model:
+            return
+        request.extensions["markit_model"] = model
+        await self.acquire(model, request_tokens(body, content.decode("utf-8", "replace")))
+
+    async def after_response(self, response: httpx.Response) -> None:
+        """httpx response hook: learn limits from the headers (streamed responses included)."""
+        model = response.request.extensions.get("markit_model")
+        if model:
+            self.observe(model, response)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "floors": self.floors,
+            "models": {m: b.describe() for m, b in self.budgets.items()},
+        }
+
+
+_SCHEDULER: Optional[OutboundScheduler] = None
+
+
+def get_scheduler() -> OutboundScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = OutboundScheduler.from_env()
+    return _SCHEDULER
+
+
+async def request_hook(request: httpx.Request) -> None:
+    await get_scheduler().before_request(request)
+
+
+async def response_hook(response: httpx.Response) -> None:
+    await get_scheduler().after_response(response)
@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+# Output shapes for every model call that returns data rather than prose. Passed as
+# `text_format` they become strict JSON-schema response formats, so the API only
+# produces conforming JSON; nullable fields are still required keys, which strict
+# mode needs.
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class StructuredOutputError(Exception):
+    """A call that should have returned schema-valid JSON did not (refusal or truncated output)."""
+
+    def __init__(self, name: str, reason: str) -> None:
+        super().__init__(f"{name} returned no valid structured output: {reason}")
+        self.name = name
+        self.reason = reason
+
+
+class GeneralInfo(BaseModel):
+    business_name: Optional[str]
+    one_liner: Optional[str]
+    website: Optional[str]
+
+
+class Product(BaseModel):
+    name: str
+    description: Optional[str]
+    pricing_summary: Optional[str]
+    key_features: List[str]
+    pain_points_solved: List[str]
+    target_use_cases: List[str]
+
+
+class Competitor(BaseModel):
+    name: str
+    url: Optional[str]
+    why_competes: Optional[str]
+
+
+class Brief(BaseModel):
+    """The research brief. `general_info` is null when the company could not be identified."""
+
+    general_info: Optional[GeneralInfo]
+    products: List[Product]
+    icp: Optional[str]
+    competitors: List[Competitor]
+    topics_keywords: List[str]
+
+    @property
+    def identified(self) -> bool:
+        return self.general_info is not None
+
+
+class Positioning(BaseModel):
+    tagline: str
+    category: str
+    value_props: List[str]
+    proof_points: List[str]
+
+
+class LandingCopy(BaseModel):
+    hero: str
+    subhead: str
+    bullets: List[str]
+
+
+class AdVariant(BaseModel):
+    headline: str
+    primary: str
+    cta: str
+
+
+class Ads(BaseModel):
+    ads: List[AdVariant]
+    keywords: List[str]
+
+
+class EmailMessage(BaseModel):
+    subject: str
+    body: str
+
+
+class Emails(BaseModel):
+    cold: List[EmailMessage]
+    nurture: List[EmailMessage]
+
+
+# Agents SDK handoff outputs
+class PRBrief(BaseModel):
+    headline: str
+    angle: str
+    bullets: list[str]
+
+
+class CreatorBrief(BaseModel):
+    audience: str
+    offers: list[str]
+    talking_points: list[str]
+
+
+class UGCBundle(BaseModel):
+    hooks: list[str]
+    scripts: list[str]
+
+
+class MerchBrief(BaseModel):
+    concepts: list[str]
+    slogans: list[str]
+
+
+class BriefRecord(BaseModel):
+    """What the brief field of a lead's Airtable record holds: the brief and, once the agents finish, their output."""
+
+    brief: Optional[Brief] = None
+    orchestration: Optional[Dict[str, Any]] = None
+
+
+def parsed_output(resp: Any, output_type: Type[ModelT], name: str) -> ModelT:
+    """The validated object from a `responses.parse` result, or `StructuredOutputError`."""
+    parsed = getattr(resp, "output_parsed", None)
+    if isinstance(parsed, output_type):
+        return parsed
+    status = getattr(resp, "status", None)
+    raise StructuredOutputError(name, "refused" if status == "completed" else f"status {status}")
+
+
+def read_brief(raw: Any) -> Optional[Brief]:
+    """The brief stored in a record's brief field, or None.
+
+    Records written before briefs were stored as a `BriefRecord` hold either the
+    bare brief JSON or only the orchestration output (which replaced it).
+    """
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        record = BriefRecord.model_validate_json(raw)
+        if record.brief is not None:
+            return record.brief
+        if record.orchestration is not None:
+            return None
+    except ValidationError:
+        pass
+    try:
+        return Brief.model_validate_json(raw)
+    except ValidationError:
+        return None
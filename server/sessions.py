@@ -0,0 +1,303 @@
+import abc
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .settings import data_path, env_float, env_int, env_str
+
+Turn = Dict[str, str]
+R = TypeVar("R")
+
+# Turns are stored as (role code, content) pairs; only the two chat roles get a short code
+_ROLE_CODES = {"user": "u", "assistant": "a"}
+_CODE_ROLES = {v: k for k, v in _ROLE_CODES.items()}
+
+
+def _encode_role(role: str) -> str:
+    return _ROLE_CODES.get(role, role)
+
+
+def _decode_role(code: str) -> str:
+    return _CODE_ROLES.get(code, code)
+
+
+class SessionStore(abc.ABC):
+    """Chat session storage: ordered turns plus the per-session context state.
+
+    Sessions expire after `ttl_seconds` without access and the least recently
+    used ones are evicted beyond `max_sessions`.
+    """
+
+    # Backends whose calls can block (SQLite waiting on another worker's lock) set this,
+    # and the async `a*` methods used by request handlers then run them in a thread
+    blocking = False
+
+    def __init__(self, max_sessions: int, ttl_seconds: float) -> None:
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        self.misses = 0
+
+    @abc.abstractmethod
+    def create(self, session_id: str, context: Optional[Dict[str, Any]] = None) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load(self, session_id: str) -> Optional[Tuple[List[Turn], Dict[str, Any]]]:
+        """Return `(turns, context)` or None if the session is unknown or expired."""
+        raise NotImplementedError
+
+    def load_turns(self, session_id: str, since: int = 0) -> Optional[List[Turn]]:
+        loaded = self.load(session_id)
+        return None if loaded is None else loaded[0][since:]
+
+    @abc.abstractmethod
+    def append_turns(self, session_id: str, turns: List[Turn]) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save_context(self, session_id: str, context: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    async def _run(self, fn: Callable[..., R], *args: Any) -> R:
+        return await asyncio.to_thread(fn, *args) if self.blocking else fn(*args)
+
+    async def acreate(self, session_id: str, context: Optional[Dict[str, Any]] = None) -> None:
+        await self._run(self.create, session_id, context)
+
+    async def aload(self, session_id: str) -> Optional[Tuple[List[Turn], Dict[str, Any]]]:
+        return await self._run(self.load, session_id)
+
+    async def aload_turns(self, session_id: str, since: int = 0) -> Optional[List[Turn]]:
+        return await self._run(self.load_turns, session_id, since)
+
+    async def aappend_turns(self, session_id: str, turns: List[Turn]) -> None:
+        await self._run(self.append_turns, session_id, turns)
+
+    async def asave_context(self, session_id: str, context: Dict[str, Any]) -> None:
+        await self._run(self.save_context, session_id, context)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "sessions": len(self),
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+            "misses": self.misses,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process LRU+TTL store; sessions are lost on restart and not shared across workers."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float) -> None:
+        super().__init__(max_sessions, ttl_seconds)
+        # session_id -> (accessed_at, turns, context)
+        self._items: "OrderedDict[str, Tuple[float, List[Tuple[str, str]], Dict[str, Any]]]" = OrderedDict()
+
+    def _touch(self, session_id: str) -> Optional[Tuple[List[Tuple[str, str]], Dict[str, Any]]]:
+        item = self._items.get(session_id)
+        now = time.time()
+        if item is None:
+            self.misses += 1
+            return None
+        if now - item[0] > self.ttl_seconds:
+            del self._items[session_id]
+            self.evicted_ttl += 1
+            self.misses += 1
+            return None
+        self._items[session_id] = (now, item[1], item[2])
+        self._items.move_to_end(session_id)
+        return item[1], item[2]
+
+    def create(self, session_id: str, context: Optional[Dict[str, Any]] = None) -> None:
+        now = time.time()
+        self._items[session_id] = (now, [], dict(context or {}))
+        self._items.move_to_end(session_id)
+        # Expired sessions sit at the LRU end, so drop those first
+        while self._items:
+            oldest_id, (accessed_at, _, _) = next(iter(self._items.items()))
+            if now - accessed_at > self.ttl_seconds:
+                del self._items[oldest_id]
+                self.evicted_ttl += 1
+            elif len(self._items) > self.max_sessions:
+                del self._items[oldest_id]
+                self.evicted_lru += 1
+            else:
+                break
+
+    def load(self, session_id: str) -> Optional[Tuple[List[Turn], Dict[str, Any]]]:
+        item = self._touch(session_id)
+        if item is None:
+            return None
+        turns, context = item
+        return [{"role": _decode_role(r), "content": c} for r, c in turns], context
+
+    def load_turns(self, session_id: str, since: int = 0) -> Optional[List[Turn]]:
+        item = self._touch(session_id)
+        if item is None:
+            return None
+        return [{"role": _decode_role(r), "content": c} for r, c in item[0][since:]]
+
+    def append_turns(self, session_id: str, turns: List[Turn]) -> None:
+        item = self._touch(session_id)
+        if item is not None:
+            item[0].extend((_encode_role(t["role"]), t["content"]) for t in turns)
+
+    def save_context(self, session_id: str, context: Dict[str, Any]) -> None:
+        item = self._touch(session_id)
+        if item is not None and item[1] is not context:
+            item[1].clear()
+            item[1].update(context)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SqliteSessionStore(SessionStore):
+    """SQLite (WAL) store shared by every uvicorn worker pointing at the same file."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_sessions: int, ttl_seconds: float) -> None:
+        super().__init__(max_sessions, ttl_seconds)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            " id TEXT PRIMARY KEY, context TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chat_sessions_accessed ON chat_sessions (accessed_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chat_turns ("
+            " session_id TEXT NOT NULL, idx INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, idx)) WITHOUT ROWID"
+        )
+
+    def _delete(self, where: str, params: Tuple[Any, ...]) -> int:
+        self._db.execute(f"DELETE FROM chat_turns WHERE session_id IN (SELECT id FROM chat_sessions WHERE {where})", params)
+        return int(self._db.execute(f"DELETE FROM chat_sessions WHERE {where}", params).rowcount)
+
+    def _count(self) -> int:
+        return int(self._db.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0])
+
+    def _touch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        row = self._db.execute("SELECT context, accessed_at FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        if now - row[1] > self.ttl_seconds:
+            self.evicted_ttl += self._delete("id = ?", (session_id,))
+            self.misses += 1
+            return None
+        self._db.execute("UPDATE chat_sessions SET accessed_at = ? WHERE id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    def create(self, session_id: str, context: Optional[Dict[str, Any]] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO chat_sessions (id, context, accessed_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(context or {}), now),
+                )
+                self.evicted_ttl += self._delete("accessed_at < ?", (now - self.ttl_seconds,))
+                over = self._count() - self.max_sessions
+                if over > 0:
+                    self.evicted_lru += self._delete(
+                        "id IN (SELECT id FROM chat_sessions ORDER BY accessed_at LIMIT ?)", (over,)
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def load(self, session_id: str) -> Optional[Tuple[List[Turn], Dict[str, Any]]]:
+        with self._lock:
+            context = self._touch(session_id)
+            if context is None:
+                return None
+            rows = self._db.execute(
+                "SELECT role, content FROM chat_turns WHERE session_id = ? ORDER BY idx", (session_id,)
+            ).fetchall()
+        return [{"role": _decode_role(r), "content": c} for r, c in rows], context
+
+    def load_turns(self, session_id: str, since: int = 0) -> Optional[List[Turn]]:
+        with self._lock:
+            if self._touch(session_id) is None:
+                return None
+            rows = self._db.execute(
+                "SELECT role, content FROM chat_turns WHERE session_id = ? AND idx >= ? ORDER BY idx",
+                (session_id, max(0, since)),
+            ).fetchall()
+        return [{"role": _decode_role(r), "content": c} for r, c in rows]
+
+    def append_turns(self, session_id: str, turns: List[Turn]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                touched = self._db.execute("UPDATE chat_sessions SET accessed_at = ? WHERE id = ?", (time.time(), session_id))
+                if touched.rowcount == 0:
+                    # Unknown or already evicted: turns without a session row would never be cleaned up
+                    self._db.execute("ROLLBACK")
+                    self.misses += 1
+                    return
+                start = self._db.execute(
+                    "SELECT COALESCE(MAX(idx) + 1, 0) FROM chat_turns WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                self._db.executemany(
+                    "INSERT INTO chat_turns (session_id, idx, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, start + i, _encode_role(t["role"]), t["content"]) for i, t in enumerate(turns)],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def save_context(self, session_id: str, context: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE chat_sessions SET context = ?, accessed_at = ? WHERE id = ?",
+                (json.dumps(context), time.time(), session_id),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+def store_from_env() -> SessionStore:
+    backend = env_str("SESSION_STORE", "memory").lower()
+    max_sessions = env_int("SESSION_MAX", 10000)
+    ttl = env_float("SESSION_TTL", 24 * 3600)
+    if backend == "sqlite":
+        path = data_path("SESSION_DB_PATH", "sessions.sqlite3")
+        return SqliteSessionStore(path, max_sessions, ttl)
+    return MemorySessionStore(max_sessions, ttl)
+
+
+_STORE: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = store_from_env()
+    return _STORE
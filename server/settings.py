@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+DEBUG_LEVELS = ("off", "basic", "full")
+AGENT_NAMES = ("positioning", "landing_copy", "ads", "emails")
+
+
+_DOTENV_LOADED = False
+
+
+def _load_dotenv() -> None:
+    global _DOTENV_LOADED
+    load_dotenv(override=True)
+    _DOTENV_LOADED = True
+
+
+def env_str(name: str, default: str = "") -> str:
+    """An environment variable (after `.env` is loaded), stripped; `default` when unset or blank.
+
+    Every module reads its knobs through these helpers so `.env` applies to all of
+    them, not only to whatever happened to call `get_settings()` first.
+    """
+    if not _DOTENV_LOADED:
+        _load_dotenv()
+    return (os.getenv(name, "") or "").strip() or default
+
+
+def env_flag(name: str, default: bool) -> bool:
+    raw = env_str(name).lower()
+    if not raw:
+        return default
+    return raw not in ("0", "false", "no", "off")
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(env_str(name) or default)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(env_str(name) or default)
+    except ValueError:
+        return default
+
+
+def data_path(name: str, filename: str) -> str:
+    """The path set in `name`, else `filename` under MARKIT_DATA_DIR."""
+    return env_str(name) or os.path.join(env_str("MARKIT_DATA_DIR", ".markit"), filename)
+
+
+# Environment variables behind `Settings`: a reload applies these to the next request
+HOT_RELOADED = (
+    "OPENAI_API_KEY", "AIRTABLE_API_KEY", "AIRTABLE_BASE_ID", "AIRTABLE_TABLE", "AGENTS_GROUNDED",
+    "AGENTS_WEB_SEARCH", "BRIEF_SINGLEFLIGHT_DOMAIN", "CHAT_DEBUG_LEVEL", "CHAT_IMAGE_CONCURRENCY",
+    "CHAT_WARMUP", "ADMIN_TOKEN", "BRIEF_DEADLINE_SECONDS", "CHAT_DEADLINE_SECONDS",
+    "RATE_LIMIT_TRUST_FORWARDED",
+)
+
+
+class Settings(BaseModel):
+    """Request-path configuration, read from the environment (and `.env`) once.
+
+    This object covers the values handlers used to re-read on every request, and
+    a reload (SIGHUP or `/api/admin/reload`) takes effect on the next request; a
+    new OpenAI key also rebuilds the agent registry. Everything else is read once,
+    through the `env_*` helpers, when the component that uses it is built: client
+    pools and timeouts, retries and breakers, the outbound scheduler, routing,
+    admission limits, the Airtable mirror and pacing, stores and the job queue.
+    Changing those needs a restart, and a reload lists them as `restart_required`.
+    """
+
+    openai_api_key: Optional[str] = None
+    airtable_api_key: Optional[str] = None
+    airtable_base_id: Optional[str] = None
+    airtable_table: str = "OAI Hackathon"
+    agents_grounded: bool = True
+    agents_web_search: List[str] = []
+    brief_singleflight_domain: bool = False
+    chat_debug_level: str = "basic"
+    chat_image_concurrency: int = 2
+    chat_warmup: bool = True
+    admin_token: Optional[str] = None
+    # Take the client address for rate limits from X-Forwarded-For (only behind a proxy that sets it)
+    rate_limit_trust_forwarded: bool = False
+    # Latency budgets (seconds) for a whole brief generation and a whole chat turn
+    brief_deadline_s: float = 600.0
+    chat_deadline_s: float = 120.0
+    loaded_at: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        debug_level = env_str("CHAT_DEBUG_LEVEL", "basic").lower()
+        # Sanitize table env (strip whitespace or stray '%' from copy/paste)
+        table = env_str("AIRTABLE_TABLE", "OAI Hackathon").rstrip("%")
+        return cls(
+            openai_api_key=env_str("OPENAI_API_KEY") or None,
+            airtable_api_key=env_str("AIRTABLE_API_KEY") or None,
+            airtable_base_id=env_str("AIRTABLE_BASE_ID") or None,
+            airtable_table=table,
+            agents_grounded=env_flag("AGENTS_GROUNDED", True),
+            # Comma-separated opt-in list, e.g. AGENTS_WEB_SEARCH="positioning,ads"
+            agents_web_search=[n.strip() for n in env_str("AGENTS_WEB_SEARCH").split(",") if n.strip() in AGENT_NAMES],
+            brief_singleflight_domain=env_flag("BRIEF_SINGLEFLIGHT_DOMAIN", False),
+            chat_debug_level=debug_level if debug_level in DEBUG_LEVELS else "basic",
+            chat_image_concurrency=max(1, env_int("CHAT_IMAGE_CONCURRENCY", 2)),
+            chat_warmup=env_flag("CHAT_WARMUP", True),
+            admin_token=env_str("ADMIN_TOKEN") or None,
+            rate_limit_trust_forwarded=env_flag("RATE_LIMIT_TRUST_FORWARDED", False),
+            brief_deadline_s=env_float("BRIEF_DEADLINE_SECONDS", 600.0),
+            chat_deadline_s=env_float("CHAT_DEADLINE_SECONDS", 120.0),
+            loaded_at=time.time(),
+        )
+
+    @property
+    def airtable_enabled(self) -> bool:
+        return bool(self.airtable_api_key and self.airtable_base_id)
+
+    def describe(self) -> Dict[str, Any]:
+        """Settings with secrets reduced to whether they are set."""
+        data = self.model_dump()
+        for key in ("openai_api_key", "airtable_api_key", "admin_token"):
+            data[key] = bool(data[key])
+        return data
+
+
+_SETTINGS: Optional[Settings] = None
+_LOCK = threading.Lock()
+
+
+def load_settings() -> Settings:
+    _load_dotenv()
+    return Settings.from_env()
+
+
+def get_settings() -> Settings:
+    global _SETTINGS
+    if _SETTINGS is None:
+        with _LOCK:
+            if _SETTINGS is None:
+                _SETTINGS = load_settings()
+    return _SETTINGS
+
+
+def reload_settings() -> Tuple[List[str], List[str]]:
+    """Re-read `.env` and the environment.
+
+    Returns the names of settings that changed, and the changed environment
+    variables that are not settings, which only take effect after a restart.
+    """
+    global _SETTINGS
+    env_before = dict(os.environ)
+    with _LOCK:
+        old = _SETTINGS
+        _SETTINGS = load_settings()
+    restart_required = sorted(
+        k for k in set(env_before) | set(os.environ)
+        if k not in HOT_RELOADED and env_before.get(k) != os.environ.get(k)
+    )
+    if old is None:
+        return [], restart_required
+    before, after = old.model_dump(), _SETTINGS.model_dump()
+    return sorted(k for k in after if k != "loaded_at" and before.get(k) != after.get(k)), restart_required
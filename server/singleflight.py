@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def email_domain(email: str) -> str:
+    email = normalize_email(email)
+    return email.split("@", 1)[1] if "@" in email else ""
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one in-flight task.
+
+    The first caller starts `fn()` as its own task and registers it under every
+    key it was given; later callers that hit any of those keys await the same
+    task. The work is shielded, so one caller going away does not cancel it for
+    the others; once every caller has been cancelled nobody is left to use the
+    result, and the work is cancelled too. Keys are released as soon as the task
+    finishes.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self._waiters: Dict["asyncio.Task[Any]", int] = {}
+
+    def inflight(self) -> int:
+        return len({id(t) for t in self._inflight.values()})
+
+    async def do(self, keys: Sequence[str], fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `fn` once per key set; returns `(result, shared)`."""
+        keys = [k for k in keys if k]
+        task: Optional["asyncio.Task[Any]"] = None
+        for k in keys:
+            task = self._inflight.get(k)
+            if task is not None:
+                return await self._wait(task), True
+
+        task = asyncio.ensure_future(fn())
+        for k in keys:
+            self._inflight[k] = task
+
+        def _release(t: "asyncio.Task[Any]") -> None:
+            for k in keys:
+                if self._inflight.get(k) is t:
+                    del self._inflight[k]
+            # Mark the exception retrieved even if every waiter has gone away
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(_release)
+        return await self._wait(task), False
+
+    async def _wait(self, task: "asyncio.Task[Any]") -> Any:
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # The last interested caller left (client disconnect, shutdown): stop the work
+                task.cancel()
+            raise
+        finally:
+            left = self._waiters.pop(task) - 1
+            if left:
+                self._waiters[task] = left
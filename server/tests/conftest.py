@@ -0,0 +1,41 @@
+import os
+from typing import Iterator, Tuple
+
+import pytest
+
+from server.bench.fakes import FakeConfig
+from server.bench.load import ServerThread, stack
+
+# The Agents SDK reads this when it is first imported, which can be while tests are collected
+os.environ.setdefault("OPENAI_AGENTS_DISABLE_TRACING", "1")
+
+# Slow research, quick everything else: a brief is still generating long after a chat turn is done
+RESEARCH_SECONDS = 2.0
+
+
+def slow_research_config() -> FakeConfig:
+    fast = "fixed:0.05"
+    return FakeConfig(
+        research_latency=f"fixed:{RESEARCH_SECONDS}", agent_latency=fast, chat_latency="fixed:0.2", ttft_latency=fast,
+        image_latency=fast, airtable_latency="fixed:0.01", airtable_rps=0.0, image_reply_rate=0.0,
+    )
+
+
+@pytest.fixture(scope="session")
+def fake_config() -> FakeConfig:
+    # The fakes read latencies per request, so a test may slow one kind of call down for a while
+    return slow_research_config()
+
+
+@pytest.fixture(scope="session")
+def servers(fake_config: FakeConfig) -> Iterator[Tuple[ServerThread, ServerThread, ServerThread]]:
+    # The app module keeps process-wide singletons, so every test shares one stack.
+    # Tests submit many briefs at once from one address, some for the same email, which the rate limits would refuse.
+    env = {"RATE_LIMIT_BRIEF_EMAIL_PER_MIN": "0", "RATE_LIMIT_BRIEF_IP_PER_MIN": "0"}
+    with stack(fake_config, env=env) as threads:
+        yield threads
+
+
+@pytest.fixture
+def base_url(servers: Tuple[ServerThread, ServerThread, ServerThread]) -> str:
+    return f"http://127.0.0.1:{servers[2].port}"
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict
+
+from server.bench.fakes import FakeConfig, airtable_app, openai_app
+from server.bench.load import ServerThread, _free_port, bench_env
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LEADS = [f"lead{i}@company{i}.example" for i in range(5)]
+BROKEN = "broken@company9.example"
+
+
+class ResearchProbe:
+    """Wraps the fake OpenAI app: tracks research calls in flight and rejects research for one lead while `broken` is set."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self.broken = True
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["path"] != "/v1/responses":
+            return await self.app(scope, receive, send)
+        body, more = b"", True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        if self.broken and BROKEN.encode() in body:
+            await send({"type": "http.response.start", "status": 400, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"error": {"message": "rejected by the test"}}'})
+            return
+        replayed = False
+
+        async def replay() -> Dict[str, Any]:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        research = b"marketing research analyst" in body
+        if research:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            if research:
+                self.in_flight -= 1
+
+
+def _batch(env: Dict[str, str], leads: str, output: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "server.batch", leads, "-o", output, "-c", "2"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+
+def test_batch_bounds_concurrency_reports_failures_and_resumes(tmp_path):
+    fast = "fixed:0.01"
+    config = FakeConfig(
+        research_latency="fixed:0.3", agent_latency=fast, chat_latency=fast, ttft_latency=fast,
+        image_latency=fast, airtable_latency=fast, airtable_rps=0.0,
+    )
+    probe = ResearchProbe(openai_app(config))
+    fakes = [ServerThread(probe, _free_port()), ServerThread(airtable_app(config), _free_port())]
+    for f in fakes:
+        f.start()
+    leads = tmp_path / "leads.csv"
+    leads.write_text("email\n" + "\n".join(LEADS + [BROKEN]) + "\n")
+    output = str(tmp_path / "results.jsonl")
+    env = {
+        **os.environ,
+        **bench_env(fakes[0].port, fakes[1].port, str(tmp_path / "data"), {"AIRTABLE_RPS": "1000", "AIRTABLE_BURST": "100"}),
+    }
+    try:
+        first = _batch(env, str(leads), output)
+        assert first.returncode == 1, first.stderr
+        summary = json.loads(first.stdout)
+        assert (summary["ok"], summary["failed"], summary["skipped"]) == (len(LEADS), 1, 0)
+        assert probe.max_in_flight == 2
+        results = {r["email"]: r for r in map(json.loads, open(output))}
+        assert all(results[e]["ok"] and results[e]["data"] for e in LEADS)
+        assert not results[BROKEN]["ok"] and "rejected by the test" in results[BROKEN]["error"]
+
+        # Re-running the same command retries only the lead that failed, picking up its record
+        probe.broken = False
+        second = _batch(env, str(leads), output)
+        assert second.returncode == 0, second.stderr
+        summary = json.loads(second.stdout)
+        assert (summary["ok"], summary["failed"], summary["skipped"]) == (1, 0, len(LEADS))
+        retried = [json.loads(line) for line in open(output)][-1]
+        assert retried["email"] == BROKEN and retried["ok"] and retried["mode"] == "resumed"
+    finally:
+        for f in fakes:
+            f.stop()
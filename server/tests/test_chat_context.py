@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from server.chat_context import ContextConfig, build_bounded_prompt, new_context_state
+from server.prompts import count_tokens
+
+BRIEF = json.dumps({"general_info": {"business_name": "Acme Robotics"}, "icp": "Ops directors at mid-size 3PLs"})
+CONFIG = ContextConfig(window_turns=8, summary_batch=4, summary_max_tokens=200, window_budget_tokens=400, summary_model="test")
+# Section headers and separators around the brief, summary and window
+FRAMING_TOKENS = 20
+
+
+def _turn(i: int) -> dict:
+    # ~30-65 tokens per turn: the window is cut by the turn count or by the budget, depending on the mix
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "lorem ipsum dolor " * (6 + (i * 5) % 9)}
+
+
+def _conversation(turns: int) -> list:
+    async def run() -> list:
+        state = new_context_state(BRIEF)
+        history, out = [], []
+        for i in range(turns):
+            history.append(_turn(i))
+            out.append(await build_bounded_prompt(history, state, CONFIG))
+        return out
+
+    return asyncio.run(run())
+
+
+def test_prompt_stays_within_budget_as_history_grows():
+    ceiling = count_tokens(BRIEF) + CONFIG.summary_max_tokens + CONFIG.window_budget_tokens + FRAMING_TOKENS
+    results = _conversation(60)
+    for prompt, transcript, stats in results:
+        assert count_tokens(transcript) <= CONFIG.window_budget_tokens
+        assert stats["summary_tokens_est"] <= CONFIG.summary_max_tokens
+        assert stats["prompt_tokens_est"] <= ceiling
+    # Old turns were folded into the summary rather than dropped
+    assert results[-1][2]["summarized_turns"] > 0
+
+
+def test_pinned_brief_prefix_is_identical_across_turns():
+    prefix = ("BUSINESS_INFO:\n" + BRIEF + "\n").encode()
+    for prompt, _transcript, _stats in _conversation(30):
+        assert prompt.encode()[: len(prefix)] == prefix
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+
+from server.bench.load import upstream_calls
+
+# Briefs generating in the background (research takes 2s, see conftest) may slow a chat
+# turn down by at most this much over the same turn with nothing else running
+CONCURRENT_BRIEFS = 8
+MAX_SLOWDOWN = 1.5
+SLACK_SECONDS = 0.1
+
+
+async def _chat_turn(c: httpx.AsyncClient, session: str) -> float:
+    t0 = time.perf_counter()
+    r = await c.post("/api/chat/send", json={
+        "session_id": session, "email": "chatter@concurrency.example", "message": "Any tips for launch week?",
+    })
+    assert r.status_code == 200, r.text
+    return time.perf_counter() - t0
+
+
+def test_chat_send_is_not_blocked_by_running_briefs(servers, base_url):
+    async def scenario() -> tuple:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as c:
+            session = (await c.post("/api/chat/start", json={"email": "chatter@concurrency.example"})).json()["session_id"]
+            baseline = min([await _chat_turn(c, session) for _ in range(3)])
+            briefs = [
+                asyncio.create_task(c.post("/api/brief", json={"email": f"slow{i}@concurrency{i}.example"}))
+                for i in range(CONCURRENT_BRIEFS)
+            ]
+            # Let the briefs reach their research calls first
+            await asyncio.sleep(0.3)
+            loaded = [await _chat_turn(c, session) for _ in range(3)]
+            assert not any(b.done() for b in briefs)
+            assert [(await b).status_code for b in briefs] == [200] * CONCURRENT_BRIEFS
+            return baseline, max(loaded)
+
+    baseline, loaded = asyncio.run(scenario())
+    assert loaded < baseline * MAX_SLOWDOWN + SLACK_SECONDS, f"chat took {loaded:.3f}s under load vs {baseline:.3f}s idle"
+
+
+def test_identical_briefs_share_one_generation(servers, base_url):
+    openai = servers[0]
+    n = 5
+
+    async def scenario() -> list:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as c:
+            body = {"email": "twice@singleflight.example"}
+            return list(await asyncio.gather(*(c.post("/api/brief", json=body) for _ in range(n))))
+
+    before = upstream_calls(openai)["research"]
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * n
+    assert upstream_calls(openai)["research"] - before == 1
+    assert sorted(r.json()["deduplicated"] for r in responses) == [False] + [True] * (n - 1)
@@ -0,0 +1,116 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from server.bench.disconnect import _cancelled, _delta
+from server.bench.fakes import Latency
+from server.bench.load import ServerThread, upstream_calls
+from server.metrics import METRICS
+
+from conftest import RESEARCH_SECONDS
+
+SLOW_CHAT_SECONDS = 2.0
+HANG_UP_AFTER = 0.5
+EMAIL = "walkaway@disconnect.example"
+
+
+class Exchange:
+    """One request driven straight into the app on its own loop, so the test sees what it sends to a client that left."""
+
+    def __init__(self, server: ServerThread, path: str, body: Dict[str, Any], hang_up_after: Optional[float] = None) -> None:
+        self.server = server
+        self.path = path
+        self.body = json.dumps(body).encode()
+        self.hang_up_after = hang_up_after
+        self.sent: List[Dict[str, Any]] = []
+        self._gone: Optional[asyncio.Event] = None
+
+    @property
+    def status(self) -> Optional[int]:
+        return next((m["status"] for m in self.sent if m["type"] == "http.response.start"), None)
+
+    @property
+    def text(self) -> str:
+        return b"".join(m.get("body", b"") for m in self.sent if m["type"] == "http.response.body").decode()
+
+    async def _run(self) -> None:
+        self._gone = asyncio.Event()
+        if self.hang_up_after is not None:
+            asyncio.get_running_loop().call_later(self.hang_up_after, self._gone.set)
+        delivered = False
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": self.body, "more_body": False}
+            await self._gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            self.sent.append(message)
+            if self.hang_up_after is None and b"event: delta" in message.get("body", b""):
+                # Streams: hang up on the first delta
+                self._gone.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+            "path": self.path, "raw_path": self.path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(self.body)).encode())],
+            "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", self.server.port),
+        }
+        await self.server.server.config.loaded_app(scope, receive, send)
+
+    def run(self) -> "Exchange":
+        asyncio.run_coroutine_threadsafe(self._run(), self.server.loop).result(timeout=60)
+        return self
+
+
+def _abandoned(openai: ServerThread, endpoint: str, exchange: Exchange, hold: float, expect: Dict[str, int]) -> None:
+    calls, cancelled = upstream_calls(openai), _cancelled(METRICS.render())
+    exchange.run()
+    # Outlast the fake's latency so anything still running would have completed or called again
+    asyncio.run(asyncio.sleep(hold))
+    assert _cancelled(METRICS.render()).get(endpoint, 0) - cancelled.get(endpoint, 0) == 1
+    upstream = _delta(calls, upstream_calls(openai))
+    assert {k: upstream.get(k, 0) for k in expect} == expect, upstream
+
+
+@pytest.fixture
+def slow_chat(fake_config):
+    fast = fake_config.chat_latency
+    fake_config.chat_latency = Latency(f"fixed:{SLOW_CHAT_SECONDS}")
+    yield
+    fake_config.chat_latency = fast
+
+
+def test_abandoned_brief_stops_research_and_resumes(servers):
+    openai, _, app = servers
+    brief = Exchange(app, "/api/brief", {"email": EMAIL}, hang_up_after=HANG_UP_AFTER)
+    # The research request was dropped mid-flight and the four agents never started
+    _abandoned(openai, "brief", brief, RESEARCH_SECONDS, {"responses": 1, "research": 1, "abandoned": 1, "agent": 0})
+    assert brief.status == 499
+
+    again = Exchange(app, "/api/brief", {"email": EMAIL}).run()
+    assert again.status == 200 and json.loads(again.text)["mode"] == "resumed"
+
+
+def test_abandoned_chat_send_cancels_the_model_call(servers, slow_chat):
+    openai, _, app = servers
+    start = Exchange(app, "/api/chat/start", {"email": EMAIL}).run()
+    body = {"session_id": json.loads(start.text)["session_id"], "email": EMAIL, "message": "Draft a subject line for launch week."}
+    send = Exchange(app, "/api/chat/send", body, hang_up_after=HANG_UP_AFTER)
+    _abandoned(openai, "chat_send", send, SLOW_CHAT_SECONDS, {"responses": 1, "chat": 1, "abandoned": 1})
+    assert send.status == 499
+
+
+def test_abandoned_chat_stream_cancels_the_model_stream(servers, slow_chat):
+    openai, _, app = servers
+    start = Exchange(app, "/api/chat/start", {"email": EMAIL}).run()
+    body = {"session_id": json.loads(start.text)["session_id"], "email": EMAIL, "message": "Draft a subject line for launch week."}
+    stream = Exchange(app, "/api/chat/stream", body)
+    _abandoned(openai, "chat_stream", stream, SLOW_CHAT_SECONDS, {"streams": 1, "chat": 1, "abandoned": 1})
+    # Headers went out before the first delta, so the client was told 200; the rest of the stream was dropped
+    assert stream.status == 200 and "event: final" not in stream.text
@@ -0,0 +1,73 @@
+import asyncio
+import base64
+import json
+
+import httpx
+
+from server.bench.fakes import PNG_1PX
+from server.images import ImageStore, get_image_store
+
+
+def test_urls_are_absolute_with_a_public_base(tmp_path):
+    store = ImageStore(str(tmp_path), url_prefix="https://api.markit.example/api/images/", thumb_size=256)
+    digest = store.put(PNG_1PX)
+    assert store.url(digest) == f"https://api.markit.example/api/images/{digest}"
+    assert store.thumb_url(digest) == f"https://api.markit.example/api/images/{digest}?size=thumb&px=256"
+
+
+def test_thumbnail_cache_headers_follow_the_size(servers, base_url):
+    # The app runs in this process, so this is the store it serves from
+    store = get_image_store()
+    digest = store.put(PNG_1PX)
+    with httpx.Client(base_url=base_url) as c:
+        current = c.get(f"/api/images/{digest}", params={"size": "thumb", "px": store.thumb_size})
+        assert current.status_code == 200
+        assert current.headers["etag"] == f'"{digest}-thumb{store.thumb_size}"'
+        assert "immutable" in current.headers["cache-control"]
+
+        stale = c.get(f"/api/images/{digest}", params={"size": "thumb", "px": store.thumb_size + 1})
+        assert stale.headers["cache-control"] == "public, no-cache"
+        assert c.get(f"/api/images/{digest}", params={"size": "thumb"}).headers["cache-control"] == "public, no-cache"
+
+        revalidated = c.get(f"/api/images/{digest}", params={"size": "thumb"}, headers={"If-None-Match": current.headers["etag"]})
+        assert revalidated.status_code == 304
+
+        original = c.get(f"/api/images/{digest}")
+        assert original.headers["etag"] == f'"{digest}"' and "immutable" in original.headers["cache-control"]
+
+
+def test_fallback_stores_data_url_images(tmp_path, monkeypatch):
+    from server.agents_sdk import orchestrator
+    from server.routing import get_router
+
+    data_url = "data:image/png;base64," + base64.b64encode(PNG_1PX).decode()
+
+    class Response:
+        output_text = "Here is your tee."
+        usage = None
+
+        def model_dump(self):
+            return {"output": [{"type": "message", "content": [{"type": "output_image", "image_url": data_url}]}]}
+
+    class Responses:
+        async def create(self, **_):
+            return Response()
+
+    class Client:
+        responses = Responses()
+
+    class Clients:
+        def openai(self, *_):
+            return Client()
+
+    store = ImageStore(str(tmp_path), url_prefix="https://api.markit.example/api/images/", thumb_size=256)
+    monkeypatch.setattr(orchestrator, "get_clients", lambda: Clients())
+    monkeypatch.setattr(orchestrator, "get_image_store", lambda: store)
+
+    route = get_router().chat([{"role": "user", "content": "Make me a tee."}])
+    text, meta = asyncio.run(orchestrator._chat_respond_fallback("prompt", "transcript", ValueError("bad output"), route))
+    image_url = meta["images"][0]["image_url"]
+    assert image_url.startswith("https://api.markit.example/api/images/")
+    path, media_type = store.path(image_url.rsplit("/", 1)[1])
+    assert media_type == "image/png" and open(path, "rb").read() == PNG_1PX
+    assert "data:" not in json.dumps(meta["raw_response"])
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+
+from server.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+def _lapse(queue: JobQueue, job_id: str, attempts: int) -> None:
+    # As if a worker that died had claimed the job `attempts` times
+    queue._db.execute(
+        "UPDATE jobs SET state = ?, attempts = ?, owner = 'elsewhere:1', lease_until = ? WHERE id = ?",
+        (RUNNING, attempts, time.time() - 1, job_id),
+    )
+
+
+def test_lapsed_lease_on_last_attempt_fails_the_job(tmp_path):
+    queue = JobQueue(os.path.join(tmp_path, "jobs.sqlite3"), max_attempts=2)
+    queue._tasks = [None]  # claims only run while workers are started
+    spent = queue.enqueue("brief", {"email": "a@example.com"})
+    retried = queue.enqueue("brief", {"email": "b@example.com"})
+    _lapse(queue, spent, 2)
+    _lapse(queue, retried, 1)
+
+    row = queue._claim()
+    assert row["id"] == retried
+    assert queue.get(retried)["attempts"] == 2
+    job = queue.get(spent)
+    assert job["state"] == FAILED and job["attempts"] == 2 and "lease expired" in job["error"]
+
+
+def test_worker_runs_jobs(tmp_path):
+    queue = JobQueue(os.path.join(tmp_path, "jobs.sqlite3"), poll_interval=0.05)
+
+    async def handler(payload):
+        return {"echo": payload["email"]}
+
+    async def scenario() -> dict:
+        queue.register("brief", handler)
+        await queue.start()
+        job_id = queue.enqueue("brief", {"email": "a@example.com"})
+        try:
+            for _ in range(100):
+                job = queue.get(job_id)
+                if job["state"] not in (QUEUED, RUNNING):
+                    return job
+                await asyncio.sleep(0.02)
+        finally:
+            await queue.stop()
+        return queue.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["state"] == SUCCEEDED and job["result"] == {"echo": "a@example.com"}
+
+
+def test_inline_run_is_active_until_it_finishes(tmp_path):
+    queue = JobQueue(os.path.join(tmp_path, "jobs.sqlite3"))
+    payload = {"email": "a@example.com", "record_id": "rec1"}
+
+    async def scenario() -> None:
+        async with queue.inline("brief", payload, unique="record_id") as job:
+            assert job["owned"]
+            # A second inline caller and a queued submit both get the running job back
+            async with queue.inline("brief", payload, unique="record_id") as other:
+                assert not other["owned"] and other["id"] == job["id"]
+            assert await queue.aenqueue("brief", payload, unique="record_id") == job["id"]
+            assert queue.find_active("brief", "record_id", "rec1") == job["id"]
+            job["result"] = {"ok": True}
+        assert queue.get(job["id"])["state"] == SUCCEEDED
+        assert queue.find_active("brief", "record_id", "rec1") is None
+
+        try:
+            async with queue.inline("brief", payload, unique="record_id") as job:
+                raise RuntimeError("upstream down")
+        except RuntimeError:
+            pass
+        failed = queue.get(job["id"])
+        assert failed["state"] == FAILED and "upstream down" in failed["error"]
+
+    asyncio.run(scenario())
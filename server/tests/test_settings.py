@@ -0,0 +1,52 @@
+import os
+
+import httpx
+
+from server import settings
+from server.agents_sdk.orchestrator import get_agent_registry
+from server.settings import get_settings, reload_settings
+
+
+def test_reload_applies_settings_and_lists_restart_only_knobs(monkeypatch):
+    get_settings()
+    key = os.environ.get("OPENAI_API_KEY") or "sk-before"
+    monkeypatch.setenv("OPENAI_API_KEY", key)
+    reload_settings()
+    registry = get_agent_registry()
+
+    def edited_dotenv(override: bool = True) -> None:
+        # As if .env had been edited while the server was running
+        monkeypatch.setenv("OPENAI_API_KEY", key + "-rotated")
+        monkeypatch.setenv("CHAT_DEADLINE_SECONDS", "77")
+        monkeypatch.setenv("JOBS_WORKERS", "9")
+
+    monkeypatch.setattr(settings, "load_dotenv", edited_dotenv)
+    try:
+        changed, restart_required = reload_settings()
+        assert changed == ["chat_deadline_s", "openai_api_key"]
+        assert restart_required == ["JOBS_WORKERS"]
+        assert get_settings().chat_deadline_s == 77.0
+        # Agents are rebuilt on the new key instead of keeping the old client
+        rebuilt = get_agent_registry()
+        assert rebuilt is not registry and rebuilt.api_key == key + "-rotated"
+    finally:
+        monkeypatch.undo()
+        reload_settings()
+
+
+def test_reload_without_a_token_is_loopback_only(servers, base_url, monkeypatch):
+    assert get_settings().admin_token is None
+    with httpx.Client(base_url=base_url) as c:
+        assert c.post("/api/admin/reload").status_code == 200
+        # Behind a proxy every caller looks local, so a token is required there
+        monkeypatch.setenv("RATE_LIMIT_TRUST_FORWARDED", "1")
+        reload_settings()
+        try:
+            assert c.post("/api/admin/reload").status_code == 403
+            monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+            reload_settings()
+            assert c.post("/api/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+            assert c.post("/api/admin/reload", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+        finally:
+            monkeypatch.undo()
+            reload_settings()